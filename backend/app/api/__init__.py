@@ -57,7 +57,9 @@ async def get_status():
 async def health_check():
     """Проверка здоровья сервиса"""
     from ..services.gemini_service import gemini_service
+    from ..services.analysis_cache import analysis_cache
     from ..core.config import settings
+    from ..core.metrics import metrics
     
     return {
         "status": "healthy",
@@ -66,6 +68,9 @@ async def health_check():
         "components": {
             "database": "connected",
             "gemini_ai": "available" if gemini_service.is_available() else "unavailable",
-            "telegram_bot": "configured" if settings.TELEGRAM_BOT_TOKEN else "not_configured"
-        }
+            "gemini_limits": gemini_service.limits_stats(),
+            "telegram_bot": "configured" if settings.TELEGRAM_BOT_TOKEN else "not_configured",
+            "analysis_cache": analysis_cache.stats()
+        },
+        "metrics": metrics.snapshot()
     }
\ No newline at end of file
@@ -3,44 +3,68 @@ API endpoints для работы с записями настроения
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 from datetime import datetime, date
 
-from ..core.database import get_db
-from ..crud.mood_entry import mood_entry_crud
-from ..crud.user import user_crud
+from ..core.database import get_async_db
+from ..core.pagination import decode_entry_cursor, encode_cursor
+from ..crud.analysis_job import analysis_job_crud
+from ..crud.mood_entry import async_mood_entry_crud
+from ..crud.user import async_user_crud
+from ..services.analysis_worker import analysis_worker
 from ..services.mood_analyzer import mood_analyzer
-from ..schemas import MoodEntry, MoodEntryCreate, MoodEntryUpdate, MoodEntryWithAnalysis
+from ..schemas import (
+    MoodEntry, MoodEntryCreate, MoodEntryUpdate, MoodEntryWithAnalysis, MoodEntryPage, AnalysisStatus
+)
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[MoodEntryWithAnalysis])
+@router.get("/", response_model=Union[List[MoodEntryWithAnalysis], MoodEntryPage])
 async def get_mood_entries(
     skip: int = Query(0, ge=0, description="Количество пропускаемых записей"),
     limit: int = Query(100, ge=1, le=1000, description="Максимальное количество записей"),
+    cursor: Optional[str] = Query(None, description="Курсор страницы (пустая строка - первая страница)"),
     user_id: Optional[int] = Query(None, description="Фильтр по пользователю"),
     start_date: Optional[datetime] = Query(None, description="Начальная дата (ISO формат)"),
     end_date: Optional[datetime] = Query(None, description="Конечная дата (ISO формат)"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить список записей настроения
     
     - **skip**: количество записей для пропуска (пагинация)
     - **limit**: максимальное количество записей
+    - **cursor**: курсорная пагинация; с ним ответ - {items, next_cursor}, а skip не используется
     - **user_id**: фильтр по конкретному пользователю
     - **start_date**: начальная дата для фильтрации
     - **end_date**: конечная дата для фильтрации
     """
+    after = None
+    if cursor is not None:
+        try:
+            after = decode_entry_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+    
     if user_id:
         # Проверяем существование пользователя
-        user = user_crud.get_by_id(db, user_id)
+        user = await async_user_crud.get_by_id(db, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="Пользователь не найден")
         
-        entries = mood_entry_crud.get_user_entries(
+        if cursor is not None:
+            entries, next_key = await async_mood_entry_crud.get_user_entries_page(
+                db, user_id, limit=limit, after=after,
+                start_date=start_date, end_date=end_date
+            )
+            return {
+                "items": entries,
+                "next_cursor": encode_cursor(*next_key) if next_key else None
+            }
+        
+        entries = await async_mood_entry_crud.get_user_entries(
             db, user_id, skip=skip, limit=limit, 
             start_date=start_date, end_date=end_date
         )
@@ -48,6 +72,8 @@ async def get_mood_entries(
         # Здесь должна быть общая логика для получения всех записей
         # Пока возвращаем пустой список для неавторизованных запросов
         entries = []
+        if cursor is not None:
+            return {"items": entries, "next_cursor": None}
     
     return entries
 
@@ -55,14 +81,14 @@ async def get_mood_entries(
 @router.get("/{entry_id}", response_model=MoodEntryWithAnalysis)
 async def get_mood_entry(
     entry_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить запись настроения по ID
     
     - **entry_id**: уникальный идентификатор записи
     """
-    entry = mood_entry_crud.get_by_id(db, entry_id)
+    entry = await async_mood_entry_crud.get_by_id(db, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Запись настроения не найдена")
     return entry
@@ -73,7 +99,7 @@ async def create_mood_entry(
     entry_in: MoodEntryCreate,
     user_id: int = Query(..., description="ID пользователя"),
     analyze: bool = Query(True, description="Провести AI анализ"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Создать новую запись настроения
@@ -83,13 +109,13 @@ async def create_mood_entry(
     - **analyze**: нужно ли проводить AI анализ
     """
     # Проверяем существование пользователя
-    user = user_crud.get_by_id(db, user_id)
+    user = await async_user_crud.get_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
     # Проверяем, нет ли уже записи на эту дату
     entry_date = entry_in.entry_date.date() if hasattr(entry_in.entry_date, 'date') else entry_in.entry_date
-    existing_entry = mood_entry_crud.get_by_user_and_date(db, user_id, entry_date)
+    existing_entry = await async_mood_entry_crud.get_by_user_and_date(db, user_id, entry_date)
     if existing_entry:
         raise HTTPException(
             status_code=400, 
@@ -97,20 +123,16 @@ async def create_mood_entry(
         )
     
     # Создаем запись
-    mood_entry = mood_entry_crud.create(db, entry_in, user_id)
+    mood_entry = await async_mood_entry_crud.create(db, entry_in, user_id)
     
     # Увеличиваем счетчик у пользователя
-    user_crud.increment_mood_entries(db, user_id)
+    await async_user_crud.increment_mood_entries(db, user_id)
     
-    # Проводим AI анализ если требуется
+    # AI анализ выполняется в фоне, ответ не ждет Gemini
     if analyze:
-        try:
-            await mood_analyzer.analyze_and_save(db, mood_entry)
-            # Обновляем запись с анализом
-            mood_entry = mood_entry_crud.get_by_id(db, mood_entry.id)
-        except Exception as e:
-            # Логируем ошибку, но не прерываем создание записи
-            pass
+        job = await db.run_sync(analysis_job_crud.enqueue, mood_entry.id)
+        analysis_worker.notify()
+        return MoodEntryWithAnalysis.model_validate(mood_entry).model_copy(update={"analysis_status": job.status})
     
     return mood_entry
 
@@ -120,7 +142,7 @@ async def update_mood_entry(
     entry_id: int,
     entry_in: MoodEntryUpdate,
     reanalyze: bool = Query(False, description="Провести повторный AI анализ"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Обновить запись настроения
@@ -129,38 +151,65 @@ async def update_mood_entry(
     - **entry_in**: новые данные записи
     - **reanalyze**: провести повторный AI анализ
     """
-    entry = mood_entry_crud.update(db, entry_id, entry_in)
+    entry = await async_mood_entry_crud.update(db, entry_id, entry_in)
     if not entry:
         raise HTTPException(status_code=404, detail="Запись настроения не найдена")
     
-    # Повторный анализ если требуется
+    # Повторный анализ в фоне: старый анализ заменится, когда будет готов новый
     if reanalyze and (entry_in.mood_text or entry_in.mood_score):
-        try:
-            # Удаляем старый анализ
-            if entry.ai_analysis:
-                db.delete(entry.ai_analysis)
-                db.commit()
-            
-            # Создаем новый анализ
-            await mood_analyzer.analyze_and_save(db, entry)
-            entry = mood_entry_crud.get_by_id(db, entry_id)
-        except Exception as e:
-            pass
+        job = await db.run_sync(analysis_job_crud.enqueue, entry_id)
+        analysis_worker.notify()
+        return MoodEntryWithAnalysis.model_validate(entry).model_copy(update={"analysis_status": job.status})
     
     return entry
 
 
+@router.get("/{entry_id}/analysis-status", response_model=AnalysisStatus)
+async def get_analysis_status(
+    entry_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Получить состояние AI анализа записи
+    
+    - **entry_id**: ID записи настроения
+    """
+    entry = await async_mood_entry_crud.get_by_id(db, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Запись настроения не найдена")
+    
+    job = await db.run_sync(analysis_job_crud.get_latest_for_entry, entry_id)
+    if job is None:
+        # Записи до появления очереди или созданные без анализа
+        return AnalysisStatus(
+            mood_entry_id=entry_id,
+            status="done" if entry.ai_analysis else "none",
+            has_analysis=entry.ai_analysis is not None
+        )
+    
+    return AnalysisStatus(
+        mood_entry_id=entry_id,
+        status=job.status,
+        job_id=job.id,
+        attempts=job.attempts,
+        last_error=job.last_error,
+        run_after=job.run_after,
+        finished_at=job.finished_at,
+        has_analysis=entry.ai_analysis is not None
+    )
+
+
 @router.delete("/{entry_id}")
 async def delete_mood_entry(
     entry_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Удалить запись настроения
     
     - **entry_id**: ID записи для удаления
     """
-    success = mood_entry_crud.delete(db, entry_id)
+    success = await async_mood_entry_crud.delete(db, entry_id)
     if not success:
         raise HTTPException(status_code=404, detail="Запись настроения не найдена")
     return {"message": "Запись настроения успешно удалена"}
@@ -170,7 +219,7 @@ async def delete_mood_entry(
 async def get_user_recent_entries(
     user_id: int,
     days: int = Query(7, ge=1, le=365, description="Количество дней"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить последние записи пользователя
@@ -178,29 +227,29 @@ async def get_user_recent_entries(
     - **user_id**: ID пользователя
     - **days**: количество дней для получения записей
     """
-    user = user_crud.get_by_id(db, user_id)
+    user = await async_user_crud.get_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    entries = mood_entry_crud.get_recent_entries(db, user_id, days)
+    entries = await async_mood_entry_crud.get_recent_entries(db, user_id, days)
     return entries
 
 
 @router.get("/user/{user_id}/stats")
 async def get_user_mood_stats(
     user_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить статистику настроения пользователя
     
     - **user_id**: ID пользователя
     """
-    user = user_crud.get_by_id(db, user_id)
+    user = await async_user_crud.get_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    stats = mood_entry_crud.get_user_stats(db, user_id)
+    stats = await async_mood_entry_crud.get_user_stats(db, user_id)
     return stats
 
 
@@ -208,7 +257,7 @@ async def get_user_mood_stats(
 async def get_user_mood_analytics(
     user_id: int,
     period: str = Query("month", regex="^(week|month|year)$", description="Период анализа"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить аналитику настроения пользователя
@@ -216,11 +265,11 @@ async def get_user_mood_analytics(
     - **user_id**: ID пользователя
     - **period**: период для анализа (week, month, year)
     """
-    user = user_crud.get_by_id(db, user_id)
+    user = await async_user_crud.get_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    analytics = mood_entry_crud.get_mood_analytics(db, user_id, period)
+    analytics = await async_mood_entry_crud.get_mood_analytics(db, user_id, period)
     return analytics
 
 
@@ -228,7 +277,7 @@ async def get_user_mood_analytics(
 async def get_user_mood_summary(
     user_id: int,
     days: int = Query(7, ge=1, le=365, description="Период в днях"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить сводку настроения пользователя
@@ -236,47 +285,47 @@ async def get_user_mood_summary(
     - **user_id**: ID пользователя
     - **days**: период в днях для анализа
     """
-    user = user_crud.get_by_id(db, user_id)
+    user = await async_user_crud.get_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    summary = mood_analyzer.get_mood_summary(db, user_id, days)
+    summary = await db.run_sync(mood_analyzer.get_mood_summary, user_id, days)
     return summary
 
 
 @router.get("/user/{user_id}/recommendations")
 async def get_user_recommendations(
     user_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить рекомендации для пользователя
     
     - **user_id**: ID пользователя
     """
-    user = user_crud.get_by_id(db, user_id)
+    user = await async_user_crud.get_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    recommendations = mood_analyzer.get_recommendations_for_user(db, user_id)
+    recommendations = await db.run_sync(mood_analyzer.get_recommendations_for_user, user_id)
     return recommendations
 
 
 @router.get("/user/{user_id}/check-today")
 async def check_today_entry(
     user_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Проверить, есть ли запись на сегодня
     
     - **user_id**: ID пользователя
     """
-    user = user_crud.get_by_id(db, user_id)
+    user = await async_user_crud.get_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    today_entry = mood_entry_crud.get_by_user_and_date(db, user_id, date.today())
+    today_entry = await async_mood_entry_crud.get_by_user_and_date(db, user_id, date.today())
     
     return {
         "has_entry_today": today_entry is not None,
@@ -3,24 +3,33 @@ Telegram Bot для AI Mood Diary Bot
 Основной файл с обработчиками команд и сообщений
 """
 
+import functools
+import hashlib
+import hmac
 import logging
 import asyncio
-from typing import Dict, Any
-from datetime import datetime, date
+import time
+from typing import Awaitable, Callable, Dict, Any, Optional
+from datetime import date
 
-from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram import Message, Update, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
 from telegram.constants import ParseMode
 
 from ..core.config import settings
-from ..core.database import SessionLocal
-from ..crud.user import user_crud
-from ..crud.mood_entry import mood_entry_crud
-from ..services.mood_analyzer import mood_analyzer
-from ..schemas import UserCreate, MoodEntryCreate
+from ..core.deadline import deadline_scope
+from ..core.metrics import EventLoopLagMonitor, LATENCY_BUCKETS, metrics
+from ..models.analysis_job import JOB_DONE
+from ..services.analysis_worker import analysis_worker
+from ..services.local_analyzer import local_analyzer
+from .message_editor import ThrottledMessageEditor
+from .repository import bot_repository
+from .state import UserState, UserStateStore
 
 logger = logging.getLogger(__name__)
 
+Handler = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[Any]]
+
 
 class MoodDiaryBot:
     """Telegram Bot для ведения дневника настроения"""
@@ -28,52 +37,86 @@ class MoodDiaryBot:
     def __init__(self):
         self.token = settings.TELEGRAM_BOT_TOKEN
         self.application = None
-        self._user_states: Dict[int, Dict[str, Any]] = {}  # Состояния пользователей
+        self.states = UserStateStore()  # Незавершенные диалоги пользователей
+        self.loop_lag = EventLoopLagMonitor()
     
-    def setup_application(self):
-        """Настройка приложения бота"""
+    def setup_application(self, webhook: bool = False):
+        """
+        Настройка приложения бота
+        
+        Args:
+            webhook: обновления будут передаваться через process_webhook_update
+        """
         if not self.token:
             logger.error("❌ Telegram Bot Token не настроен!")
             return None
         
         # Создаем приложение
-        self.application = Application.builder().token(self.token).build()
+        builder = Application.builder().token(self.token)
+        if settings.TELEGRAM_API_BASE_URL:
+            base_url = settings.TELEGRAM_API_BASE_URL.rstrip("/")
+            builder = builder.base_url(f"{base_url}/bot").base_file_url(f"{base_url}/file/bot")
+        if webhook:
+            # Обновления приходят в маршрут API, Updater для polling не нужен
+            builder = builder.updater(None)
+        self.application = builder.build()
         
         # Добавляем обработчики команд
-        self.application.add_handler(CommandHandler("start", self.start_command))
-        self.application.add_handler(CommandHandler("help", self.help_command))
-        self.application.add_handler(CommandHandler("mood", self.mood_command))
-        self.application.add_handler(CommandHandler("stats", self.stats_command))
-        self.application.add_handler(CommandHandler("recommendations", self.recommendations_command))
-        self.application.add_handler(CommandHandler("analytics", self.analytics_command))
+        self.application.add_handler(CommandHandler("start", self._timed("start", self.start_command)))
+        self.application.add_handler(CommandHandler("help", self._timed("help", self.help_command)))
+        self.application.add_handler(CommandHandler("mood", self._timed("mood", self.mood_command)))
+        self.application.add_handler(CommandHandler("stats", self._timed("stats", self.stats_command)))
+        self.application.add_handler(CommandHandler(
+            "recommendations", self._timed("recommendations", self.recommendations_command)
+        ))
+        self.application.add_handler(CommandHandler("analytics", self._timed("analytics", self.analytics_command)))
         
         # Обработчик callback-кнопок
-        self.application.add_handler(CallbackQueryHandler(self.handle_callback))
+        self.application.add_handler(CallbackQueryHandler(self._timed("callback", self.handle_callback)))
         
         # Обработчик текстовых сообщений
-        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        self.application.add_handler(MessageHandler(
+            filters.TEXT & ~filters.COMMAND, self._timed("message", self.handle_message)
+        ))
         
         logger.info("✅ Telegram Bot настроен")
         return self.application
     
+    def _timed(self, name: str, handler: Handler) -> Handler:
+        """
+        Обработчик с замером времени в гистограмме bot_handler_<name>_seconds
+        Вместе с event_loop_lag_seconds показывает, что обработчик ждет БД,
+        а не держит event loop
+        """
+        histogram = metrics.histogram(f"bot_handler_{name}_seconds", LATENCY_BUCKETS, f"Время обработчика {name}")
+        
+        @functools.wraps(handler)
+        async def timed_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            started_at = time.perf_counter()
+            try:
+                return await handler(update, context)
+            finally:
+                histogram.observe(time.perf_counter() - started_at)
+        
+        return timed_handler
+    
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /start"""
         user = update.effective_user
         chat_id = update.effective_chat.id
         
         # Регистрируем пользователя в БД
-        with SessionLocal() as db:
-            user_data = {
-                "username": user.username,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "language_code": user.language_code or "ru"
-            }
-            
-            db_user, created = user_crud.get_or_create(db, user.id, user_data)
-            
-            if created:
-                welcome_text = f"""
+        user_data = {
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "language_code": user.language_code or "ru"
+        }
+        
+        db_user, created = await bot_repository.register_user(user.id, user_data)
+        
+        if created:
+            welcome_text = f"""
 🎉 Добро пожаловать в AI Mood Diary Bot, {user.first_name or 'друг'}!
 
 Я помогу вам вести дневник настроения и анализировать эмоциональное состояние с помощью искусственного интеллекта.
@@ -87,15 +130,15 @@ class MoodDiaryBot:
 
 Начните с команды /mood чтобы записать настроение дня!
 """
-            else:
-                welcome_text = f"""
+        else:
+            welcome_text = f"""
 👋 С возвращением, {user.first_name or 'друг'}!
 
 У вас уже {db_user.mood_entries_count} записей в дневнике. Продолжаем отслеживать ваше настроение!
 
 Используйте /mood для новой записи или /stats для статистики.
 """
-        
+
         # Создаем клавиатуру
         keyboard = [
             [KeyboardButton("📝 Записать настроение"), KeyboardButton("📊 Моя статистика")],
@@ -146,21 +189,17 @@ class MoodDiaryBot:
         user_id = update.effective_user.id
         
         # Проверяем, есть ли уже запись на сегодня
-        with SessionLocal() as db:
-            today_entry = mood_entry_crud.get_by_user_and_date(db, user_id, date.today())
-            
-            if today_entry:
-                await update.message.reply_text(
-                    f"📅 На сегодня у вас уже есть запись с оценкой {today_entry.mood_score}/10.\n\n"
-                    f"Хотите посмотреть статистику (/stats) или записать настроение на завтра?"
-                )
-                return
+        today_entry = await bot_repository.get_entry_for_date(user_id, date.today())
+        
+        if today_entry:
+            await update.message.reply_text(
+                f"📅 На сегодня у вас уже есть запись с оценкой {today_entry.mood_score}/10.\n\n"
+                f"Хотите посмотреть статистику (/stats) или записать настроение на завтра?"
+            )
+            return
         
         # Сохраняем состояние пользователя
-        self._user_states[user_id] = {
-            "action": "waiting_mood_score",
-            "step": 1
-        }
+        await self.states.set(user_id, UserState(action="waiting_mood_score", step=1))
         
         # Создаем inline клавиатуру с оценками
         keyboard = []
@@ -188,19 +227,18 @@ class MoodDiaryBot:
         """Обработчик команды /stats - статистика пользователя"""
         user_id = update.effective_user.id
         
-        with SessionLocal() as db:
-            # Получаем статистику
-            summary = mood_analyzer.get_mood_summary(db, user_id, 7)
-            
-            if summary.get("total_entries", 0) == 0:
-                await update.message.reply_text(
-                    "📊 У вас пока нет записей в дневнике.\n\n"
-                    "Начните с команды /mood для записи настроения дня!"
-                )
-                return
-            
-            # Формируем текст статистики
-            stats_text = f"""
+        # Получаем статистику
+        summary = await bot_repository.get_mood_summary(user_id, 7)
+        
+        if summary.get("total_entries", 0) == 0:
+            await update.message.reply_text(
+                "📊 У вас пока нет записей в дневнике.\n\n"
+                "Начните с команды /mood для записи настроения дня!"
+            )
+            return
+        
+        # Формируем текст статистики
+        stats_text = f"""
 📊 *Ваша статистика за {summary['period_days']} дней:*
 
 📈 Всего записей: {summary['total_entries']}
@@ -210,79 +248,77 @@ class MoodDiaryBot:
 
 💾 Последняя запись: {summary.get('latest_entry_date', 'нет данных')}
 """
-            
-            # Добавляем распределение тональности
-            if summary.get('sentiment_distribution'):
-                sentiment = summary['sentiment_distribution']
-                stats_text += f"\n🎯 *Распределение настроения:*\n"
-                stats_text += f"• Позитивное: {sentiment.get('positive', 0)} дней\n"
-                stats_text += f"• Нейтральное: {sentiment.get('neutral', 0)} дней\n"
-                stats_text += f"• Негативное: {sentiment.get('negative', 0)} дней\n"
-            
-            # Добавляем кнопки для дополнительных действий
-            keyboard = [
-                [InlineKeyboardButton("📈 Подробная аналитика", callback_data="analytics")],
-                [InlineKeyboardButton("💡 Рекомендации", callback_data="recommendations")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(stats_text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+
+        # Добавляем распределение тональности
+        if summary.get('sentiment_distribution'):
+            sentiment = summary['sentiment_distribution']
+            stats_text += f"\n🎯 *Распределение настроения:*\n"
+            stats_text += f"• Позитивное: {sentiment.get('positive', 0)} дней\n"
+            stats_text += f"• Нейтральное: {sentiment.get('neutral', 0)} дней\n"
+            stats_text += f"• Негативное: {sentiment.get('negative', 0)} дней\n"
+        
+        # Добавляем кнопки для дополнительных действий
+        keyboard = [
+            [InlineKeyboardButton("📈 Подробная аналитика", callback_data="analytics")],
+            [InlineKeyboardButton("💡 Рекомендации", callback_data="recommendations")]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        await update.message.reply_text(stats_text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
     
     async def recommendations_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /recommendations - рекомендации"""
         user_id = update.effective_user.id
         
-        with SessionLocal() as db:
-            recommendations = mood_analyzer.get_recommendations_for_user(db, user_id)
-            
-            if recommendations.get("error"):
-                await update.message.reply_text(
-                    "❌ Произошла ошибка при получении рекомендаций.\n"
-                    "Попробуйте позже или напишите /help"
-                )
-                return
-            
-            # Формируем текст рекомендаций
-            rec_text = f"💡 *Персональные рекомендации*\n\n"
-            
-            if recommendations.get("average_mood"):
-                rec_text += f"📊 Среднее настроение: {recommendations['average_mood']}/10\n"
-                rec_text += f"📅 Период анализа: {recommendations.get('period', 'последние записи')}\n\n"
-            
-            # AI рекомендации
-            ai_recs = recommendations.get("ai_recommendations", [])
-            if ai_recs:
-                rec_text += "🧠 *Рекомендации от ИИ:*\n"
-                for i, rec in enumerate(ai_recs, 1):
-                    rec_text += f"{i}. {rec}\n"
-                rec_text += "\n"
-            
-            # Общие рекомендации
-            general_recs = recommendations.get("general_recommendations", [])
-            if general_recs:
-                rec_text += "🎯 *Общие рекомендации:*\n"
-                for rec in general_recs:
-                    rec_text += f"• {rec}\n"
-            
-            await update.message.reply_text(rec_text, parse_mode=ParseMode.MARKDOWN)
+        recommendations = await bot_repository.get_recommendations(user_id)
+        
+        if recommendations.get("error"):
+            await update.message.reply_text(
+                "❌ Произошла ошибка при получении рекомендаций.\n"
+                "Попробуйте позже или напишите /help"
+            )
+            return
+        
+        # Формируем текст рекомендаций
+        rec_text = f"💡 *Персональные рекомендации*\n\n"
+        
+        if recommendations.get("average_mood"):
+            rec_text += f"📊 Среднее настроение: {recommendations['average_mood']}/10\n"
+            rec_text += f"📅 Период анализа: {recommendations.get('period', 'последние записи')}\n\n"
+        
+        # AI рекомендации
+        ai_recs = recommendations.get("ai_recommendations", [])
+        if ai_recs:
+            rec_text += "🧠 *Рекомендации от ИИ:*\n"
+            for i, rec in enumerate(ai_recs, 1):
+                rec_text += f"{i}. {rec}\n"
+            rec_text += "\n"
+        
+        # Общие рекомендации
+        general_recs = recommendations.get("general_recommendations", [])
+        if general_recs:
+            rec_text += "🎯 *Общие рекомендации:*\n"
+            for rec in general_recs:
+                rec_text += f"• {rec}\n"
+        
+        await update.message.reply_text(rec_text, parse_mode=ParseMode.MARKDOWN)
     
     async def analytics_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /analytics - подробная аналитика"""
         user_id = update.effective_user.id
         
-        with SessionLocal() as db:
-            # Получаем аналитику за месяц
-            analytics = mood_entry_crud.get_mood_analytics(db, user_id, "month")
-            
-            if analytics.get("total_entries", 0) == 0:
-                await update.message.reply_text(
-                    "📈 Недостаточно данных для аналитики.\n\n"
-                    "Ведите дневник регулярно для получения подробной статистики!"
-                )
-                return
-            
-            # Формируем текст аналитики
-            analytics_text = f"""
+        # Получаем аналитику за месяц
+        analytics = await bot_repository.get_mood_analytics(user_id, "month")
+        
+        if analytics.get("total_entries", 0) == 0:
+            await update.message.reply_text(
+                "📈 Недостаточно данных для аналитики.\n\n"
+                "Ведите дневник регулярно для получения подробной статистики!"
+            )
+            return
+        
+        # Формируем текст аналитики
+        analytics_text = f"""
 📈 *Подробная аналитика за месяц:*
 
 📊 *Общие показатели:*
@@ -296,24 +332,24 @@ class MoodDiaryBot:
 
 📅 *Активность по дням:*
 """
-            
-            # Добавляем информацию о последних днях
-            daily_data = analytics.get('daily_averages', [])
-            if daily_data:
-                for day in daily_data[-7:]:  # Последние 7 дней
-                    analytics_text += f"• {day['date']}: {day['average_mood']}/10\n"
-            
-            # Кнопка для веб-интерфейса
-            keyboard = [
-                [InlineKeyboardButton("🌐 Открыть веб-дашборд", url="http://localhost:3000")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-                analytics_text, 
-                reply_markup=reply_markup, 
-                parse_mode=ParseMode.MARKDOWN
-            )
+
+        # Добавляем информацию о последних днях
+        daily_data = analytics.get('daily_averages', [])
+        if daily_data:
+            for day in daily_data[-7:]:  # Последние 7 дней
+                analytics_text += f"• {day['date']}: {day['average_mood']}/10\n"
+        
+        # Кнопка для веб-интерфейса
+        keyboard = [
+            [InlineKeyboardButton("🌐 Открыть веб-дашборд", url="http://localhost:3000")]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        await update.message.reply_text(
+            analytics_text, 
+            reply_markup=reply_markup, 
+            parse_mode=ParseMode.MARKDOWN
+        )
     
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик callback кнопок"""
@@ -328,13 +364,10 @@ class MoodDiaryBot:
             score = float(data.split("_")[-1])
             
             # Обновляем состояние пользователя
-            if user_id not in self._user_states:
-                self._user_states[user_id] = {}
-            
-            self._user_states[user_id].update({
-                "action": "waiting_mood_text",
-                "mood_score": score
-            })
+            user_state = await self.states.get(user_id) or UserState()
+            user_state.action = "waiting_mood_text"
+            user_state.mood_score = score
+            await self.states.set(user_id, user_state)
             
             await query.edit_message_text(
                 f"✅ Оценка настроения: {score}/10\n\n"
@@ -371,11 +404,11 @@ class MoodDiaryBot:
             return
         
         # Обработка состояний пользователя
-        user_state = self._user_states.get(user_id, {})
+        user_state = await self.states.get(user_id)
         
-        if user_state.get("action") == "waiting_mood_text":
+        if user_state and user_state.action == "waiting_mood_text":
             # Пользователь отправил описание настроения
-            mood_score = user_state.get("mood_score")
+            mood_score = user_state.mood_score
             mood_text = message_text
             
             if len(mood_text) < 10:
@@ -389,8 +422,7 @@ class MoodDiaryBot:
             await self._save_mood_entry(update, user_id, mood_score, mood_text)
             
             # Очищаем состояние
-            if user_id in self._user_states:
-                del self._user_states[user_id]
+            await self.states.delete(user_id)
         else:
             # Обычное сообщение
             await update.message.reply_text(
@@ -400,58 +432,109 @@ class MoodDiaryBot:
     async def _save_mood_entry(self, update: Update, user_id: int, mood_score: float, mood_text: str):
         """Сохранение записи настроения"""
         try:
-            with SessionLocal() as db:
-                # Создаем запись настроения
-                entry_data = MoodEntryCreate(
-                    mood_score=mood_score,
-                    mood_text=mood_text,
-                    entry_date=datetime.now()
+            # Создаем запись, увеличиваем счетчик и ставим запись в очередь анализа
+            job = await bot_repository.save_mood_entry(user_id, mood_score, mood_text)
+            
+            # Мгновенный локальный анализ, пока запись ждет Gemini
+            preview = local_analyzer.analyze(mood_text, mood_score)
+            
+            header = (
+                f"✅ *Запись сохранена!*\n\n"
+                f"📊 Оценка: {mood_score}/10\n"
+                f"📝 Описание: {mood_text[:100]}{'...' if len(mood_text) > 100 else ''}\n\n"
+                f"⚡ Первое впечатление: {self._get_sentiment_emoji(preview['sentiment_label'])} "
+                f"{preview['dominant_emotion']}\n"
+            )
+            
+            # Отправляем подтверждение, его же потом дополняем результатами анализа
+            status_message = await update.message.reply_text(
+                header + "🧠 Анализирую с помощью ИИ...",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            
+            # Анализ в фоне: обработчик не ждет Gemini и бот отвечает другим пользователям
+            self.application.create_task(self._send_analysis(status_message, header, job.id))
+        
+        except Exception as e:
+            logger.error(f"Ошибка сохранения записи: {e}")
+            await update.message.reply_text(
+                "❌ Произошла ошибка при сохранении записи. Попробуйте позже."
+            )
+    
+    async def _send_analysis(self, status_message: Message, header: str, job_id: int):
+        """
+        Выполнить задачу анализа и показать результат в сообщении о сохранении
+        При потоковом анализе сообщение дополняется по мере ответа модели
+        """
+        editor = ThrottledMessageEditor(status_message, settings.BOT_EDIT_INTERVAL)
+        
+        async def on_progress(fields: Dict[str, Any]):
+            editor.update(self._format_analysis(header, fields, done=False))
+        
+        try:
+            # После дедлайна пользователь получает локальный анализ, ответ модели сохранится позже
+            with deadline_scope(settings.BOT_ANALYSIS_DEADLINE):
+                job = await analysis_worker.run_job(
+                    job_id,
+                    timeout=settings.BOT_ANALYSIS_DEADLINE or settings.GEMINI_TIMEOUT * 2,
+                    on_progress=on_progress if settings.BOT_STREAM_ANALYSIS else None
                 )
-                
-                mood_entry = mood_entry_crud.create(db, entry_data, user_id)
-                
-                # Увеличиваем счетчик у пользователя
-                user_crud.increment_mood_entries(db, user_id)
-                
-                # Отправляем подтверждение
-                await update.message.reply_text(
-                    f"✅ *Запись сохранена!*\n\n"
-                    f"📊 Оценка: {mood_score}/10\n"
-                    f"📝 Описание: {mood_text[:100]}{'...' if len(mood_text) > 100 else ''}\n\n"
-                    f"🧠 Анализирую с помощью ИИ...",
-                    parse_mode=ParseMode.MARKDOWN
+            
+            analysis = None
+            if job and job.status == JOB_DONE:
+                analysis = await bot_repository.get_analysis(job.mood_entry_id)
+            
+            if analysis:
+                await editor.finish(self._format_analysis(header, {
+                    "dominant_emotion": analysis.dominant_emotion,
+                    "sentiment_label": analysis.sentiment_label,
+                    "recommendations": analysis.recommendations,
+                    "insights": analysis.insights,
+                }, done=True))
+            else:
+                # Задача осталась в очереди и будет повторена воркером
+                await editor.finish(
+                    header + "\n⚠️ Анализ временно недоступен, но запись сохранена.\n"
+                    "Анализ будет выполнен позже. Используйте /stats для просмотра статистики."
                 )
-                
-                # Запускаем AI анализ асинхронно
-                analysis = await mood_analyzer.analyze_and_save(db, mood_entry)
-                
-                if analysis:
-                    # Отправляем результат анализа
-                    analysis_text = f"""
-🧠 *Анализ завершен!*
-
-🎭 Доминирующая эмоция: {analysis.dominant_emotion or 'неопределено'}
-📈 Тональность: {self._get_sentiment_emoji(analysis.sentiment_label)} {analysis.sentiment_label or 'нейтральная'}
+        
+        except Exception as e:
+            logger.error(f"Ошибка отправки анализа: {e}")
+    
+    def _format_analysis(self, header: str, analysis: Dict[str, Any], done: bool) -> str:
+        """Текст сообщения с анализом. Пока анализ идет, еще не полученные поля заменяет многоточие"""
+        placeholder = "..."
+        dominant_emotion = analysis.get("dominant_emotion")
+        sentiment_label = analysis.get("sentiment_label")
+        recommendations = analysis.get("recommendations")
+        insights = analysis.get("insights")
+        
+        if done:
+            title = "🧠 *Анализ завершен!*"
+            dominant_emotion = dominant_emotion or "неопределено"
+            sentiment = f"{self._get_sentiment_emoji(sentiment_label)} {sentiment_label or 'нейтральная'}"
+            recommendations = recommendations or "Продолжайте вести дневник для лучшего анализа"
+            insights = insights or "Ваши записи помогают лучше понять эмоциональные паттерны"
+        else:
+            title = "🧠 *Анализирую с помощью ИИ...*"
+            dominant_emotion = dominant_emotion or placeholder
+            sentiment = f"{self._get_sentiment_emoji(sentiment_label)} {sentiment_label}" if sentiment_label else placeholder
+            recommendations = recommendations or placeholder
+            insights = insights or placeholder
+        
+        return f"""{header}
+{title}
+
+🎭 Доминирующая эмоция: {dominant_emotion}
+📈 Тональность: {sentiment}
 
 💡 *Рекомендация:*
-{analysis.recommendations or 'Продолжайте вести дневник для лучшего анализа'}
+{recommendations}
 
 🔍 *Инсайт:*
-{analysis.insights or 'Ваши записи помогают лучше понять эмоциональные паттерны'}
+{insights}
 """
-                    await update.message.reply_text(analysis_text, parse_mode=ParseMode.MARKDOWN)
-                else:
-                    await update.message.reply_text(
-                        "⚠️ Анализ временно недоступен, но запись сохранена.\n"
-                        "Используйте /stats для просмотра статистики."
-                    )
-                
-        except Exception as e:
-            logger.error(f"Ошибка сохранения записи: {e}")
-            await update.message.reply_text(
-                "❌ Произошла ошибка при сохранении записи. Попробуйте позже."
-            )
-    
+
     def _get_sentiment_emoji(self, sentiment: str) -> str:
         """Получить эмодзи для тональности"""
         emoji_map = {
@@ -461,6 +544,73 @@ class MoodDiaryBot:
         }
         return emoji_map.get(sentiment, "🤔")
     
+    @property
+    def is_running(self) -> bool:
+        """Приложение бота запущено и обрабатывает обновления"""
+        return self.application is not None and self.application.running
+    
+    @property
+    def webhook_url(self) -> str:
+        return settings.BOT_WEBHOOK_URL.rstrip("/") + settings.BOT_WEBHOOK_PATH
+    
+    @property
+    def webhook_secret(self) -> str:
+        """
+        Секрет заголовка X-Telegram-Bot-Api-Secret-Token
+        Без BOT_WEBHOOK_SECRET выводится из токена бота: у всех воркеров
+        uvicorn он одинаковый, и setWebhook одного воркера не ломает
+        проверку у остальных
+        """
+        if settings.BOT_WEBHOOK_SECRET:
+            return settings.BOT_WEBHOOK_SECRET
+        return hashlib.sha256(f"webhook:{self.token}".encode()).hexdigest()
+    
+    def verify_webhook_secret(self, secret: Optional[str]) -> bool:
+        """Проверить секрет из заголовка запроса webhook"""
+        return secret is not None and hmac.compare_digest(secret.encode(), self.webhook_secret.encode())
+    
+    async def start_webhook(self):
+        """
+        Запуск бота в режиме webhook
+        Обновления принимает маршрут FastAPI и передает в process_webhook_update,
+        поэтому бот масштабируется вместе с воркерами uvicorn
+        """
+        if not self.application:
+            logger.error("❌ Приложение бота не инициализировано")
+            return
+        
+        await self.application.initialize()
+        await self.application.start()
+        self.loop_lag.start()
+        
+        if not self.states.shared:
+            logger.warning("⚠️ Состояния диалогов хранятся в памяти: при нескольких воркерах диалог /mood может прерваться")
+        
+        # Ожидающие обновления не сбрасываем: при перезапуске одного воркера их примут остальные
+        try:
+            await self.application.bot.set_webhook(
+                url=self.webhook_url,
+                secret_token=self.webhook_secret,
+                allowed_updates=Update.ALL_TYPES
+            )
+            logger.info(f"✅ Telegram Bot запущен в режиме webhook: {self.webhook_url}")
+        except Exception as e:
+            logger.error(f"❌ Не удалось установить webhook: {e}")
+    
+    async def process_webhook_update(self, data: Dict[str, Any]):
+        """Передать обновление из запроса webhook в очередь обработки"""
+        update = Update.de_json(data, self.application.bot)
+        await self.application.update_queue.put(update)
+    
+    async def stop_webhook(self):
+        """Остановка бота в режиме webhook. Сам webhook остается: его обслуживают другие воркеры"""
+        if not self.is_running:
+            return
+        
+        await self.loop_lag.stop()
+        await self.application.stop()
+        await self.application.shutdown()
+    
     async def run_polling(self):
         """Запуск бота в режиме polling"""
         if not self.application:
@@ -472,6 +622,7 @@ class MoodDiaryBot:
         try:
             await self.application.initialize()
             await self.application.start()
+            self.loop_lag.start()
             await self.application.updater.start_polling(
                 drop_pending_updates=True,
                 allowed_updates=Update.ALL_TYPES
@@ -492,7 +643,7 @@ class MoodDiaryBot:
                 signal.signal(sig, lambda s, f: signal_handler())
             
             await stop_event.wait()
-            
+        
         except Exception as e:
             logger.error(f"❌ Ошибка запуска бота: {e}")
             import traceback
@@ -501,6 +652,7 @@ class MoodDiaryBot:
         finally:
             logger.info("🔄 Останавливаю бота...")
             try:
+                await self.loop_lag.stop()
                 await self.application.stop()
                 await self.application.shutdown()
             except Exception as e:
@@ -0,0 +1,91 @@
+"""
+Постепенное обновление сообщения бота
+Правки одного сообщения не чаще заданного интервала, чтобы не упираться
+в лимиты Telegram на редактирование
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from telegram import Message
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottledMessageEditor:
+    """
+    Редактирует одно сообщение на месте
+    
+    update не ждет сети: промежуточный текст сохраняется, и отложенная
+    правка отправляет только последнюю версию не раньше чем через
+    min_interval секунд после предыдущей. finish отправляет итоговый
+    текст, отменив ожидающую промежуточную правку. Ошибки Telegram
+    пишутся в лог и не прерывают анализ
+    """
+    
+    def __init__(self, message: Message, min_interval: float, parse_mode: Optional[str] = ParseMode.MARKDOWN):
+        self.message = message
+        self.min_interval = min_interval
+        self.parse_mode = parse_mode
+        self._last_text = message.text
+        self._last_edit = 0.0
+        self._pending: Optional[str] = None
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    def update(self, text: str) -> None:
+        """Запланировать промежуточную правку"""
+        self._pending = text
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush())
+    
+    async def finish(self, text: str) -> None:
+        """Отправить итоговый текст"""
+        self._pending = None
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        
+        await self._wait_interval()
+        await self._edit(text, retry=True)
+    
+    async def _flush(self) -> None:
+        """Отправить последнюю промежуточную версию, выдержав интервал"""
+        await self._wait_interval()
+        text, self._pending = self._pending, None
+        if text is not None:
+            await self._edit(text, retry=False)
+    
+    async def _wait_interval(self) -> None:
+        delay = self._last_edit + self.min_interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    
+    async def _edit(self, text: str, retry: bool) -> None:
+        """Изменить текст сообщения. Итоговую правку повторяем после RetryAfter"""
+        if text == self._last_text:
+            return
+        
+        try:
+            await self.message.edit_text(text, parse_mode=self.parse_mode)
+        except RetryAfter as e:
+            logger.warning(f"Telegram ограничил правки сообщения на {e.retry_after}с")
+            if not retry:
+                return
+            await asyncio.sleep(e.retry_after)
+            await self._edit(text, retry=False)
+            return
+        except BadRequest as e:
+            # Например, "message is not modified" или сообщение удалено
+            logger.debug(f"Правка сообщения отклонена: {e}")
+            return
+        except TelegramError as e:
+            logger.warning(f"Ошибка правки сообщения: {e}")
+            return
+        finally:
+            self._last_edit = time.monotonic()
+        
+        self._last_text = text
@@ -0,0 +1,83 @@
+"""
+Доступ Telegram Bot к данным
+Запросы выполняются через асинхронные сессии, поэтому обработчики бота
+только ждут БД и не блокируют event loop для остальных чатов
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.database import AsyncSessionLocal
+from ..crud.analysis_job import analysis_job_crud
+from ..crud.mood_entry import async_mood_entry_crud
+from ..crud.user import async_user_crud
+from ..models.ai_analysis import AIAnalysis
+from ..models.analysis_job import AnalysisJob
+from ..models.mood_entry import MoodEntry
+from ..models.user import User
+from ..schemas import MoodEntryCreate
+from ..services.mood_analyzer import mood_analyzer
+
+
+class BotRepository:
+    """
+    Данные для обработчиков бота
+    
+    Каждый метод открывает свою асинхронную сессию и возвращает готовые
+    значения. Сессии создаются с expire_on_commit=False, поэтому колонки
+    возвращенных объектов доступны после закрытия сессии, а связи нужно
+    загрузить внутри метода
+    """
+    
+    async def register_user(self, telegram_id: int, user_data: Dict[str, Any]) -> Tuple[User, bool]:
+        """Получить пользователя по Telegram ID или создать его"""
+        async with AsyncSessionLocal() as db:
+            return await async_user_crud.get_or_create(db, telegram_id, user_data)
+    
+    async def get_entry_for_date(self, user_id: int, entry_date: date) -> Optional[MoodEntry]:
+        """Запись пользователя за день"""
+        async with AsyncSessionLocal() as db:
+            return await async_mood_entry_crud.get_by_user_and_date(db, user_id, entry_date)
+    
+    async def get_mood_summary(self, user_id: int, days: int = 7) -> Dict[str, Any]:
+        """Сводка настроения за последние дни"""
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(mood_analyzer.get_mood_summary, user_id, days)
+    
+    async def get_recommendations(self, user_id: int) -> Dict[str, Any]:
+        """Рекомендации по последним записям"""
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(mood_analyzer.get_recommendations_for_user, user_id)
+    
+    async def get_mood_analytics(self, user_id: int, period: str = "month") -> Dict[str, Any]:
+        """Аналитика настроения за период"""
+        async with AsyncSessionLocal() as db:
+            return await async_mood_entry_crud.get_mood_analytics(db, user_id, period)
+    
+    async def save_mood_entry(self, user_id: int, mood_score: float, mood_text: str) -> AnalysisJob:
+        """
+        Сохранить запись, увеличить счетчик пользователя и поставить запись в очередь анализа
+        
+        Returns:
+            Задача анализа записи
+        """
+        entry_in = MoodEntryCreate(mood_score=mood_score, mood_text=mood_text, entry_date=datetime.now())
+        async with AsyncSessionLocal() as db:
+            mood_entry = await async_mood_entry_crud.create(db, entry_in, user_id)
+            await async_user_crud.increment_mood_entries(db, user_id)
+            
+            # Задача анализа хранится в БД и переживет перезапуск бота
+            return await db.run_sync(analysis_job_crud.enqueue, mood_entry.id)
+    
+    async def get_analysis(self, entry_id: int) -> Optional[AIAnalysis]:
+        """AI анализ записи или None, если записи или анализа нет"""
+        async with AsyncSessionLocal() as db:
+            mood_entry = await async_mood_entry_crud.get_by_id(db, entry_id)
+            if mood_entry is None:
+                return None
+            # Связь загружаем, пока сессия открыта
+            return await db.run_sync(lambda session: mood_entry.ai_analysis)
+
+
+# Создаем экземпляр репозитория
+bot_repository = BotRepository()
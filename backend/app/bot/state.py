@@ -0,0 +1,219 @@
+"""
+Состояния диалогов пользователей с Telegram Bot
+Хранилище выбирается настройкой BOT_STATE_BACKEND: память процесса,
+таблица bot_user_states в основной БД или Redis. Общее хранилище
+позволяет нескольким процессам бота вести диалог одного пользователя
+"""
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.metrics import metrics
+from ..crud.bot_user_state import bot_user_state_crud
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis нужен только при заданном REDIS_URL
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+STATE_BACKENDS = ("memory", "sql", "redis")
+
+
+class UserState:
+    """
+    Состояние диалога одного пользователя
+    Фиксированный набор полей в __slots__: без словаря атрибутов у каждого
+    объекта, поэтому тысячи незавершенных диалогов занимают мало памяти
+    """
+    
+    __slots__ = ("action", "step", "mood_score", "expires_at")
+    
+    def __init__(self, action: Optional[str] = None, step: Optional[int] = None, mood_score: Optional[float] = None):
+        self.action = action
+        self.step = step
+        self.mood_score = mood_score
+        self.expires_at = 0.0  # Используется только хранилищем в памяти
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Заданные поля для постоянного хранилища"""
+        fields = {"action": self.action, "step": self.step, "mood_score": self.mood_score}
+        return {name: value for name, value in fields.items() if value is not None}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UserState":
+        return cls(action=data.get("action"), step=data.get("step"), mood_score=data.get("mood_score"))
+
+
+class MemoryStateBackend:
+    """
+    Состояния в памяти процесса с TTL и ограничением размера
+    
+    Срок каждого состояния продлевается при сохранении и переносит его в
+    конец очереди, поэтому очередь упорядочена по сроку: очистка снимает
+    просроченные состояния с начала очереди, пока не встретит живое.
+    При превышении max_size вытесняются самые давно измененные диалоги
+    """
+    
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._states: "OrderedDict[int, UserState]" = OrderedDict()
+        self.expired = metrics.counter("bot_state_memory_expired", "Просроченные состояния бота в памяти")
+        self.evicted = metrics.counter("bot_state_memory_evicted", "Вытесненные по размеру состояния бота")
+    
+    def sweep(self) -> int:
+        """
+        Удалить просроченные состояния
+        
+        Returns:
+            Количество удаленных состояний
+        """
+        now = time.monotonic()
+        removed = 0
+        while self._states:
+            user_id, state = next(iter(self._states.items()))
+            if state.expires_at > now:
+                break
+            del self._states[user_id]
+            removed += 1
+        
+        self.expired.inc(removed)
+        return removed
+    
+    async def get(self, user_id: int) -> Optional[UserState]:
+        state = self._states.get(user_id)
+        if state is None:
+            return None
+        
+        if state.expires_at <= time.monotonic():
+            del self._states[user_id]
+            self.expired.inc()
+            return None
+        return state
+    
+    async def set(self, user_id: int, state: UserState) -> None:
+        self.sweep()
+        state.expires_at = time.monotonic() + self.ttl
+        self._states[user_id] = state
+        self._states.move_to_end(user_id)
+        while len(self._states) > self.max_size:
+            self._states.popitem(last=False)
+            self.evicted.inc()
+    
+    async def delete(self, user_id: int) -> None:
+        self._states.pop(user_id, None)
+    
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+class SQLStateBackend:
+    """Состояния в таблице bot_user_states основной БД"""
+    
+    # Очистка просроченных строк раз в столько записей
+    PRUNE_EVERY = 100
+    
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._writes = 0
+    
+    async def get(self, user_id: int) -> Optional[UserState]:
+        async with AsyncSessionLocal() as db:
+            data = await db.run_sync(bot_user_state_crud.get, user_id)
+        return UserState.from_dict(data) if data is not None else None
+    
+    async def set(self, user_id: int, state: UserState) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(bot_user_state_crud.set, user_id, state.to_dict(), self.ttl)
+            
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                await db.run_sync(bot_user_state_crud.prune)
+    
+    async def delete(self, user_id: int) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(bot_user_state_crud.delete, user_id)
+
+
+class RedisStateBackend:
+    """Состояния в Redis, срок жизни задается через EXPIRE"""
+    
+    KEY_PREFIX = "bot_state:"
+    
+    def __init__(self, url: str, ttl: int):
+        self.ttl = ttl
+        self.client = aioredis.from_url(url)
+    
+    async def get(self, user_id: int) -> Optional[UserState]:
+        raw = await self.client.get(f"{self.KEY_PREFIX}{user_id}")
+        return UserState.from_dict(json.loads(raw)) if raw else None
+    
+    async def set(self, user_id: int, state: UserState) -> None:
+        await self.client.set(f"{self.KEY_PREFIX}{user_id}", json.dumps(state.to_dict()), ex=self.ttl)
+    
+    async def delete(self, user_id: int) -> None:
+        await self.client.delete(f"{self.KEY_PREFIX}{user_id}")
+
+
+class UserStateStore:
+    """
+    Хранилище состояний диалогов бота
+    Ошибки хранилища не ломают обработчик: чтение считается отсутствием
+    состояния, и пользователь начинает диалог заново
+    """
+    
+    def __init__(self):
+        self.backend = self._create_backend()
+        self.errors = metrics.counter("bot_state_errors", "Ошибки хранилища состояний бота")
+    
+    def _create_backend(self):
+        """Хранилище по BOT_STATE_BACKEND, по умолчанию Redis при заданном REDIS_URL, иначе таблица в БД"""
+        backend = settings.BOT_STATE_BACKEND.lower() or ("redis" if settings.REDIS_URL else "sql")
+        if backend not in STATE_BACKENDS:
+            logger.warning(f"⚠️ Неизвестное хранилище состояний бота {backend}, используется sql")
+            backend = "sql"
+        
+        if backend == "memory":
+            return MemoryStateBackend(settings.BOT_STATE_TTL, settings.BOT_STATE_MEMORY_SIZE)
+        if backend == "redis":
+            if settings.REDIS_URL and aioredis is not None:
+                return RedisStateBackend(settings.REDIS_URL, settings.BOT_STATE_TTL)
+            logger.warning("⚠️ Для состояний бота в Redis нужны REDIS_URL и пакет redis, состояния хранятся в БД")
+        return SQLStateBackend(settings.BOT_STATE_TTL)
+    
+    @property
+    def shared(self) -> bool:
+        """Состояния видны всем процессам бота"""
+        return not isinstance(self.backend, MemoryStateBackend)
+    
+    async def get(self, user_id: int) -> Optional[UserState]:
+        """Состояние пользователя или None"""
+        try:
+            return await self.backend.get(user_id)
+        except Exception as e:
+            logger.warning(f"Ошибка чтения состояния бота: {e}")
+            self.errors.inc()
+            return None
+    
+    async def set(self, user_id: int, state: UserState) -> None:
+        """Сохранить состояние пользователя и продлить его срок"""
+        try:
+            await self.backend.set(user_id, state)
+        except Exception as e:
+            logger.warning(f"Ошибка записи состояния бота: {e}")
+            self.errors.inc()
+    
+    async def delete(self, user_id: int) -> None:
+        """Завершить диалог пользователя"""
+        try:
+            await self.backend.delete(user_id)
+        except Exception as e:
+            logger.warning(f"Ошибка удаления состояния бота: {e}")
+            self.errors.inc()
@@ -0,0 +1,42 @@
+"""
+Прием обновлений Telegram в режиме webhook
+Маршрут подключается к приложению FastAPI: запрос проверяется по
+секретному заголовку, а обновление передается в очередь Application бота
+"""
+
+import logging
+
+from fastapi import APIRouter, HTTPException, Request
+
+from ..core.config import settings
+from .bot import mood_bot
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+webhook_router = APIRouter()
+
+
+@webhook_router.post(settings.BOT_WEBHOOK_PATH, include_in_schema=False)
+async def telegram_webhook(request: Request):
+    """
+    Обновление от Telegram
+    Ответ не ждет обработки: обработчики бота выполняются в Application.
+    При ошибке Telegram повторит доставку
+    """
+    if not mood_bot.verify_webhook_secret(request.headers.get(SECRET_TOKEN_HEADER)):
+        logger.warning("⚠️ Запрос webhook с неверным секретным токеном")
+        raise HTTPException(status_code=403, detail="Неверный секретный токен")
+    
+    if not mood_bot.is_running:
+        raise HTTPException(status_code=503, detail="Telegram Bot не запущен")
+    
+    try:
+        data = await request.json()
+        await mood_bot.process_webhook_update(data)
+    except (ValueError, TypeError, KeyError) as e:
+        logger.error(f"❌ Некорректное обновление Telegram: {e}")
+        raise HTTPException(status_code=400, detail="Некорректное обновление")
+    
+    return {"ok": True}
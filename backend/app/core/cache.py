@@ -0,0 +1,53 @@
+"""
+Простой кэш в памяти процесса с ограниченным временем жизни значений
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Кэш с временем жизни (TTL) и ограничением размера
+    Рассчитан на использование из одного event loop, блокировки не нужны
+    """
+    
+    def __init__(self, ttl: float, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Получить значение или None, если его нет или срок истек"""
+        item = self._items.get(key)
+        if item is None:
+            return None
+        
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            return None
+        
+        self._items.move_to_end(key)
+        return value
+    
+    def set(self, key: Hashable, value: Any) -> None:
+        """Сохранить значение на ttl секунд"""
+        if self.ttl <= 0:
+            return
+        
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+    
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Удалить значение по ключу или очистить весь кэш"""
+        if key is None:
+            self._items.clear()
+        else:
+            self._items.pop(key, None)
+    
+    def __len__(self) -> int:
+        return len(self._items)
@@ -22,6 +22,19 @@ class Settings(BaseSettings):
     
     # База данных
     DATABASE_URL: str = "sqlite:///./mood_diary.db"
+    DB_ECHO: bool = False  # Логи всех SQL запросов (только для отладки)
+    DEBUG_SQL_HEADER: bool = False  # Заголовок X-SQL-Statements с числом SQL запросов (только для отладки)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # Секунды ожидания свободного соединения в пуле
+    
+    # Профиль SQLite: WAL позволяет боту и API читать параллельно с одним писателем
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # Ожидание блокировки вместо "database is locked"
+    SQLITE_CACHE_SIZE_KB: int = 20000
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 МБ
+    SQLITE_BEGIN_MODE: str = "DEFERRED"  # DEFERRED или IMMEDIATE (сразу берет блокировку записи)
     
     # Безопасность
     SECRET_KEY: str = "your-super-secret-key-change-this-in-production"
@@ -31,17 +44,80 @@ class Settings(BaseSettings):
     
     # Telegram Bot
     TELEGRAM_BOT_TOKEN: str = ""
-    BOT_WEBHOOK_URL: str = ""
+    BOT_WEBHOOK_URL: str = ""  # Публичный адрес API: если задан, бот работает в режиме webhook внутри API
     BOT_WEBHOOK_PATH: str = "/webhook"
+    BOT_WEBHOOK_SECRET: str = ""  # Секрет заголовка X-Telegram-Bot-Api-Secret-Token (по умолчанию из токена)
+    TELEGRAM_API_BASE_URL: str = ""  # Свой Bot API сервер вместо https://api.telegram.org
+    BOT_STREAM_ANALYSIS: bool = True  # Показывать анализ по мере ответа Gemini
+    BOT_EDIT_INTERVAL: float = 1.0  # Секунды между правками одного сообщения (лимиты Telegram)
+    BOT_ANALYSIS_DEADLINE: float = 8.0  # Секунды до ответа пользователю, дальше локальный анализ (0 - без дедлайна)
+    BOT_STATE_BACKEND: str = ""  # memory, sql или redis; пусто - redis при заданном REDIS_URL, иначе sql
+    BOT_STATE_TTL: int = 3600  # Секунды хранения незавершенного диалога (/mood без описания)
+    BOT_STATE_MEMORY_SIZE: int = 10000  # Диалогов в памяти процесса для BOT_STATE_BACKEND=memory
     
     # Google Gemini AI
     GEMINI_API_KEY: str = ""
+    GEMINI_MAX_CONCURRENCY: int = 4  # Одновременных запросов к Gemini на процесс
+    GEMINI_TIMEOUT: float = 30.0  # Секунды ожидания ответа модели, дальше fallback анализ
+    GEMINI_STRUCTURED_OUTPUT: bool = True  # JSON ответ по схеме (response_schema) вместо разбора текста
+    GEMINI_BATCH_WINDOW_MS: int = 200  # Окно сбора записей в один пакетный промпт
+    GEMINI_BATCH_MAX_SIZE: int = 16  # Записей в пакете (1 - без пакетирования)
+    GEMINI_RPM: int = 15  # Квота запросов в минуту (бесплатный тариф gemini-1.5-flash, 0 - без ограничения)
+    GEMINI_TPM: int = 1000000  # Квота токенов в минуту (0 - без ограничения)
+    GEMINI_MAX_QUOTA_WAIT: float = 10.0  # Ожидание квоты дольше - сразу локальный анализ
+    GEMINI_MIN_CONCURRENCY: int = 1  # Нижняя граница адаптивного лимита одновременных запросов
+    GEMINI_LATENCY_TARGET: float = 10.0  # Ответ медленнее - лимит одновременных запросов снижается
+    GEMINI_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Ошибок подряд до открытия circuit breaker
+    GEMINI_CIRCUIT_RECOVERY_TIMEOUT: float = 30.0  # Секунды до пробного запроса после открытия
+    GEMINI_CIRCUIT_HALF_OPEN_CALLS: int = 1  # Пробных запросов в состоянии half-open
+    GEMINI_HEDGE_ENABLED: bool = True  # Дублировать запрос, который отвечает дольше обычного
+    GEMINI_HEDGE_PERCENTILE: float = 0.95  # Дубль уходит после этого перцентиля задержки ответов
+    GEMINI_HEDGE_MAX_RATIO: float = 0.1  # Доля запросов, которые можно дублировать
+    GEMINI_HEDGE_MIN_SAMPLES: int = 20  # Ответов до первого дубля (раньше перцентиль неточен)
+    GEMINI_FAKE_MODEL: bool = False  # Локальная модель вместо Gemini (нагрузочные тесты без квоты)
+    GEMINI_FAKE_LATENCY_MS: float = 800.0  # Медиана задержки ответа локальной модели
+    GEMINI_FAKE_LATENCY_SIGMA: float = 0.5  # Разброс задержки (сигма логнормального распределения)
+    GEMINI_FAKE_ERROR_RATE: float = 0.0  # Доля запросов, завершающихся ошибкой
+    GEMINI_FAKE_MALFORMED_RATE: float = 0.0  # Доля ответов с обрезанным JSON
+    API_REQUEST_DEADLINE: float = 25.0  # Секунды на AI вызовы внутри HTTP запроса (0 - без дедлайна)
+    
+    # Очередь фонового AI анализа
+    ANALYSIS_WORKER_ENABLED: bool = True  # Воркеры внутри процесса API (иначе отдельный run_worker.py)
+    ANALYSIS_WORKER_CONCURRENCY: int = 4
+    ANALYSIS_JOB_POLL_INTERVAL: float = 1.0  # Секунды между проверками очереди
+    ANALYSIS_JOB_MAX_ATTEMPTS: int = 5
+    ANALYSIS_JOB_RETRY_BASE: float = 10.0  # Задержка повтора: base * 2^(попытка - 1) секунд
+    ANALYSIS_JOB_STALE_AFTER: float = 300.0  # Задача в running дольше - воркер упал, возвращаем в очередь
+    
+    # Кэш AI анализа по содержимому записи
+    ANALYSIS_CACHE_ENABLED: bool = True
+    ANALYSIS_CACHE_TTL: int = 604800  # Секунды хранения результата (7 дней)
+    ANALYSIS_CACHE_MEMORY_SIZE: int = 1024  # Результатов в LRU кэше процесса
+    ANALYSIS_CACHE_MAX_ROWS: int = 50000  # Строк в таблице analysis_cache
+    
+    # Ночная генерация AI инсайтов (вместе с воркерами анализа)
+    INSIGHTS_PRECOMPUTE_ENABLED: bool = True
+    INSIGHTS_PRECOMPUTE_HOUR: int = 3  # Час запуска по UTC
+    INSIGHTS_PRECOMPUTE_DAYS: int = 30  # Период инсайтов, как по умолчанию у /analytics/insights
+    INSIGHTS_PRECOMPUTE_RPM: int = 5  # Запросов к Gemini в минуту при генерации (0 - без ограничения)
+    INSIGHTS_ACTIVE_DAYS: int = 7  # Активные пользователи - с записями за столько дней
+    
+    # Промпт AI инсайтов
+    INSIGHTS_PROMPT_TOKEN_BUDGET: int = 500  # Оценка токенов промпта, в которую укладываются записи
+    INSIGHTS_DETAIL_DAYS: int = 14  # Дней подробными записями, раньше - помесячные итоги
+    INSIGHTS_ENTRY_MAX_CHARS: int = 120  # Символов текста одной записи в промпте
+    INSIGHTS_MIN_RECENT_ENTRIES: int = 3  # Самые свежие записи входят в промпт всегда
+    INSIGHTS_HISTORY_MONTHS: int = 12  # Месяцев итогов истории в промпте
+    
+    # Redis (постоянный кэш анализа и состояния бота вместо таблиц в БД, если задан)
+    REDIS_URL: str = ""
     
     # Логирование
     LOG_LEVEL: str = "INFO"
     
     # Аналитика
     ENABLE_ANALYTICS: bool = True
+    GLOBAL_STATS_CACHE_TTL: int = 30  # Секунды кэширования /analytics/global-stats (0 - без кэша)
     
     # Rate Limiting
     RATE_LIMIT_REQUESTS: int = 100
@@ -66,6 +142,16 @@ class Settings(BaseSettings):
         """Проверка режима разработки"""
         return self.ENVIRONMENT.lower() == "development"
     
+    @property
+    def bot_webhook_enabled(self) -> bool:
+        """Бот принимает обновления через webhook маршрут API, а не polling"""
+        return bool(self.BOT_WEBHOOK_URL and self.TELEGRAM_BOT_TOKEN)
+    
+    @property
+    def is_sqlite(self) -> bool:
+        """Используется ли SQLite"""
+        return self.DATABASE_URL.startswith("sqlite")
+    
     @property
     def is_production(self) -> bool:
         """Проверка продакшн режима"""
@@ -2,25 +2,172 @@
 Настройка подключения к базе данных SQLite
 """
 
-from sqlalchemy import create_engine, MetaData
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import create_engine, event, MetaData
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import logging
 
 from .config import settings
 
 logger = logging.getLogger(__name__)
 
+# Асинхронные драйверы для синхронных URL из настроек
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """
+    Преобразовать URL базы данных в URL с асинхронным драйвером
+
+    sqlite:///./mood_diary.db -> sqlite+aiosqlite:///./mood_diary.db
+    postgresql://... -> postgresql+asyncpg://...
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+
+    # Драйвер уже указан явно (например, sqlite+aiosqlite)
+    if url.drivername != backend:
+        return database_url
+
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Нет асинхронного драйвера для базы данных: {backend}")
+
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def get_engine_options(database_url: str, is_async: bool = False) -> dict:
+    """Параметры движка из профиля в настройках"""
+    url = make_url(database_url)
+    is_sqlite = url.get_backend_name() == "sqlite"
+    options = {"echo": settings.DB_ECHO}
+    
+    if is_sqlite:
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+        }
+        # In-memory база живет в одном соединении, пул для нее не настраиваем
+        if url.database in (None, "", ":memory:"):
+            return options
+    
+    # Пул указываем явно: для aiosqlite по умолчанию используется NullPool
+    options.update(
+        poolclass=AsyncAdaptedQueuePool if is_async else QueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=not is_sqlite
+    )
+    return options
+
+
+def configure_sqlite_engine(sync_engine) -> None:
+    """
+    Применить профиль SQLite к каждому новому соединению
+    
+    WAL + synchronous=NORMAL позволяют API и боту читать параллельно
+    с одним писателем, busy_timeout заставляет ждать блокировку
+    вместо немедленной ошибки "database is locked"
+    """
+    begin_mode = settings.SQLITE_BEGIN_MODE.upper()
+    
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        if begin_mode != "DEFERRED":
+            # Отключаем собственное управление транзакциями драйвера,
+            # BEGIN выполняется в обработчике "begin"
+            dbapi_connection.isolation_level = None
+        
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA cache_size={-int(settings.SQLITE_CACHE_SIZE_KB)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.close()
+    
+    if begin_mode != "DEFERRED":
+        @event.listens_for(sync_engine, "begin")
+        def do_begin(conn):
+            conn.exec_driver_sql(f"BEGIN {begin_mode}")
+
+
+class SQLStatementCounter:
+    """Количество SQL запросов, выполненных в рамках одного HTTP запроса"""
+    
+    def __init__(self):
+        self.count = 0
+
+
+# Счетчик текущего запроса. Значение наследуется задачами и greenlet-ами
+# run_sync, поэтому учитываются запросы и синхронного, и асинхронного кода
+_sql_statement_counter: ContextVar[Optional[SQLStatementCounter]] = ContextVar(
+    "sql_statement_counter", default=None
+)
+
+
+def install_statement_counter(sync_engine) -> None:
+    """Считать SQL запросы движка для отладочного заголовка"""
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        counter = _sql_statement_counter.get()
+        if counter is not None:
+            counter.count += 1
+
+
+@contextmanager
+def track_sql_statements():
+    """Считать SQL запросы внутри блока: with track_sql_statements() as counter"""
+    counter = SQLStatementCounter()
+    token = _sql_statement_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _sql_statement_counter.reset(token)
+
+
 # Создание движка базы данных
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    echo=settings.is_development  # Включаем логи SQL в режиме разработки
+    **get_engine_options(settings.DATABASE_URL)
+)
+
+# Асинхронный движок для FastAPI endpoints
+async_engine = create_async_engine(
+    get_async_database_url(settings.DATABASE_URL),
+    **get_engine_options(settings.DATABASE_URL, is_async=True)
 )
 
+if settings.is_sqlite:
+    configure_sqlite_engine(engine)
+    configure_sqlite_engine(async_engine.sync_engine)
+
+if settings.DEBUG_SQL_HEADER:
+    install_statement_counter(engine)
+    install_statement_counter(async_engine.sync_engine)
+
 # Создание сессии
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронная сессия. expire_on_commit=False: после commit объекты отдаются
+# в ответ API, а ленивая загрузка атрибутов вне run_sync невозможна
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Базовый класс для моделей
 Base = declarative_base()
 
@@ -31,7 +178,7 @@ metadata = MetaData()
 def get_db():
     """
     Зависимость для получения сессии базы данных
-    Используется в FastAPI endpoints
+    Используется ботом и скриптами
     """
     db = SessionLocal()
     try:
@@ -40,16 +187,43 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    Зависимость для получения асинхронной сессии базы данных
+    Используется в FastAPI endpoints, чтобы запросы к БД не блокировали event loop
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def create_tables():
     """Создание всех таблиц в базе данных"""
     try:
         Base.metadata.create_all(bind=engine)
+        create_missing_indexes()
         logger.info("✅ Таблицы базы данных созданы успешно")
     except Exception as e:
         logger.error(f"❌ Ошибка создания таблиц: {e}")
         raise
 
 
+def create_missing_indexes():
+    """
+    Создать индексы, которых нет в уже существующих таблицах
+    create_all пропускает существующие таблицы вместе с их индексами,
+    поэтому индексы, добавленные в модели позже, создаем отдельно
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+async def dispose_engines():
+    """Закрыть соединения пулов при остановке приложения"""
+    await async_engine.dispose()
+    engine.dispose()
+
+
 def drop_tables():
     """Удаление всех таблиц (используется для тестов)"""
     try:
@@ -57,4 +231,4 @@ def drop_tables():
         logger.info("🗑️ Таблицы базы данных удалены")
     except Exception as e:
         logger.error(f"❌ Ошибка удаления таблиц: {e}")
-        raise
\ No newline at end of file
+        raise
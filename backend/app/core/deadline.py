@@ -0,0 +1,48 @@
+"""
+Дедлайн запроса
+Маршрут FastAPI или обработчик бота задает срок, а вызовы Gemini ниже по
+стеку узнают оставшееся время через contextvar, не передавая его явно
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# Момент истечения дедлайна по time.monotonic(), None - дедлайна нет
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceededError(Exception):
+    """Дедлайн запроса истек раньше ответа модели"""
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Ограничить операции внутри блока seconds секундами
+    Вложенный блок может только сократить внешний дедлайн, но не продлить.
+    seconds None или <= 0 - блок без собственного дедлайна
+    """
+    if not seconds or seconds <= 0:
+        yield
+        return
+    
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_remaining() -> Optional[float]:
+    """Секунды до дедлайна текущего запроса (не меньше 0) или None, если дедлайна нет"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
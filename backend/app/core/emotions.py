@@ -0,0 +1,86 @@
+"""
+Канонический словарь эмоций
+Эмоции из ответов Gemini и mock анализа приводятся к этому набору при записи,
+чтобы средние по эмоциям считались в SQL через GROUP BY по emotion_id
+"""
+
+from typing import Any, Dict, Optional
+
+# ID эмоции -> каноническое название. ID хранятся в БД, менять их нельзя
+EMOTIONS = {
+    1: "радость",
+    2: "грусть",
+    3: "тревога",
+    4: "спокойствие",
+    5: "раздражение",
+    6: "воодушевление",
+}
+
+EMOTION_IDS = {name: emotion_id for emotion_id, name in EMOTIONS.items()}
+
+# Синонимы и английские названия, которые встречаются в ответах модели
+EMOTION_ALIASES = {
+    "счастье": 1,
+    "веселье": 1,
+    "joy": 1,
+    "happiness": 1,
+    "печаль": 2,
+    "тоска": 2,
+    "sadness": 2,
+    "беспокойство": 3,
+    "страх": 3,
+    "стресс": 3,
+    "anxiety": 3,
+    "fear": 3,
+    "умиротворение": 4,
+    "calm": 4,
+    "calmness": 4,
+    "злость": 5,
+    "гнев": 5,
+    "раздражительность": 5,
+    "anger": 5,
+    "irritation": 5,
+    "вдохновение": 6,
+    "энтузиазм": 6,
+    "excitement": 6,
+    "enthusiasm": 6,
+}
+
+
+def get_emotion_id(name: str) -> Optional[int]:
+    """ID канонической эмоции по названию или синониму, None для неизвестных"""
+    key = name.strip().lower().replace("ё", "е")
+    if key in EMOTION_IDS:
+        return EMOTION_IDS[key]
+    return EMOTION_ALIASES.get(key)
+
+
+def canonicalize_emotions(emotions: Optional[Dict[str, Any]]) -> Dict[int, float]:
+    """
+    Привести эмоции анализа к каноническому словарю
+    
+    Неизвестные эмоции и нечисловые значения пропускаются, значения
+    ограничиваются диапазоном 0..1. Если несколько синонимов попали
+    в одну эмоцию, берется максимальное значение
+    
+    Returns:
+        {emotion_id: значение}
+    """
+    scores = {}
+    for name, value in (emotions or {}).items():
+        if not isinstance(name, str) or isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        
+        emotion_id = get_emotion_id(name)
+        if emotion_id is None:
+            continue
+        
+        value = min(max(float(value), 0.0), 1.0)
+        scores[emotion_id] = max(scores.get(emotion_id, 0.0), value)
+    
+    return dict(sorted(scores.items()))
+
+
+def canonical_emotion_names(emotions: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Эмоции анализа с каноническими названиями: {"радость": значение}"""
+    return {EMOTIONS[emotion_id]: value for emotion_id, value in canonicalize_emotions(emotions).items()}
@@ -0,0 +1,148 @@
+"""
+Реестр метрик процесса
+Счетчики, текущие значения и гистограммы накапливаются в памяти и отдаются в /health
+"""
+
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Optional, Sequence, Union
+
+
+class Counter:
+    """Монотонно растущий счетчик"""
+    
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self.value = 0
+    
+    def inc(self, amount: int = 1) -> None:
+        """Увеличить счетчик"""
+        self.value += amount
+
+
+class Gauge:
+    """Текущее значение, которое может расти и уменьшаться"""
+    
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self.value = 0
+    
+    def set(self, value: Union[int, float]) -> None:
+        """Установить значение"""
+        self.value = value
+
+
+class Histogram:
+    """
+    Распределение наблюдений по корзинам
+    Корзина с границей le считает наблюдения <= le (накопительно, как в Prometheus)
+    """
+    
+    def __init__(self, name: str, buckets: Sequence[float], description: str = ""):
+        self.name = name
+        self.description = description
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value: Union[int, float]) -> None:
+        """Учесть наблюдение"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    @property
+    def value(self) -> Dict[str, Any]:
+        """Количество, сумма и накопительные значения корзин"""
+        cumulative = {}
+        total = 0
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            total += count
+            cumulative[bound] = total
+        return {"count": self.count, "sum": round(self.sum, 4), "buckets": cumulative}
+
+
+class MetricsRegistry:
+    """
+    Именованные метрики процесса
+    Повторный запрос метрики с тем же именем возвращает уже созданный объект
+    """
+    
+    def __init__(self):
+        self._counters: Dict[str, Counter] = {}
+        self._gauges: Dict[str, Gauge] = {}
+        self._histograms: Dict[str, Histogram] = {}
+    
+    def counter(self, name: str, description: str = "") -> Counter:
+        """Получить счетчик, создав его при первом обращении"""
+        if name not in self._counters:
+            self._counters[name] = Counter(name, description)
+        return self._counters[name]
+    
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        """Получить текущее значение, создав его при первом обращении"""
+        if name not in self._gauges:
+            self._gauges[name] = Gauge(name, description)
+        return self._gauges[name]
+    
+    def histogram(self, name: str, buckets: Sequence[float], description: str = "") -> Histogram:
+        """Получить гистограмму, создав ее при первом обращении"""
+        if name not in self._histograms:
+            self._histograms[name] = Histogram(name, buckets, description)
+        return self._histograms[name]
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущие значения всех метрик"""
+        values = {name: counter.value for name, counter in self._counters.items()}
+        values.update({name: gauge.value for name, gauge in self._gauges.items()})
+        values.update({name: histogram.value for name, histogram in self._histograms.items()})
+        return dict(sorted(values.items()))
+
+
+# Глобальный реестр метрик процесса
+metrics = MetricsRegistry()
+
+# Корзины времени обработчиков и задержки event loop, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class EventLoopLagMonitor:
+    """
+    Задержка event loop
+    
+    Фоновая задача засыпает на interval секунд и замеряет, насколько позже
+    она проснулась. Опоздание - время, на которое синхронный код занял loop
+    и не дал выполняться остальным задачам
+    """
+    
+    def __init__(self, name: str = "event_loop_lag", interval: float = 0.05):
+        self.interval = interval
+        self.lag = metrics.histogram(f"{name}_seconds", LATENCY_BUCKETS, "Опоздание event loop")
+        self.max_lag = metrics.gauge(f"{name}_max_seconds", "Наибольшее опоздание event loop")
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Запустить замеры в текущем event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+    
+    async def _run(self) -> None:
+        while True:
+            started_at = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started_at - self.interval)
+            self.lag.observe(lag)
+            if lag > self.max_lag.value:
+                self.max_lag.set(round(lag, 4))
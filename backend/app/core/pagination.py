@@ -0,0 +1,60 @@
+"""
+Курсорная (keyset) пагинация
+Курсор - непрозрачная строка с ключом последней отданной строки
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+
+def encode_cursor(*values: Any) -> str:
+    """Закодировать ключ последней строки страницы в курсор"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    Раскодировать курсор в список значений ключа
+    
+    Raises:
+        ValueError: если курсор поврежден
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Некорректный курсор: {cursor}") from e
+    
+    if not isinstance(values, list):
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    return values
+
+
+def decode_entry_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """Курсор записей настроения: (entry_date, id). Пустой курсор - первая страница"""
+    if not cursor:
+        return None
+    
+    values = decode_cursor(cursor)
+    try:
+        entry_date, entry_id = values
+        return datetime.fromisoformat(entry_date), int(entry_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Некорректный курсор: {cursor}") from e
+
+
+def decode_id_cursor(cursor: str) -> Optional[int]:
+    """Курсор по первичному ключу: (id,). Пустой курсор - первая страница"""
+    if not cursor:
+        return None
+    
+    values = decode_cursor(cursor)
+    try:
+        (row_id,) = values
+        return int(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Некорректный курсор: {cursor}") from e
@@ -0,0 +1,115 @@
+"""
+Переносимые SQL функции и запросы для разных диалектов базы данных
+"""
+
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import Integer
+
+
+class day_number(FunctionElement):
+    """
+    Номер календарного дня для даты или даты-времени
+    
+    Разность номеров дней равна количеству дней между датами,
+    что позволяет считать последовательности дней (streak) в SQL
+    """
+    type = Integer()
+    inherit_cache = True
+    name = "day_number"
+
+
+@compiles(day_number)
+def _day_number_default(element, compiler, **kw):
+    arg = compiler.process(list(element.clauses)[0], **kw)
+    return f"(CAST({arg} AS DATE) - DATE '1970-01-01')"
+
+
+@compiles(day_number, "sqlite")
+def _day_number_sqlite(element, compiler, **kw):
+    arg = compiler.process(list(element.clauses)[0], **kw)
+    return f"CAST(julianday(date({arg})) AS INTEGER)"
+
+
+@compiles(day_number, "mysql")
+def _day_number_mysql(element, compiler, **kw):
+    arg = compiler.process(list(element.clauses)[0], **kw)
+    return f"TO_DAYS({arg})"
+
+
+def _row_values(row) -> dict:
+    """Заданные значения колонок ORM объекта"""
+    return {
+        column.name: getattr(row, column.key)
+        for column in type(row).__table__.columns
+        if getattr(row, column.key) is not None
+    }
+
+
+def insert_ignore(db: Session, row) -> None:
+    """
+    Вставить строку ORM объекта, если строки с тем же первичным ключом еще нет
+    
+    Объект в сессию не добавляется. Параллельная транзакция, вставившая ту же
+    строку, не приводит к IntegrityError: вставка ждет ее завершения и
+    ничего не делает
+    """
+    table = type(row).__table__
+    values = _row_values(row)
+    
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        statement = postgresql.insert(table).values(**values).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        statement = sqlite.insert(table).values(**values).on_conflict_do_nothing()
+    else:
+        statement = insert(table).values(**values).prefix_with("IGNORE")
+    db.execute(statement)
+
+
+def upsert(db: Session, row) -> None:
+    """
+    Вставить строку ORM объекта или заменить значения строки с тем же первичным ключом
+    
+    Одна команда INSERT ... ON CONFLICT DO UPDATE (ON DUPLICATE KEY UPDATE
+    в MySQL): при одновременной вставке той же строки побеждает последняя
+    запись, а не IntegrityError. Объект в сессию не добавляется
+    """
+    table = type(row).__table__
+    values = _row_values(row)
+    changed = [name for name in values if name not in table.primary_key.columns]
+    
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert_for = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = insert_for(table).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(table.primary_key.columns),
+            set_={name: statement.excluded[name] for name in changed}
+        )
+    else:
+        statement = mysql.insert(table).values(**values)
+        statement = statement.on_duplicate_key_update({name: statement.inserted[name] for name in changed})
+    db.execute(statement)
+
+
+def lock_row(db: Session, model, *criteria):
+    """
+    Строка модели по условию с блокировкой до конца транзакции или None
+    
+    SELECT ... FOR UPDATE, а в SQLite, где FOR UPDATE нет, сначала пустой
+    UPDATE: он начинает транзакцию записи и ждет блокировку БД, поэтому
+    последующее чтение видит изменения всех завершенных транзакций.
+    Несохраненные изменения сессии записываются до чтения, а загруженный
+    объект перечитывается
+    """
+    db.flush()
+    if db.get_bind().dialect.name == "sqlite":
+        table = model.__table__
+        key = table.primary_key.columns.values()[0]
+        db.execute(update(table).where(*criteria).values({key.name: key}))
+    
+    return db.query(model).filter(*criteria).with_for_update().populate_existing().one_or_none()
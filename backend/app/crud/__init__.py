@@ -2,7 +2,19 @@
 CRUD операции для всех моделей
 """
 
-from .user import user_crud
-from .mood_entry import mood_entry_crud
+from .user import user_crud, async_user_crud
+from .mood_entry import mood_entry_crud, async_mood_entry_crud
+from .user_mood_stats import user_mood_stats_crud
+from .mood_daily_rollup import mood_daily_rollup_crud
+from .analysis_emotion import analysis_emotion_crud
+from .analysis_cache import analysis_cache_crud
+from .analysis_job import analysis_job_crud
+from .user_insights import user_insights_crud
+from .user_history_summary import user_history_summary_crud
+from .bot_user_state import bot_user_state_crud
 
-__all__ = ["user_crud", "mood_entry_crud"]
\ No newline at end of file
+__all__ = [
+    "user_crud", "mood_entry_crud", "user_mood_stats_crud", "mood_daily_rollup_crud",
+    "analysis_emotion_crud", "analysis_cache_crud", "analysis_job_crud", "user_insights_crud",
+    "user_history_summary_crud", "bot_user_state_crud", "async_user_crud", "async_mood_entry_crud"
+]
\ No newline at end of file
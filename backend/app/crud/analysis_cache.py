@@ -0,0 +1,64 @@
+"""
+CRUD операции для постоянного кэша AI анализа
+"""
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Optional, Dict, Any
+from datetime import datetime, timedelta
+
+from ..models.analysis_cache import AnalysisCacheEntry
+
+
+class AnalysisCacheCRUD:
+    """Операции с кэшем анализа AnalysisCacheEntry"""
+    
+    def get(self, db: Session, key: str) -> Optional[Dict[str, Any]]:
+        """Результат анализа по ключу, если он есть и срок не истек"""
+        entry = db.query(AnalysisCacheEntry).filter(
+            AnalysisCacheEntry.key == key,
+            AnalysisCacheEntry.expires_at > datetime.utcnow()
+        ).first()
+        return entry.result if entry else None
+    
+    def set(self, db: Session, key: str, result: Dict[str, Any], ttl: int) -> None:
+        """Сохранить результат анализа на ttl секунд, заменив старое значение"""
+        now = datetime.utcnow()
+        db.merge(AnalysisCacheEntry(
+            key=key,
+            result=result,
+            created_at=now,
+            expires_at=now + timedelta(seconds=ttl)
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Тот же ключ только что сохранил параллельный запрос, результат равноценный
+            db.rollback()
+    
+    def prune(self, db: Session, max_rows: int) -> int:
+        """
+        Удалить просроченные строки и самые старые сверх max_rows
+        
+        Returns:
+            Количество удаленных строк
+        """
+        deleted = db.query(AnalysisCacheEntry).filter(
+            AnalysisCacheEntry.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        
+        # Граница по дате сохранения строки с номером max_rows от новых к старым
+        boundary = db.query(AnalysisCacheEntry.created_at).order_by(
+            AnalysisCacheEntry.created_at.desc()
+        ).offset(max_rows).limit(1).scalar()
+        if boundary is not None:
+            deleted += db.query(AnalysisCacheEntry).filter(
+                AnalysisCacheEntry.created_at <= boundary
+            ).delete(synchronize_session=False)
+        
+        db.commit()
+        return deleted
+
+
+# Создаем экземпляр для использования в приложении
+analysis_cache_crud = AnalysisCacheCRUD()
@@ -0,0 +1,121 @@
+"""
+CRUD операции для нормализованных оценок эмоций
+"""
+
+import math
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+
+from ..core.emotions import EMOTIONS, canonicalize_emotions
+from ..models.ai_analysis import AIAnalysis
+from ..models.analysis_emotion import AnalysisEmotion
+from ..models.mood_entry import MoodEntry
+
+
+class AnalysisEmotionCRUD:
+    """Операции с оценками эмоций AnalysisEmotion"""
+    
+    def build_scores(self, emotions: Optional[Dict[str, Any]]) -> List[AnalysisEmotion]:
+        """Строки оценок для JSON эмоций анализа, приведенных к каноническому словарю"""
+        return [
+            AnalysisEmotion(emotion_id=emotion_id, value=value)
+            for emotion_id, value in canonicalize_emotions(emotions).items()
+        ]
+    
+    def get_averages(
+        self,
+        db: Session,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, float]:
+        """
+        Средние значения эмоций пользователя по записям за период
+        
+        Returns:
+            {каноническое название эмоции: среднее значение} в порядке emotion_id
+        """
+        query = db.query(
+            AnalysisEmotion.emotion_id, func.avg(AnalysisEmotion.value)
+        ).join(
+            AIAnalysis, AIAnalysis.id == AnalysisEmotion.analysis_id
+        ).join(
+            MoodEntry, MoodEntry.id == AIAnalysis.mood_entry_id
+        ).filter(MoodEntry.user_id == user_id)
+        
+        if start_date:
+            query = query.filter(MoodEntry.entry_date >= start_date)
+        if end_date:
+            query = query.filter(MoodEntry.entry_date <= end_date)
+        
+        rows = query.group_by(AnalysisEmotion.emotion_id).order_by(AnalysisEmotion.emotion_id).all()
+        return {EMOTIONS[emotion_id]: average for emotion_id, average in rows if emotion_id in EMOTIONS}
+    
+    def averages_from_entries(self, entries: List[MoodEntry]) -> Dict[str, float]:
+        """Средние значения эмоций по уже загруженным записям, как в get_averages"""
+        values = {}
+        for entry in entries:
+            if not entry.ai_analysis:
+                continue
+            for emotion_id, value in canonicalize_emotions(entry.ai_analysis.emotions).items():
+                values.setdefault(emotion_id, []).append(value)
+        
+        # fsum: точная сумма, чтобы округленные средние совпадали с avg() в SQL
+        return {
+            EMOTIONS[emotion_id]: math.fsum(scores) / len(scores)
+            for emotion_id, scores in sorted(values.items())
+        }
+    
+    def backfill_if_empty(self, db: Session) -> bool:
+        """
+        Заполнить таблицу из JSON эмоций, если она пустая, а анализы уже есть
+        Нужно при первом запуске после появления таблицы
+        """
+        has_scores = db.query(AnalysisEmotion.analysis_id).first() is not None
+        has_analyses = db.query(AIAnalysis.id).first() is not None
+        if has_scores or not has_analyses:
+            return False
+        
+        self.rebuild(db)
+        return True
+    
+    def rebuild(self, db: Session, dry_run: bool = False, batch_size: int = 500) -> List[Dict[str, Any]]:
+        """
+        Пересчитать оценки эмоций из AIAnalysis.emotions и найти расхождения
+        
+        Returns:
+            Список расхождений: analysis_id, сохраненные и вычисленные оценки
+        """
+        drift = []
+        last_id = 0
+        while True:
+            analyses = db.query(AIAnalysis).options(
+                selectinload(AIAnalysis.emotion_scores)
+            ).filter(
+                AIAnalysis.id > last_id
+            ).order_by(AIAnalysis.id).limit(batch_size).all()
+            if not analyses:
+                break
+            
+            for analysis in analyses:
+                stored = {score.emotion_id: score.value for score in analysis.emotion_scores}
+                expected = canonicalize_emotions(analysis.emotions)
+                matches = stored.keys() == expected.keys() and all(
+                    abs(stored[emotion_id] - value) < 1e-6 for emotion_id, value in expected.items()
+                )
+                if not matches:
+                    drift.append({"analysis_id": analysis.id, "stored": stored, "expected": expected})
+                    if not dry_run:
+                        analysis.emotion_scores = self.build_scores(analysis.emotions)
+            
+            last_id = analyses[-1].id
+            if not dry_run:
+                db.commit()
+        
+        return drift
+
+
+# Создаем экземпляр для использования в приложении
+analysis_emotion_crud = AnalysisEmotionCRUD()
@@ -0,0 +1,147 @@
+"""
+CRUD операции для очереди задач AI анализа
+"""
+
+from sqlalchemy.orm import Session
+from sqlalchemy import desc, func
+from typing import Optional, Dict
+from datetime import datetime, timedelta
+
+from ..models.analysis_job import AnalysisJob, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED
+
+
+class AnalysisJobCRUD:
+    """Операции с задачами анализа AnalysisJob"""
+    
+    def get_by_id(self, db: Session, job_id: int) -> Optional[AnalysisJob]:
+        """Получить задачу по ID"""
+        return db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+    
+    def get_latest_for_entry(self, db: Session, entry_id: int) -> Optional[AnalysisJob]:
+        """Последняя задача анализа записи"""
+        return db.query(AnalysisJob).filter(
+            AnalysisJob.mood_entry_id == entry_id
+        ).order_by(desc(AnalysisJob.id)).first()
+    
+    def enqueue(self, db: Session, entry_id: int) -> AnalysisJob:
+        """
+        Поставить запись в очередь анализа
+        Незавершенная задача записи переиспользуется, а не дублируется
+        """
+        job = db.query(AnalysisJob).filter(
+            AnalysisJob.mood_entry_id == entry_id,
+            AnalysisJob.status.in_([JOB_QUEUED, JOB_RUNNING])
+        ).first()
+        
+        if job is None:
+            job = AnalysisJob(mood_entry_id=entry_id)
+            db.add(job)
+        elif job.status == JOB_QUEUED:
+            # Повторный запрос отменяет отложенный повтор
+            job.run_after = datetime.utcnow()
+            job.attempts = 0
+        else:
+            # Воркер уже анализирует старый текст: анализ повторится после него
+            job = AnalysisJob(mood_entry_id=entry_id)
+            db.add(job)
+        
+        db.commit()
+        db.refresh(job)
+        return job
+    
+    def claim(self, db: Session, job_id: Optional[int] = None) -> Optional[AnalysisJob]:
+        """
+        Взять готовую к выполнению задачу
+        Условный UPDATE по статусу не дает двум воркерам взять одну задачу
+        
+        Args:
+            job_id: взять конкретную задачу, иначе самую старую готовую
+        """
+        now = datetime.utcnow()
+        query = db.query(AnalysisJob.id).filter(AnalysisJob.status == JOB_QUEUED)
+        if job_id is not None:
+            query = query.filter(AnalysisJob.id == job_id)
+        else:
+            query = query.filter(AnalysisJob.run_after <= now)
+        
+        candidate_ids = [row.id for row in query.order_by(AnalysisJob.run_after, AnalysisJob.id).limit(5)]
+        for candidate_id in candidate_ids:
+            claimed = db.query(AnalysisJob).filter(
+                AnalysisJob.id == candidate_id,
+                AnalysisJob.status == JOB_QUEUED
+            ).update({
+                AnalysisJob.status: JOB_RUNNING,
+                AnalysisJob.locked_at: now,
+                AnalysisJob.attempts: AnalysisJob.attempts + 1,
+                AnalysisJob.updated_at: now
+            }, synchronize_session=False)
+            db.commit()
+            if claimed:
+                return self.get_by_id(db, candidate_id)
+        
+        return None
+    
+    def mark_done(self, db: Session, job: AnalysisJob) -> AnalysisJob:
+        """Отметить задачу выполненной"""
+        job.status = JOB_DONE
+        job.last_error = None
+        job.locked_at = None
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        return job
+    
+    def mark_failed(
+        self,
+        db: Session,
+        job: AnalysisJob,
+        error: str,
+        max_attempts: int,
+        retry_base: float
+    ) -> AnalysisJob:
+        """
+        Записать неудачную попытку
+        Пока попытки не исчерпаны, задача возвращается в очередь
+        с экспоненциальной задержкой retry_base * 2^(attempts - 1)
+        """
+        job.last_error = error[:1000]
+        job.locked_at = None
+        if job.attempts >= max_attempts:
+            job.status = JOB_FAILED
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = JOB_QUEUED
+            job.run_after = datetime.utcnow() + timedelta(seconds=retry_base * 2 ** (job.attempts - 1))
+        
+        db.commit()
+        return job
+    
+    def requeue_stale(self, db: Session, stale_after: float) -> int:
+        """
+        Вернуть в очередь задачи, зависшие в running
+        Воркер мог завершиться посреди анализа (перезапуск, падение процесса)
+        
+        Returns:
+            Количество возвращенных задач
+        """
+        deadline = datetime.utcnow() - timedelta(seconds=stale_after)
+        requeued = db.query(AnalysisJob).filter(
+            AnalysisJob.status == JOB_RUNNING,
+            AnalysisJob.locked_at < deadline
+        ).update({
+            AnalysisJob.status: JOB_QUEUED,
+            AnalysisJob.locked_at: None,
+            AnalysisJob.run_after: datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+        return requeued
+    
+    def count_by_status(self, db: Session) -> Dict[str, int]:
+        """Количество задач по состояниям"""
+        rows = db.query(AnalysisJob.status, func.count(AnalysisJob.id)).group_by(AnalysisJob.status).all()
+        counts = {status: 0 for status in (JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED)}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+
+# Создаем экземпляр для использования в приложении
+analysis_job_crud = AnalysisJobCRUD()
@@ -0,0 +1,61 @@
+"""
+CRUD операции для состояний диалогов Telegram Bot
+"""
+
+from sqlalchemy.orm import Session
+from typing import Optional, Dict, Any
+from datetime import datetime, timedelta
+
+from ..core.sql_functions import upsert
+from ..models.bot_user_state import BotUserState
+
+
+class BotUserStateCRUD:
+    """Операции с состояниями BotUserState"""
+    
+    def get(self, db: Session, telegram_id: int) -> Optional[Dict[str, Any]]:
+        """Состояние пользователя, если оно есть и срок не истек"""
+        row = db.query(BotUserState).filter(
+            BotUserState.telegram_id == telegram_id,
+            BotUserState.expires_at > datetime.utcnow()
+        ).first()
+        return row.state if row else None
+    
+    def set(self, db: Session, telegram_id: int, state: Dict[str, Any], ttl: int) -> None:
+        """
+        Сохранить состояние на ttl секунд, заменив предыдущее
+        Upsert одной командой: если другой воркер одновременно создал строку
+        того же пользователя, остается последнее записанное состояние
+        """
+        now = datetime.utcnow()
+        upsert(db, BotUserState(
+            telegram_id=telegram_id,
+            state=state,
+            updated_at=now,
+            expires_at=now + timedelta(seconds=ttl)
+        ))
+        db.commit()
+    
+    def delete(self, db: Session, telegram_id: int) -> None:
+        """Удалить состояние пользователя"""
+        db.query(BotUserState).filter(
+            BotUserState.telegram_id == telegram_id
+        ).delete(synchronize_session=False)
+        db.commit()
+    
+    def prune(self, db: Session) -> int:
+        """
+        Удалить просроченные состояния
+        
+        Returns:
+            Количество удаленных строк
+        """
+        deleted = db.query(BotUserState).filter(
+            BotUserState.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+
+# Создаем экземпляр для использования в приложении
+bot_user_state_crud = BotUserStateCRUD()
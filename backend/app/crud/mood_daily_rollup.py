@@ -0,0 +1,310 @@
+"""
+CRUD операции для дневных агрегатов настроения и эмоций
+"""
+
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_
+from typing import Optional, List, Dict, Any
+from datetime import datetime, date, time, timedelta
+
+from ..core.emotions import canonical_emotion_names
+from ..core.sql_functions import insert_ignore, lock_row
+from ..models.mood_entry import MoodEntry
+from ..models.mood_daily_rollup import MoodDailyRollup
+from .user_history_summary import user_history_summary_crud
+from .user_mood_stats import mood_bucket
+
+
+def period_start(day: date, group_by: str) -> date:
+    """Первый день периода группировки (day, week, month)"""
+    if group_by == "week":
+        return day - timedelta(days=day.weekday())
+    if group_by == "month":
+        return day.replace(day=1)
+    return day
+
+
+class MoodDailyRollupCRUD:
+    """
+    Операции с дневными агрегатами MoodDailyRollup
+    Методы on_* вызываются до commit вместе с изменением записи или анализа,
+    поэтому агрегаты меняются в той же транзакции
+    """
+    
+    TRACKED_FIELDS = (
+        "entries_count", "mood_sum", "positive_count", "neutral_count",
+        "negative_count", "emotion_sums", "emotion_counts"
+    )
+    
+    def get_for_update(self, db: Session, user_id: int, day: date) -> MoodDailyRollup:
+        """
+        Получить строку дня для изменения, создав ее из записей этого дня при отсутствии
+        Строка блокируется до конца транзакции, как в UserMoodStatsCRUD.get_for_update
+        """
+        criteria = and_(MoodDailyRollup.user_id == user_id, MoodDailyRollup.day == day)
+        rollup = lock_row(db, MoodDailyRollup, criteria)
+        if rollup is None:
+            insert_ignore(db, self.compute_day(db, user_id, day))
+            rollup = lock_row(db, MoodDailyRollup, criteria)
+        user_history_summary_crud.on_day_changed(db, user_id, day)
+        return rollup
+    
+    def on_entry_created(self, db: Session, entry: MoodEntry) -> MoodDailyRollup:
+        """Учесть новую запись. Вызывается до db.add(entry)"""
+        rollup = self.get_for_update(db, entry.user_id, entry.entry_date.date())
+        self._add_score(rollup, entry.mood_score, 1)
+        return rollup
+    
+    def on_entry_updated(self, db: Session, entry: MoodEntry, old_mood_score: float) -> MoodDailyRollup:
+        """Учесть изменение оценки записи (дата записи не меняется)"""
+        rollup = self.get_for_update(db, entry.user_id, entry.entry_date.date())
+        if entry.mood_score != old_mood_score:
+            self._add_score(rollup, old_mood_score, -1)
+            self._add_score(rollup, entry.mood_score, 1)
+        return rollup
+    
+    def on_entry_deleted(self, db: Session, entry: MoodEntry) -> None:
+        """Учесть удаление записи вместе с ее анализом. Вызывается до db.delete(entry)"""
+        rollup = self.get_for_update(db, entry.user_id, entry.entry_date.date())
+        self._add_score(rollup, entry.mood_score, -1)
+        if entry.ai_analysis:
+            self._add_emotions(rollup, entry.ai_analysis.emotions, -1)
+        
+        if rollup.entries_count <= 0:
+            db.delete(rollup)
+    
+    def on_analysis_saved(self, db: Session, entry: MoodEntry, emotions: Optional[Dict[str, Any]]) -> None:
+        """Учесть эмоции нового анализа записи"""
+        if emotions:
+            rollup = self.get_for_update(db, entry.user_id, entry.entry_date.date())
+            self._add_emotions(rollup, emotions, 1)
+    
+    def on_analysis_deleted(self, db: Session, entry: MoodEntry, emotions: Optional[Dict[str, Any]]) -> None:
+        """Учесть удаление анализа записи"""
+        if emotions:
+            rollup = self.get_for_update(db, entry.user_id, entry.entry_date.date())
+            self._add_emotions(rollup, emotions, -1)
+    
+    def _add_score(self, rollup: MoodDailyRollup, mood_score: float, sign: int) -> None:
+        """Добавить (sign=1) или вычесть (sign=-1) оценку из сумм и распределения"""
+        rollup.entries_count += sign
+        rollup.mood_sum += sign * mood_score
+        bucket = mood_bucket(mood_score)
+        setattr(rollup, f"{bucket}_count", getattr(rollup, f"{bucket}_count") + sign)
+    
+    def _add_emotions(self, rollup: MoodDailyRollup, emotions: Optional[Dict[str, Any]], sign: int) -> None:
+        """
+        Добавить или вычесть эмоции анализа в каноническом словаре
+        JSON колонки не отслеживают изменения на месте, поэтому словари присваиваются заново
+        """
+        emotion_sums = dict(rollup.emotion_sums or {})
+        emotion_counts = dict(rollup.emotion_counts or {})
+        
+        for emotion, value in canonical_emotion_names(emotions).items():
+            count = emotion_counts.get(emotion, 0) + sign
+            if count <= 0:
+                emotion_sums.pop(emotion, None)
+                emotion_counts.pop(emotion, None)
+            else:
+                emotion_sums[emotion] = emotion_sums.get(emotion, 0.0) + sign * value
+                emotion_counts[emotion] = count
+        
+        rollup.emotion_sums = emotion_sums
+        rollup.emotion_counts = emotion_counts
+    
+    def _empty_rollup(self, user_id: int, day: date) -> MoodDailyRollup:
+        """Пустая строка дня (объект не добавляется в сессию)"""
+        return MoodDailyRollup(
+            user_id=user_id,
+            day=day,
+            entries_count=0,
+            mood_sum=0.0,
+            positive_count=0,
+            neutral_count=0,
+            negative_count=0,
+            emotion_sums={},
+            emotion_counts={}
+        )
+    
+    def compute_day(self, db: Session, user_id: int, day: date) -> MoodDailyRollup:
+        """Вычислить агрегаты дня из записей и их анализов (объект не добавляется в сессию)"""
+        day_start = datetime.combine(day, time.min)
+        entries = db.query(MoodEntry).options(
+            joinedload(MoodEntry.ai_analysis)
+        ).filter(
+            and_(
+                MoodEntry.user_id == user_id,
+                MoodEntry.entry_date >= day_start,
+                MoodEntry.entry_date < day_start + timedelta(days=1)
+            )
+        ).all()
+        
+        rollup = self._empty_rollup(user_id, day)
+        for entry in entries:
+            self._add_score(rollup, entry.mood_score, 1)
+            if entry.ai_analysis:
+                self._add_emotions(rollup, entry.ai_analysis.emotions, 1)
+        return rollup
+    
+    def get_range(self, db: Session, user_id: int, start_day: date, end_day: date) -> List[MoodDailyRollup]:
+        """Строки дней пользователя в диапазоне [start_day, end_day] по первичному ключу"""
+        return db.query(MoodDailyRollup).filter(
+            and_(
+                MoodDailyRollup.user_id == user_id,
+                MoodDailyRollup.day >= start_day,
+                MoodDailyRollup.day <= end_day
+            )
+        ).order_by(MoodDailyRollup.day).all()
+    
+    def get_series(
+        self,
+        db: Session,
+        user_id: int,
+        start_day: date,
+        end_day: date,
+        group_by: str = "day"
+    ) -> List[Dict[str, Any]]:
+        """
+        Временной ряд за период, сгруппированный по дням, неделям или месяцам
+        
+        Returns:
+            Список периодов по возрастанию даты: date, entries_count, mood_sum,
+            mood_distribution, emotion_sums, emotion_counts
+        """
+        return self.fold_series(self.get_range(db, user_id, start_day, end_day), group_by)
+    
+    def series_from_entries(self, entries: List[MoodEntry], group_by: str = "day") -> List[Dict[str, Any]]:
+        """
+        Временной ряд по уже загруженным записям (с ai_analysis) в формате get_series
+        Дневные агрегаты строятся в памяти и в сессию не добавляются
+        """
+        rollups = {}
+        for entry in entries:
+            day = entry.entry_date.date()
+            if day not in rollups:
+                rollups[day] = self._empty_rollup(entry.user_id, day)
+            self._add_score(rollups[day], entry.mood_score, 1)
+            if entry.ai_analysis:
+                self._add_emotions(rollups[day], entry.ai_analysis.emotions, 1)
+        
+        return self.fold_series([rollups[day] for day in sorted(rollups)], group_by)
+    
+    def fold_series(self, rollups: List[MoodDailyRollup], group_by: str = "day") -> List[Dict[str, Any]]:
+        """Сгруппировать дневные агрегаты по дням, неделям или месяцам"""
+        periods = {}
+        for rollup in rollups:
+            if not rollup.entries_count:
+                continue
+            
+            key = period_start(rollup.day, group_by)
+            if key not in periods:
+                periods[key] = {
+                    "date": key,
+                    "entries_count": 0,
+                    "mood_sum": 0.0,
+                    "mood_distribution": {"positive": 0, "neutral": 0, "negative": 0},
+                    "emotion_sums": {},
+                    "emotion_counts": {}
+                }
+            
+            period = periods[key]
+            period["entries_count"] += rollup.entries_count
+            period["mood_sum"] += rollup.mood_sum
+            for bucket in period["mood_distribution"]:
+                period["mood_distribution"][bucket] += getattr(rollup, f"{bucket}_count")
+            for emotion, total in (rollup.emotion_sums or {}).items():
+                period["emotion_sums"][emotion] = period["emotion_sums"].get(emotion, 0.0) + total
+                period["emotion_counts"][emotion] = (
+                    period["emotion_counts"].get(emotion, 0) + rollup.emotion_counts[emotion]
+                )
+        
+        return [periods[key] for key in sorted(periods)]
+    
+    def backfill_if_empty(self, db: Session) -> bool:
+        """
+        Заполнить таблицу из истории, если она пустая, а записи уже есть
+        Нужно при первом запуске после появления таблицы
+        """
+        has_rollups = db.query(MoodDailyRollup.user_id).first() is not None
+        has_entries = db.query(MoodEntry.id).first() is not None
+        if has_rollups or not has_entries:
+            return False
+        
+        self.rebuild(db)
+        return True
+    
+    def rebuild(self, db: Session, user_ids: Optional[List[int]] = None, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """
+        Пересчитать дневные агрегаты из mood_entries и найти расхождения
+        
+        Args:
+            db: Сессия базы данных
+            user_ids: Пользователи для пересчета (по умолчанию все, у кого есть записи или агрегаты)
+            dry_run: Только проверить расхождения, не сохраняя изменения
+        
+        Returns:
+            Список расхождений: user_id, день, поле, сохраненное и вычисленное значения
+        """
+        if user_ids is None:
+            user_ids = sorted(
+                {row[0] for row in db.query(MoodEntry.user_id).distinct()}
+                | {row[0] for row in db.query(MoodDailyRollup.user_id).distinct()}
+            )
+        
+        drift = []
+        for user_id in user_ids:
+            entry_days = {
+                entry_date.date()
+                for (entry_date,) in db.query(MoodEntry.entry_date).filter(MoodEntry.user_id == user_id)
+            }
+            stored_rows = {
+                rollup.day: rollup
+                for rollup in db.query(MoodDailyRollup).filter(MoodDailyRollup.user_id == user_id)
+            }
+            
+            for day in sorted(entry_days | set(stored_rows)):
+                expected = self.compute_day(db, user_id, day)
+                stored = stored_rows.get(day)
+                
+                if stored is None:
+                    drift.append({"user_id": user_id, "day": day, "field": "row", "stored": None, "expected": "missing"})
+                    if not dry_run:
+                        db.add(expected)
+                    continue
+                
+                if not expected.entries_count:
+                    drift.append({"user_id": user_id, "day": day, "field": "row", "stored": "exists", "expected": None})
+                    if not dry_run:
+                        db.delete(stored)
+                    continue
+                
+                for field in self.TRACKED_FIELDS:
+                    stored_value = getattr(stored, field)
+                    expected_value = getattr(expected, field)
+                    if not _values_match(stored_value, expected_value):
+                        drift.append({
+                            "user_id": user_id, "day": day, "field": field,
+                            "stored": stored_value, "expected": expected_value
+                        })
+                        if not dry_run:
+                            setattr(stored, field, expected_value)
+        
+        if not dry_run:
+            db.commit()
+        return drift
+
+
+def _values_match(stored: Any, expected: Any) -> bool:
+    """Сравнение сохраненного и вычисленного значения с допуском для сумм"""
+    if isinstance(expected, dict):
+        stored = stored or {}
+        return stored.keys() == expected.keys() and all(
+            _values_match(stored[key], expected[key]) for key in expected
+        )
+    if isinstance(expected, float):
+        return stored is not None and abs(stored - expected) < 1e-6
+    return stored == expected
+
+
+# Создаем экземпляр для использования в приложении
+mood_daily_rollup_crud = MoodDailyRollupCRUD()
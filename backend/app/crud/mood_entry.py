@@ -3,12 +3,16 @@ CRUD операции для работы с записями настроени
 """
 
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, desc, func, extract
-from typing import Optional, List, Dict, Any
-from datetime import datetime, date, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, case, desc, func, extract, select
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime, date, time, timedelta
 
 from ..models.mood_entry import MoodEntry
 from ..models.user import User
+from .analysis_emotion import analysis_emotion_crud
+from .mood_daily_rollup import mood_daily_rollup_crud
+from .user_mood_stats import user_mood_stats_crud
 from ..schemas import MoodEntryCreate, MoodEntryUpdate
 
 
@@ -22,11 +26,18 @@ class MoodEntryCRUD:
         ).filter(MoodEntry.id == entry_id).first()
     
     def get_by_user_and_date(self, db: Session, user_id: int, entry_date: date) -> Optional[MoodEntry]:
-        """Получить запись пользователя за конкретную дату"""
+        """
+        Получить запись пользователя за конкретную дату
+        Полуоткрытый интервал [начало дня, начало следующего дня) использует
+        индекс (user_id, entry_date), в отличие от func.date(entry_date)
+        """
+        day_start = datetime.combine(entry_date, time.min)
+        day_end = day_start + timedelta(days=1)
         return db.query(MoodEntry).filter(
             and_(
                 MoodEntry.user_id == user_id,
-                func.date(MoodEntry.entry_date) == entry_date
+                MoodEntry.entry_date >= day_start,
+                MoodEntry.entry_date < day_end
             )
         ).first()
     
@@ -51,6 +62,52 @@ class MoodEntryCRUD:
         
         return query.order_by(desc(MoodEntry.entry_date)).offset(skip).limit(limit).all()
     
+    def get_user_entries_page(
+        self, 
+        db: Session, 
+        user_id: int, 
+        limit: int = 100,
+        after: Optional[Tuple[datetime, int]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Tuple[List[MoodEntry], Optional[Tuple[datetime, int]]]:
+        """
+        Получить страницу записей пользователя после ключа (entry_date, id)
+        
+        Записи идут от новых к старым. Условие по ключу вместо OFFSET
+        продолжает сканирование индекса (user_id, entry_date) с места
+        остановки, поэтому глубокие страницы не медленнее первой, а вставки
+        между запросами не сдвигают страницы
+        
+        Returns:
+            (записи страницы, ключ для следующей страницы или None)
+        """
+        query = db.query(MoodEntry).options(
+            joinedload(MoodEntry.ai_analysis)
+        ).filter(MoodEntry.user_id == user_id)
+        
+        if start_date:
+            query = query.filter(MoodEntry.entry_date >= start_date)
+        if end_date:
+            query = query.filter(MoodEntry.entry_date <= end_date)
+        if after:
+            after_date, after_id = after
+            query = query.filter(or_(
+                MoodEntry.entry_date < after_date,
+                and_(MoodEntry.entry_date == after_date, MoodEntry.id < after_id)
+            ))
+        
+        # Лишняя строка показывает, есть ли следующая страница
+        entries = query.order_by(
+            desc(MoodEntry.entry_date), desc(MoodEntry.id)
+        ).limit(limit + 1).all()
+        
+        if len(entries) <= limit:
+            return entries, None
+        
+        entries = entries[:limit]
+        return entries, (entries[-1].entry_date, entries[-1].id)
+    
     def get_recent_entries(self, db: Session, user_id: int, days: int = 7) -> List[MoodEntry]:
         """Получить последние записи пользователя"""
         start_date = datetime.utcnow() - timedelta(days=days)
@@ -70,6 +127,11 @@ class MoodEntryCRUD:
         entry_data["updated_at"] = datetime.utcnow()
         
         db_entry = MoodEntry(**entry_data)
+        
+        # Статистика и дневные агрегаты обновляются в той же транзакции
+        user_mood_stats_crud.on_entry_created(db, db_entry)
+        mood_daily_rollup_crud.on_entry_created(db, db_entry)
+        
         db.add(db_entry)
         db.commit()
         db.refresh(db_entry)
@@ -81,11 +143,14 @@ class MoodEntryCRUD:
         if not entry:
             return None
         
+        old_mood_score = entry.mood_score
         update_data = entry_in.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(entry, field, value)
         
         entry.updated_at = datetime.utcnow()
+        user_mood_stats_crud.on_entry_updated(db, entry, old_mood_score)
+        mood_daily_rollup_crud.on_entry_updated(db, entry, old_mood_score)
         db.commit()
         db.refresh(entry)
         return entry
@@ -96,15 +161,42 @@ class MoodEntryCRUD:
         if not entry:
             return False
         
+        stats = user_mood_stats_crud.on_entry_deleted(db, entry)
+        mood_daily_rollup_crud.on_entry_deleted(db, entry)
         db.delete(entry)
+        db.flush()
+        user_mood_stats_crud.refresh_last_entry(db, stats)
         db.commit()
         return True
     
-    def get_user_stats(self, db: Session, user_id: int) -> Dict[str, Any]:
-        """Получить статистику пользователя"""
-        entries = db.query(MoodEntry).filter(MoodEntry.user_id == user_id).all()
+    def delete_analysis(self, db: Session, entry: MoodEntry) -> bool:
+        """Удалить AI анализ записи (например, перед повторным анализом)"""
+        if not entry.ai_analysis:
+            return False
+        
+        mood_daily_rollup_crud.on_analysis_deleted(db, entry, entry.ai_analysis.emotions)
+        db.delete(entry.ai_analysis)
+        db.commit()
+        return True
+    
+    def get_user_stats(
+        self, 
+        db: Session, 
+        user_id: int, 
+        latest_entries: Optional[List[MoodEntry]] = None
+    ) -> Dict[str, Any]:
+        """
+        Получить статистику пользователя
+        Итоги, распределение и streak читаются из строки user_mood_stats,
+        окна последних записей - не больше 14 строк по индексу
         
-        if not entries:
+        Args:
+            latest_entries: уже загруженные последние записи пользователя
+                (по убыванию даты), чтобы не запрашивать окна отдельно
+        """
+        stats = user_mood_stats_crud.get(db, user_id)
+        
+        if not stats.entries_count:
             return {
                 "total_entries": 0,
                 "average_mood": 0,
@@ -112,44 +204,63 @@ class MoodEntryCRUD:
                 "streak_days": 0
             }
         
-        # Базовая статистика
-        total_entries = len(entries)
-        average_mood = sum(entry.mood_score for entry in entries) / total_entries
-        
-        # Тренд настроения (сравнение последних 7 дней с предыдущими 7)
-        recent_entries = sorted(entries, key=lambda x: x.entry_date, reverse=True)[:7]
-        previous_entries = sorted(entries, key=lambda x: x.entry_date, reverse=True)[7:14]
+        # Тренд настроения (сравнение последних 7 записей с предыдущими 7)
+        if latest_entries is not None and (
+            len(latest_entries) >= 14 or len(latest_entries) == stats.entries_count
+        ):
+            recent_avg, previous_avg = self._window_averages_from_entries(latest_entries)
+        else:
+            recent_avg, previous_avg = self._get_window_averages(db, user_id)
         
         mood_trend = "stable"
-        if recent_entries and previous_entries:
-            recent_avg = sum(e.mood_score for e in recent_entries) / len(recent_entries)
-            previous_avg = sum(e.mood_score for e in previous_entries) / len(previous_entries)
-            
+        if recent_avg is not None and previous_avg is not None:
             if recent_avg > previous_avg + 0.5:
                 mood_trend = "improving"
             elif recent_avg < previous_avg - 0.5:
                 mood_trend = "declining"
         
-        # Подсчет streak (последовательных дней с записями)
-        streak_days = self._calculate_streak(entries)
-        
         return {
-            "total_entries": total_entries,
-            "average_mood": round(average_mood, 2),
+            "total_entries": stats.entries_count,
+            "average_mood": round(stats.average_mood, 2),
             "mood_trend": mood_trend,
-            "streak_days": streak_days,
-            "last_entry_date": recent_entries[0].entry_date if recent_entries else None
+            "streak_days": user_mood_stats_crud.current_streak(stats),
+            "last_entry_date": stats.last_entry_date,
+            "mood_distribution": stats.mood_distribution
         }
     
-    def get_mood_analytics(
-        self, 
-        db: Session, 
-        user_id: int, 
-        period: str = "month"
-    ) -> Dict[str, Any]:
-        """Получить аналитику настроения за период"""
-        # Определяем период
-        end_date = datetime.utcnow()
+    def _window_averages_from_entries(self, entries: List[MoodEntry]) -> tuple[Optional[float], Optional[float]]:
+        """Средние оценки последних 7 и предыдущих 7 записей из загруженного списка"""
+        # Тот же порядок, что и в _get_window_averages: дата по убыванию, затем id
+        by_id = sorted(entries, key=lambda entry: entry.id)
+        latest = sorted(by_id, key=lambda entry: entry.entry_date, reverse=True)[:14]
+        recent = [entry.mood_score for entry in latest[:7]]
+        previous = [entry.mood_score for entry in latest[7:]]
+        return (
+            sum(recent) / len(recent) if recent else None,
+            sum(previous) / len(previous) if previous else None
+        )
+    
+    def _get_window_averages(self, db: Session, user_id: int) -> tuple[Optional[float], Optional[float]]:
+        """
+        Средние оценки последних 7 записей и 7 записей перед ними
+        Читает не больше 14 строк по индексу (user_id, entry_date)
+        """
+        order = (desc(MoodEntry.entry_date), MoodEntry.id)
+        latest = select(
+            MoodEntry.mood_score,
+            func.row_number().over(order_by=order).label("position")
+        ).where(
+            MoodEntry.user_id == user_id
+        ).order_by(*order).limit(14).subquery()
+        
+        return db.execute(select(
+            func.avg(case((latest.c.position <= 7, latest.c.mood_score))),
+            func.avg(case((latest.c.position > 7, latest.c.mood_score)))
+        )).one()
+    
+    def get_analytics_start(self, period: str, now: Optional[datetime] = None) -> date:
+        """Первый день периода аналитики (week, month, year; по умолчанию месяц)"""
+        end_date = now or datetime.utcnow()
         if period == "week":
             start_date = end_date - timedelta(days=7)
         elif period == "month":
@@ -158,10 +269,24 @@ class MoodEntryCRUD:
             start_date = end_date - timedelta(days=365)
         else:
             start_date = end_date - timedelta(days=30)  # по умолчанию месяц
-        
-        entries = self.get_user_entries(db, user_id, start_date=start_date, end_date=end_date)
-        
-        if not entries:
+        return start_date.date()
+    
+    def get_mood_analytics(
+        self, 
+        db: Session, 
+        user_id: int, 
+        period: str = "month"
+    ) -> Dict[str, Any]:
+        """Получить аналитику настроения за период по дневным агрегатам"""
+        end_date = datetime.utcnow()
+        days = mood_daily_rollup_crud.get_series(
+            db, user_id, self.get_analytics_start(period, end_date), end_date.date()
+        )
+        return self.build_mood_analytics(period, days)
+    
+    def build_mood_analytics(self, period: str, days: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Аналитика настроения по дневному ряду (формат MoodDailyRollupCRUD.get_series)"""
+        if not days:
             return {
                 "period": period,
                 "average_mood": 0,
@@ -169,75 +294,295 @@ class MoodEntryCRUD:
                 "daily_averages": []
             }
         
-        # Средняя оценка
-        average_mood = sum(entry.mood_score for entry in entries) / len(entries)
+        total_entries = sum(day["entries_count"] for day in days)
+        average_mood = sum(day["mood_sum"] for day in days) / total_entries
         
         # Распределение настроения
         mood_distribution = {"positive": 0, "neutral": 0, "negative": 0}
-        for entry in entries:
-            if entry.mood_score >= 7:
-                mood_distribution["positive"] += 1
-            elif entry.mood_score >= 4:
-                mood_distribution["neutral"] += 1
-            else:
-                mood_distribution["negative"] += 1
+        for day in days:
+            for bucket, count in day["mood_distribution"].items():
+                mood_distribution[bucket] += count
         
         # Ежедневные средние
-        daily_averages = []
-        entries_by_date = {}
-        for entry in entries:
-            date_key = entry.entry_date.date()
-            if date_key not in entries_by_date:
-                entries_by_date[date_key] = []
-            entries_by_date[date_key].append(entry.mood_score)
-        
-        for date_key, scores in sorted(entries_by_date.items()):
-            daily_averages.append({
-                "date": date_key.isoformat(),
-                "average_mood": round(sum(scores) / len(scores), 2),
-                "entries_count": len(scores)
-            })
+        daily_averages = [
+            {
+                "date": day["date"].isoformat(),
+                "average_mood": round(day["mood_sum"] / day["entries_count"], 2),
+                "entries_count": day["entries_count"]
+            }
+            for day in days
+        ]
         
         return {
             "period": period,
             "average_mood": round(average_mood, 2),
             "mood_distribution": mood_distribution,
             "daily_averages": daily_averages,
-            "total_entries": len(entries)
+            "total_entries": total_entries
         }
     
-    def _calculate_streak(self, entries: List[MoodEntry]) -> int:
-        """Подсчитать streak - количество последовательных дней с записями"""
-        if not entries:
-            return 0
+    def get_mood_trends(self, db: Session, user_id: int, period: str = "month") -> Dict[str, Any]:
+        """
+        Получить тренды настроения и эмоций за период
+        Неделя и месяц группируются по дням, квартал - по неделям, год - по месяцам
+        """
+        end_date = datetime.utcnow()
+        if period == "week":
+            start_date = end_date - timedelta(days=7)
+            group_by = "day"
+        elif period == "month":
+            start_date = end_date - timedelta(days=30)
+            group_by = "day"
+        elif period == "quarter":
+            start_date = end_date - timedelta(days=90)
+            group_by = "week"
+        else:  # year
+            start_date = end_date - timedelta(days=365)
+            group_by = "month"
         
-        # Сортируем по дате (убывающая)
-        sorted_entries = sorted(entries, key=lambda x: x.entry_date.date(), reverse=True)
+        trends_data = {
+            "period": period,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "mood_trend": [],
+            "emotion_trends": {},
+            "average_mood": 0
+        }
         
-        # Группируем по датам
-        dates = []
-        for entry in sorted_entries:
-            entry_date = entry.entry_date.date()
-            if not dates or dates[-1] != entry_date:
-                dates.append(entry_date)
+        periods = mood_daily_rollup_crud.get_series(
+            db, user_id, start_date.date(), end_date.date(), group_by=group_by
+        )
+        if not periods:
+            return trends_data
         
-        # Подсчитываем streak
-        streak = 0
-        today = date.today()
+        for period_data in periods:
+            period_key = period_data["date"].isoformat()
+            trends_data["mood_trend"].append({
+                "date": period_key,
+                "average_mood": round(period_data["mood_sum"] / period_data["entries_count"], 2),
+                "entries_count": period_data["entries_count"]
+            })
+            
+            # Средние эмоции
+            for emotion, total in period_data["emotion_sums"].items():
+                trends_data["emotion_trends"].setdefault(emotion, []).append({
+                    "date": period_key,
+                    "value": round(total / period_data["emotion_counts"][emotion], 2)
+                })
         
-        for i, entry_date in enumerate(dates):
-            expected_date = today - timedelta(days=i)
-            if entry_date == expected_date:
-                streak += 1
-            else:
-                break
+        # Общая средняя оценка
+        total_entries = sum(period_data["entries_count"] for period_data in periods)
+        total_mood = sum(period_data["mood_sum"] for period_data in periods)
+        trends_data["average_mood"] = round(total_mood / total_entries, 2)
         
-        return streak
+        return trends_data
     
     def count_by_user(self, db: Session, user_id: int) -> int:
         """Подсчет записей пользователя"""
         return db.query(MoodEntry).filter(MoodEntry.user_id == user_id).count()
+    
+    def get_active_user_ids(self, db: Session, since: datetime) -> List[int]:
+        """ID пользователей, у которых есть записи начиная с since"""
+        rows = db.query(MoodEntry.user_id).filter(
+            MoodEntry.entry_date >= since
+        ).distinct().order_by(MoodEntry.user_id).all()
+        return [user_id for user_id, in rows]
+    
+    def get_period_stats(
+        self, 
+        db: Session, 
+        user_id: int, 
+        start_date: datetime, 
+        end_date: datetime
+    ) -> Dict[str, Any]:
+        """
+        Статистика записей пользователя за период [start_date, end_date]
+        Оценки агрегируются одним запросом, эмоции - GROUP BY по analysis_emotions
+        """
+        entries_count, average_mood, positive_count, neutral_count, negative_count = db.query(
+            func.count(MoodEntry.id),
+            func.avg(MoodEntry.mood_score),
+            func.coalesce(func.sum(case((MoodEntry.mood_score >= 7, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((and_(MoodEntry.mood_score >= 4, MoodEntry.mood_score < 7), 1), else_=0)), 0),
+            func.coalesce(func.sum(case((MoodEntry.mood_score < 4, 1), else_=0)), 0)
+        ).filter(
+            and_(
+                MoodEntry.user_id == user_id,
+                MoodEntry.entry_date >= start_date,
+                MoodEntry.entry_date <= end_date
+            )
+        ).one()
+        
+        if not entries_count:
+            return {
+                "entries_count": 0,
+                "average_mood": 0,
+                "mood_distribution": {"positive": 0, "neutral": 0, "negative": 0},
+                "dominant_emotions": {}
+            }
+        
+        emotion_averages = analysis_emotion_crud.get_averages(
+            db, user_id, start_date=start_date, end_date=end_date
+        )
+        
+        return {
+            "entries_count": entries_count,
+            "average_mood": round(average_mood, 2),
+            "mood_distribution": {
+                "positive": positive_count,
+                "neutral": neutral_count,
+                "negative": negative_count
+            },
+            "dominant_emotions": {
+                emotion: round(average, 2) for emotion, average in emotion_averages.items()
+            }
+        }
+    
+    def get_global_stats(self, db: Session) -> Dict[str, Any]:
+        """
+        Общая статистика по всем пользователям и записям
+        Один запрос с агрегатами вместо загрузки записей каждого пользователя
+        """
+        total_users, active_users, total_entries, average_mood = db.execute(select(
+            select(func.count(User.id)).scalar_subquery(),
+            select(func.count(User.id)).where(User.is_active == True).scalar_subquery(),
+            select(func.count(MoodEntry.id)).scalar_subquery(),
+            select(func.avg(MoodEntry.mood_score)).scalar_subquery()
+        )).one()
+        
+        return {
+            "total_users": total_users,
+            "active_users": active_users,
+            "total_entries": total_entries,
+            "average_mood": average_mood
+        }
+
+
+def _load_analysis(entry: Optional[MoodEntry]) -> Optional[MoodEntry]:
+    """
+    Подгрузить ai_analysis, пока выполняемся внутри run_sync.
+    Вне run_sync ленивая загрузка связей у AsyncSession недоступна
+    """
+    if entry is not None:
+        entry.ai_analysis
+    return entry
+
+
+class AsyncMoodEntryCRUD:
+    """
+    Асинхронные CRUD операции для модели MoodEntry
+    Выполняют синхронные запросы MoodEntryCRUD через AsyncSession.run_sync,
+    поэтому ожидание БД не блокирует event loop
+    """
+    
+    def __init__(self, crud: MoodEntryCRUD):
+        self.crud = crud
+    
+    async def get_by_id(self, db: AsyncSession, entry_id: int) -> Optional[MoodEntry]:
+        """Получить запись по ID с AI анализом"""
+        return await db.run_sync(self.crud.get_by_id, entry_id)
+    
+    async def get_by_user_and_date(self, db: AsyncSession, user_id: int, entry_date: date) -> Optional[MoodEntry]:
+        """Получить запись пользователя за конкретную дату"""
+        return await db.run_sync(
+            lambda s: _load_analysis(self.crud.get_by_user_and_date(s, user_id, entry_date))
+        )
+    
+    async def get_user_entries(
+        self, 
+        db: AsyncSession, 
+        user_id: int, 
+        skip: int = 0, 
+        limit: int = 100,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> List[MoodEntry]:
+        """Получить записи пользователя за период"""
+        return await db.run_sync(
+            self.crud.get_user_entries, user_id,
+            skip=skip, limit=limit, start_date=start_date, end_date=end_date
+        )
+    
+    async def get_user_entries_page(
+        self, 
+        db: AsyncSession, 
+        user_id: int, 
+        limit: int = 100,
+        after: Optional[Tuple[datetime, int]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Tuple[List[MoodEntry], Optional[Tuple[datetime, int]]]:
+        """Получить страницу записей пользователя после ключа (entry_date, id)"""
+        return await db.run_sync(
+            self.crud.get_user_entries_page, user_id,
+            limit=limit, after=after, start_date=start_date, end_date=end_date
+        )
+    
+    async def get_recent_entries(self, db: AsyncSession, user_id: int, days: int = 7) -> List[MoodEntry]:
+        """Получить последние записи пользователя"""
+        return await db.run_sync(self.crud.get_recent_entries, user_id, days)
+    
+    async def get_latest_entry(self, db: AsyncSession, user_id: int) -> Optional[MoodEntry]:
+        """Получить последнюю запись пользователя"""
+        return await db.run_sync(
+            lambda s: _load_analysis(self.crud.get_latest_entry(s, user_id))
+        )
+    
+    async def create(self, db: AsyncSession, entry_in: MoodEntryCreate, user_id: int) -> MoodEntry:
+        """Создать новую запись настроения"""
+        return await db.run_sync(
+            lambda s: _load_analysis(self.crud.create(s, entry_in, user_id))
+        )
+    
+    async def update(self, db: AsyncSession, entry_id: int, entry_in: MoodEntryUpdate) -> Optional[MoodEntry]:
+        """Обновить запись настроения"""
+        return await db.run_sync(
+            lambda s: _load_analysis(self.crud.update(s, entry_id, entry_in))
+        )
+    
+    async def delete(self, db: AsyncSession, entry_id: int) -> bool:
+        """Удалить запись настроения"""
+        return await db.run_sync(self.crud.delete, entry_id)
+    
+    async def delete_analysis(self, db: AsyncSession, entry: MoodEntry) -> bool:
+        """Удалить AI анализ записи"""
+        return await db.run_sync(self.crud.delete_analysis, entry)
+    
+    async def get_user_stats(self, db: AsyncSession, user_id: int) -> Dict[str, Any]:
+        """Получить статистику пользователя"""
+        return await db.run_sync(self.crud.get_user_stats, user_id)
+    
+    async def get_mood_analytics(self, db: AsyncSession, user_id: int, period: str = "month") -> Dict[str, Any]:
+        """Получить аналитику настроения за период"""
+        return await db.run_sync(self.crud.get_mood_analytics, user_id, period)
+    
+    async def get_mood_trends(self, db: AsyncSession, user_id: int, period: str = "month") -> Dict[str, Any]:
+        """Получить тренды настроения и эмоций за период"""
+        return await db.run_sync(self.crud.get_mood_trends, user_id, period)
+    
+    async def count_by_user(self, db: AsyncSession, user_id: int) -> int:
+        """Подсчет записей пользователя"""
+        return await db.run_sync(self.crud.count_by_user, user_id)
+    
+    async def get_active_user_ids(self, db: AsyncSession, since: datetime) -> List[int]:
+        """ID пользователей, у которых есть записи начиная с since"""
+        return await db.run_sync(self.crud.get_active_user_ids, since)
+    
+    async def get_period_stats(
+        self, 
+        db: AsyncSession, 
+        user_id: int, 
+        start_date: datetime, 
+        end_date: datetime
+    ) -> Dict[str, Any]:
+        """Статистика записей пользователя за период"""
+        return await db.run_sync(self.crud.get_period_stats, user_id, start_date, end_date)
+    
+    async def get_global_stats(self, db: AsyncSession) -> Dict[str, Any]:
+        """Общая статистика по всем пользователям и записям"""
+        return await db.run_sync(self.crud.get_global_stats)
 
 
-# Создаем экземпляр для использования в приложении
-mood_entry_crud = MoodEntryCRUD()
\ No newline at end of file
+# Создаем экземпляры для использования в приложении
+mood_entry_crud = MoodEntryCRUD()
+async_mood_entry_crud = AsyncMoodEntryCRUD(mood_entry_crud)
\ No newline at end of file
@@ -3,8 +3,9 @@ CRUD операции для работы с пользователями
 """
 
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import and_, or_
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime
 
 from ..models.user import User
@@ -34,6 +35,30 @@ class UserCRUD:
         """Получить активных пользователей"""
         return db.query(User).filter(User.is_active == True).offset(skip).limit(limit).all()
     
+    def get_page(
+        self, 
+        db: Session, 
+        limit: int = 100, 
+        after_id: Optional[int] = None, 
+        active_only: bool = False
+    ) -> Tuple[List[User], Optional[int]]:
+        """
+        Получить страницу пользователей по возрастанию ID после after_id
+        Возвращает (пользователи, ID для следующей страницы или None)
+        """
+        query = db.query(User)
+        if active_only:
+            query = query.filter(User.is_active == True)
+        if after_id is not None:
+            query = query.filter(User.id > after_id)
+        
+        users = query.order_by(User.id).limit(limit + 1).all()
+        if len(users) <= limit:
+            return users, None
+        
+        users = users[:limit]
+        return users, users[-1].id
+    
     def create(self, db: Session, user_in: UserCreate) -> User:
         """Создать нового пользователя"""
         user_data = user_in.model_dump()
@@ -147,5 +172,87 @@ class UserCRUD:
         return db.query(User).filter(User.is_active == True).count()
 
 
-# Создаем экземпляр для использования в приложении
-user_crud = UserCRUD()
\ No newline at end of file
+class AsyncUserCRUD:
+    """
+    Асинхронные CRUD операции для модели User
+    Выполняют синхронные запросы UserCRUD через AsyncSession.run_sync,
+    поэтому ожидание БД не блокирует event loop
+    """
+    
+    def __init__(self, crud: UserCRUD):
+        self.crud = crud
+    
+    async def get_by_id(self, db: AsyncSession, user_id: int) -> Optional[User]:
+        """Получить пользователя по ID"""
+        return await db.run_sync(self.crud.get_by_id, user_id)
+    
+    async def get_by_telegram_id(self, db: AsyncSession, telegram_id: int) -> Optional[User]:
+        """Получить пользователя по Telegram ID"""
+        return await db.run_sync(self.crud.get_by_telegram_id, telegram_id)
+    
+    async def get_by_username(self, db: AsyncSession, username: str) -> Optional[User]:
+        """Получить пользователя по username"""
+        return await db.run_sync(self.crud.get_by_username, username)
+    
+    async def get_all(self, db: AsyncSession, skip: int = 0, limit: int = 100) -> List[User]:
+        """Получить список всех пользователей"""
+        return await db.run_sync(self.crud.get_all, skip, limit)
+    
+    async def get_active_users(self, db: AsyncSession, skip: int = 0, limit: int = 100) -> List[User]:
+        """Получить активных пользователей"""
+        return await db.run_sync(self.crud.get_active_users, skip, limit)
+    
+    async def get_page(
+        self, 
+        db: AsyncSession, 
+        limit: int = 100, 
+        after_id: Optional[int] = None, 
+        active_only: bool = False
+    ) -> Tuple[List[User], Optional[int]]:
+        """Получить страницу пользователей по возрастанию ID после after_id"""
+        return await db.run_sync(self.crud.get_page, limit, after_id, active_only)
+    
+    async def create(self, db: AsyncSession, user_in: UserCreate) -> User:
+        """Создать нового пользователя"""
+        return await db.run_sync(self.crud.create, user_in)
+    
+    async def get_or_create(self, db: AsyncSession, telegram_id: int, user_data: dict) -> tuple[User, bool]:
+        """Получить пользователя или создать если не существует"""
+        return await db.run_sync(self.crud.get_or_create, telegram_id, user_data)
+    
+    async def update(self, db: AsyncSession, user_id: int, user_in: UserUpdate) -> Optional[User]:
+        """Обновить данные пользователя"""
+        return await db.run_sync(self.crud.update, user_id, user_in)
+    
+    async def update_by_telegram_id(self, db: AsyncSession, telegram_id: int, user_in: UserUpdate) -> Optional[User]:
+        """Обновить данные пользователя по Telegram ID"""
+        return await db.run_sync(self.crud.update_by_telegram_id, telegram_id, user_in)
+    
+    async def increment_mood_entries(self, db: AsyncSession, user_id: int) -> Optional[User]:
+        """Увеличить счетчик записей настроения"""
+        return await db.run_sync(self.crud.increment_mood_entries, user_id)
+    
+    async def deactivate(self, db: AsyncSession, user_id: int) -> Optional[User]:
+        """Деактивировать пользователя"""
+        return await db.run_sync(self.crud.deactivate, user_id)
+    
+    async def activate(self, db: AsyncSession, user_id: int) -> Optional[User]:
+        """Активировать пользователя"""
+        return await db.run_sync(self.crud.activate, user_id)
+    
+    async def delete(self, db: AsyncSession, user_id: int) -> bool:
+        """Удалить пользователя"""
+        return await db.run_sync(self.crud.delete, user_id)
+    
+    async def count(self, db: AsyncSession) -> int:
+        """Подсчет общего количества пользователей"""
+        return await db.run_sync(self.crud.count)
+    
+    async def count_active(self, db: AsyncSession) -> int:
+        """Подсчет активных пользователей"""
+        return await db.run_sync(self.crud.count_active)
+
+
+# Создаем экземпляры для использования в приложении
+user_crud = UserCRUD()
+async_user_crud = AsyncUserCRUD(user_crud)
\ No newline at end of file
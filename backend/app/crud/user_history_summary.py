@@ -0,0 +1,95 @@
+"""
+CRUD операции для сжатой истории настроения пользователя
+"""
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Optional, List
+from datetime import datetime, date, timedelta
+
+from ..core.config import settings
+from ..models.user_history_summary import UserHistorySummary
+
+
+def history_horizon(now: Optional[datetime] = None) -> date:
+    """
+    Последний день сжатой истории
+    Более поздние дни попадают в промпт инсайтов подробными записями
+    """
+    now = now or datetime.utcnow()
+    return (now - timedelta(days=settings.INSIGHTS_DETAIL_DAYS)).date() - timedelta(days=1)
+
+
+class UserHistorySummaryCRUD:
+    """Операции со сжатой историей UserHistorySummary"""
+    
+    def roll_forward(self, db: Session, user_id: int, until: date) -> UserHistorySummary:
+        """
+        Дополнить помесячные итоги днями до until включительно
+        Читаются только дневные агрегаты, которых еще нет в итогах
+        """
+        from .mood_daily_rollup import mood_daily_rollup_crud
+        
+        summary = db.get(UserHistorySummary, user_id)
+        if summary is None:
+            summary = UserHistorySummary(user_id=user_id, covered_until=date.min, months={})
+            db.add(summary)
+        elif summary.covered_until >= until:
+            return summary
+        
+        rollups = mood_daily_rollup_crud.get_range(db, user_id, summary.covered_until + timedelta(days=1), until)
+        
+        # JSON колонка не отслеживает изменения на месте, поэтому словарь присваивается заново
+        months = {key: dict(value) for key, value in (summary.months or {}).items()}
+        for period in mood_daily_rollup_crud.fold_series(rollups, "month"):
+            key = period["date"].strftime("%Y-%m")
+            month = months.setdefault(key, {"entries_count": 0, "mood_sum": 0.0, "emotion_sums": {}, "emotion_counts": {}})
+            month["entries_count"] += period["entries_count"]
+            month["mood_sum"] += period["mood_sum"]
+            for field in ("emotion_sums", "emotion_counts"):
+                merged = dict(month[field])
+                for emotion, value in period[field].items():
+                    merged[emotion] = merged.get(emotion, 0) + value
+                month[field] = merged
+        
+        summary.months = months
+        summary.covered_until = until
+        summary.updated_at = datetime.utcnow()
+        try:
+            db.commit()
+        except IntegrityError:
+            # Итоги пользователя только что создал параллельный запрос
+            db.rollback()
+            return self.roll_forward(db, user_id, until)
+        return summary
+    
+    def on_day_changed(self, db: Session, user_id: int, day: date) -> None:
+        """
+        Изменились агрегаты дня. Если день уже вошел в итоги, итоги удаляются
+        и при следующем обращении собираются заново из дневных агрегатов.
+        Вызывается до commit вместе с изменением агрегатов
+        """
+        if day > history_horizon():
+            return
+        
+        summary = db.get(UserHistorySummary, user_id)
+        if summary is not None and summary.covered_until >= day:
+            db.delete(summary)
+    
+    def reset(self, db: Session, user_ids: Optional[List[int]] = None) -> int:
+        """
+        Удалить итоги (после пересчета дневных агрегатов)
+        
+        Returns:
+            Количество удаленных строк
+        """
+        query = db.query(UserHistorySummary)
+        if user_ids is not None:
+            query = query.filter(UserHistorySummary.user_id.in_(user_ids))
+        deleted = query.delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+
+# Создаем экземпляр для использования в приложении
+user_history_summary_crud = UserHistorySummaryCRUD()
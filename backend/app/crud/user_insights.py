@@ -0,0 +1,48 @@
+"""
+CRUD операции для сохраненных AI инсайтов
+"""
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import datetime
+
+from ..models.user_insights import UserInsights
+
+
+class UserInsightsCRUD:
+    """Операции с инсайтами UserInsights"""
+    
+    def get(self, db: Session, user_id: int, period_days: int) -> Optional[UserInsights]:
+        """Сохраненные инсайты пользователя за период"""
+        return db.get(UserInsights, (user_id, period_days))
+    
+    def save(
+        self,
+        db: Session,
+        user_id: int,
+        period_days: int,
+        window_hash: str,
+        insights_text: str,
+        entries_analyzed: int,
+        ai_model: Optional[str] = None
+    ) -> None:
+        """Сохранить инсайты, заменив предыдущие за тот же период"""
+        db.merge(UserInsights(
+            user_id=user_id,
+            period_days=period_days,
+            window_hash=window_hash,
+            insights_text=insights_text,
+            entries_analyzed=entries_analyzed,
+            ai_model=ai_model,
+            generated_at=datetime.utcnow()
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Инсайты по тому же окну только что сохранил параллельный запрос
+            db.rollback()
+
+
+# Создаем экземпляр для использования в приложении
+user_insights_crud = UserInsightsCRUD()
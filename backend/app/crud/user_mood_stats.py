@@ -0,0 +1,230 @@
+"""
+CRUD операции для агрегированной статистики настроения пользователя
+"""
+
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, desc, func, literal, select, Date
+from typing import Optional, List, Dict, Any
+from datetime import datetime, date, time, timedelta
+
+from ..core.sql_functions import day_number, insert_ignore, lock_row
+from ..models.mood_entry import MoodEntry
+from ..models.user_mood_stats import UserMoodStats
+
+
+def mood_bucket(mood_score: float) -> str:
+    """Корзина распределения настроения для оценки"""
+    if mood_score >= 7:
+        return "positive"
+    elif mood_score >= 4:
+        return "neutral"
+    return "negative"
+
+
+class UserMoodStatsCRUD:
+    """
+    Операции со статистикой UserMoodStats
+    Методы on_entry_* вызываются из MoodEntryCRUD до commit,
+    поэтому статистика меняется в той же транзакции, что и записи
+    """
+    
+    TRACKED_FIELDS = (
+        "entries_count", "mood_sum", "positive_count", "neutral_count",
+        "negative_count", "last_entry_date", "streak_days"
+    )
+    
+    def get(self, db: Session, user_id: int) -> UserMoodStats:
+        """
+        Получить статистику пользователя
+        Если строки еще нет (история до появления таблицы), она вычисляется
+        из mood_entries, но не сохраняется
+        """
+        stats = db.get(UserMoodStats, user_id)
+        if stats is None:
+            stats = self.compute_from_entries(db, user_id)
+        return stats
+    
+    def get_for_update(self, db: Session, user_id: int) -> UserMoodStats:
+        """
+        Получить строку статистики для изменения, создав ее из истории при отсутствии
+        
+        Строка блокируется (SELECT ... FOR UPDATE) до конца транзакции, поэтому
+        параллельные изменения записей одного пользователя применяют приращения
+        по очереди и не теряют их. Отсутствующую строку первая транзакция
+        вставляет, а остальные после ее commit читают уже готовую
+        """
+        stats = lock_row(db, UserMoodStats, UserMoodStats.user_id == user_id)
+        if stats is None:
+            insert_ignore(db, self.compute_from_entries(db, user_id))
+            stats = lock_row(db, UserMoodStats, UserMoodStats.user_id == user_id)
+        return stats
+    
+    def on_entry_created(self, db: Session, entry: MoodEntry) -> UserMoodStats:
+        """
+        Учесть новую запись
+        Вызывается до db.add(entry), чтобы построение строки из истории
+        не посчитало новую запись дважды
+        """
+        stats = self.get_for_update(db, entry.user_id)
+        self._add_score(stats, entry.mood_score, 1)
+        
+        entry_day = entry.entry_date.date()
+        if not stats.last_entry_date:
+            stats.last_entry_date = entry.entry_date
+            stats.streak_days = 1
+            return stats
+        
+        last_day = stats.last_entry_date.date()
+        if entry_day == last_day:
+            stats.last_entry_date = max(stats.last_entry_date, entry.entry_date)
+        elif entry_day == last_day + timedelta(days=1):
+            stats.last_entry_date = entry.entry_date
+            stats.streak_days += 1
+        elif entry_day > last_day:
+            stats.last_entry_date = entry.entry_date
+            stats.streak_days = 1
+        elif entry_day == last_day - timedelta(days=stats.streak_days):
+            # Запись задним числом продлевает серию и может склеить ее с более ранней
+            earlier_streak = self.calculate_streak(db, entry.user_id, entry_day - timedelta(days=1))
+            stats.streak_days += 1 + earlier_streak
+        
+        return stats
+    
+    def on_entry_updated(self, db: Session, entry: MoodEntry, old_mood_score: float) -> UserMoodStats:
+        """Учесть изменение оценки записи (дата записи не меняется)"""
+        stats = self.get_for_update(db, entry.user_id)
+        if entry.mood_score != old_mood_score:
+            self._add_score(stats, old_mood_score, -1)
+            self._add_score(stats, entry.mood_score, 1)
+        return stats
+    
+    def on_entry_deleted(self, db: Session, entry: MoodEntry) -> UserMoodStats:
+        """Учесть удаление записи. Вызывается до db.delete(entry)"""
+        stats = self.get_for_update(db, entry.user_id)
+        self._add_score(stats, entry.mood_score, -1)
+        return stats
+    
+    def refresh_last_entry(self, db: Session, stats: UserMoodStats) -> UserMoodStats:
+        """
+        Пересчитать дату последней записи и серию по индексу (user_id, entry_date)
+        Используется после удаления записи
+        """
+        stats.last_entry_date = db.query(func.max(MoodEntry.entry_date)).filter(
+            MoodEntry.user_id == stats.user_id
+        ).scalar()
+        stats.streak_days = (
+            self.calculate_streak(db, stats.user_id, stats.last_entry_date.date())
+            if stats.last_entry_date else 0
+        )
+        return stats
+    
+    def _add_score(self, stats: UserMoodStats, mood_score: float, sign: int) -> None:
+        """Добавить (sign=1) или вычесть (sign=-1) оценку из сумм и распределения"""
+        stats.entries_count += sign
+        stats.mood_sum += sign * mood_score
+        bucket = mood_bucket(mood_score)
+        setattr(stats, f"{bucket}_count", getattr(stats, f"{bucket}_count") + sign)
+    
+    def current_streak(self, stats: UserMoodStats) -> int:
+        """Серия дней на сегодня: сохраненная серия действует, только если последняя запись сегодня"""
+        if stats.last_entry_date and stats.last_entry_date.date() == date.today():
+            return stats.streak_days
+        return 0
+    
+    def calculate_streak(self, db: Session, user_id: int, end_day: date) -> int:
+        """
+        Подсчитать количество последовательных дней с записями, заканчивающихся в end_day
+        
+        Gaps-and-islands: для уникальных дней не позже end_day, отсортированных
+        по убыванию, gap = (end_day - день) - (номер дня - 1) равен 0 у дней серии,
+        заканчивающейся в end_day, и только растет после первого пропуска
+        """
+        end = day_number(literal(end_day, Date))
+        next_day_start = datetime.combine(end_day + timedelta(days=1), time.min)
+        days = select(
+            day_number(MoodEntry.entry_date).label("day")
+        ).where(
+            and_(MoodEntry.user_id == user_id, MoodEntry.entry_date < next_day_start)
+        ).distinct().subquery()
+        
+        gaps = select(
+            (end - days.c.day - func.row_number().over(order_by=desc(days.c.day)) + 1).label("gap")
+        ).subquery()
+        
+        return db.execute(select(
+            func.coalesce(func.sum(case((gaps.c.gap == 0, 1), else_=0)), 0)
+        )).scalar()
+    
+    def compute_from_entries(self, db: Session, user_id: int) -> UserMoodStats:
+        """Вычислить статистику из mood_entries (объект не добавляется в сессию)"""
+        (
+            entries_count, mood_sum, positive_count, neutral_count, negative_count, last_entry_date
+        ) = db.query(
+            func.count(MoodEntry.id),
+            func.coalesce(func.sum(MoodEntry.mood_score), 0.0),
+            func.coalesce(func.sum(case((MoodEntry.mood_score >= 7, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((and_(MoodEntry.mood_score >= 4, MoodEntry.mood_score < 7), 1), else_=0)), 0),
+            func.coalesce(func.sum(case((MoodEntry.mood_score < 4, 1), else_=0)), 0),
+            func.max(MoodEntry.entry_date)
+        ).filter(MoodEntry.user_id == user_id).one()
+        
+        return UserMoodStats(
+            user_id=user_id,
+            entries_count=entries_count,
+            mood_sum=float(mood_sum),
+            positive_count=positive_count,
+            neutral_count=neutral_count,
+            negative_count=negative_count,
+            last_entry_date=last_entry_date,
+            streak_days=self.calculate_streak(db, user_id, last_entry_date.date()) if last_entry_date else 0,
+            updated_at=datetime.utcnow()
+        )
+    
+    def rebuild(self, db: Session, user_ids: Optional[List[int]] = None, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """
+        Пересчитать статистику из mood_entries и найти расхождения
+        
+        Args:
+            db: Сессия базы данных
+            user_ids: Пользователи для пересчета (по умолчанию все, у кого есть записи или статистика)
+            dry_run: Только проверить расхождения, не сохраняя изменения
+        
+        Returns:
+            Список расхождений: user_id, поле, сохраненное и вычисленное значения
+        """
+        if user_ids is None:
+            user_ids = sorted(
+                {row[0] for row in db.query(MoodEntry.user_id).distinct()}
+                | {row[0] for row in db.query(UserMoodStats.user_id)}
+            )
+        
+        drift = []
+        for user_id in user_ids:
+            expected = self.compute_from_entries(db, user_id)
+            stored = db.get(UserMoodStats, user_id)
+            
+            if stored is None:
+                drift.append({"user_id": user_id, "field": "row", "stored": None, "expected": "missing"})
+                if not dry_run:
+                    db.add(expected)
+                continue
+            
+            for field in self.TRACKED_FIELDS:
+                stored_value = getattr(stored, field)
+                expected_value = getattr(expected, field)
+                if field == "mood_sum":
+                    differs = abs((stored_value or 0) - expected_value) > 1e-6
+                else:
+                    differs = stored_value != expected_value
+                if differs:
+                    drift.append({"user_id": user_id, "field": field, "stored": stored_value, "expected": expected_value})
+                    if not dry_run:
+                        setattr(stored, field, expected_value)
+        
+        if not dry_run:
+            db.commit()
+        return drift
+
+
+# Создаем экземпляр для использования в приложении
+user_mood_stats_crud = UserMoodStatsCRUD()
@@ -5,5 +5,13 @@
 from .user import User
 from .mood_entry import MoodEntry
 from .ai_analysis import AIAnalysis
+from .user_mood_stats import UserMoodStats
+from .mood_daily_rollup import MoodDailyRollup
+from .analysis_emotion import AnalysisEmotion
+from .analysis_cache import AnalysisCacheEntry
+from .analysis_job import AnalysisJob
+from .user_insights import UserInsights
+from .user_history_summary import UserHistorySummary
+from .bot_user_state import BotUserState
 
-__all__ = ["User", "MoodEntry", "AIAnalysis"]
\ No newline at end of file
+__all__ = ["User", "MoodEntry", "AIAnalysis", "UserMoodStats", "MoodDailyRollup", "AnalysisEmotion", "AnalysisCacheEntry", "AnalysisJob", "UserInsights", "UserHistorySummary", "BotUserState"]
\ No newline at end of file
@@ -17,8 +17,8 @@ class AIAnalysis(Base):
     __tablename__ = "ai_analyses"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="ID пользователя")
-    mood_entry_id = Column(Integer, ForeignKey("mood_entries.id"), nullable=False, comment="ID записи настроения")
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True, comment="ID пользователя")
+    mood_entry_id = Column(Integer, ForeignKey("mood_entries.id"), nullable=False, index=True, comment="ID записи настроения")
     
     # Результаты анализа
     sentiment_score = Column(Float, nullable=True, comment="Тональность текста от -1 до 1")
@@ -47,6 +47,7 @@ class AIAnalysis(Base):
     # Связи
     user = relationship("User", back_populates="ai_analyses")
     mood_entry = relationship("MoodEntry", back_populates="ai_analysis")
+    emotion_scores = relationship("AnalysisEmotion", back_populates="analysis", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<AIAnalysis(id={self.id}, mood_entry_id={self.mood_entry_id}, sentiment={self.sentiment_label})>"
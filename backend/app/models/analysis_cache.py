@@ -0,0 +1,25 @@
+"""
+Модель постоянного кэша результатов AI анализа
+"""
+
+from sqlalchemy import Column, String, DateTime, JSON
+from datetime import datetime
+
+from ..core.database import Base
+
+
+class AnalysisCacheEntry(Base):
+    """
+    Результат анализа Gemini по ключу содержимого
+    Ключ - хэш нормализованного текста, оценки, модели и версии промпта,
+    поэтому одинаковые записи не отправляются в Gemini повторно
+    """
+    __tablename__ = "analysis_cache"
+    
+    key = Column(String(64), primary_key=True, comment="SHA-256 ключ содержимого")
+    result = Column(JSON, nullable=False, comment="Результат анализа")
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True, comment="Дата сохранения")
+    expires_at = Column(DateTime, nullable=False, comment="Срок действия")
+    
+    def __repr__(self):
+        return f"<AnalysisCacheEntry(key={self.key[:12]}, expires_at={self.expires_at})>"
@@ -0,0 +1,33 @@
+"""
+Модель нормализованных оценок эмоций AI анализа
+"""
+
+from sqlalchemy import Column, Integer, SmallInteger, Float, ForeignKey
+from sqlalchemy.orm import relationship
+
+from ..core.database import Base
+from ..core.emotions import EMOTIONS
+
+
+class AnalysisEmotion(Base):
+    """
+    Оценка одной канонической эмоции в AI анализе
+    Узкая таблица вместо JSON позволяет считать средние эмоций через GROUP BY,
+    JSON в AIAnalysis.emotions остается только для отображения
+    """
+    __tablename__ = "analysis_emotions"
+    
+    analysis_id = Column(Integer, ForeignKey("ai_analyses.id"), primary_key=True, comment="ID анализа")
+    emotion_id = Column(SmallInteger, primary_key=True, comment="ID эмоции из канонического словаря")
+    value = Column(Float, nullable=False, comment="Интенсивность эмоции от 0 до 1")
+    
+    # Связи
+    analysis = relationship("AIAnalysis", back_populates="emotion_scores")
+    
+    def __repr__(self):
+        return f"<AnalysisEmotion(analysis_id={self.analysis_id}, emotion={self.emotion_name}, value={self.value})>"
+    
+    @property
+    def emotion_name(self) -> str:
+        """Каноническое название эмоции"""
+        return EMOTIONS.get(self.emotion_id, str(self.emotion_id))
@@ -0,0 +1,63 @@
+"""
+Модель задачи фонового AI анализа
+"""
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from ..core.database import Base
+
+# Состояния задачи
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class AnalysisJob(Base):
+    """
+    Задача AI анализа записи настроения
+    Хранится в БД, поэтому переживает перезапуск API, бота и воркеров
+    """
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        # Выборка готовых к выполнению задач воркером
+        Index("ix_analysis_jobs_status_run_after", "status", "run_after"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    mood_entry_id = Column(Integer, ForeignKey("mood_entries.id"), nullable=False, index=True, comment="ID записи настроения")
+    
+    # Состояние
+    status = Column(String(20), nullable=False, default=JOB_QUEUED, comment="queued/running/done/failed")
+    attempts = Column(Integer, nullable=False, default=0, comment="Количество попыток")
+    last_error = Column(Text, nullable=True, comment="Ошибка последней попытки")
+    
+    # Расписание
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow, comment="Не запускать раньше (повтор с задержкой)")
+    locked_at = Column(DateTime, nullable=True, comment="Когда воркер взял задачу")
+    
+    # Даты
+    created_at = Column(DateTime, default=datetime.utcnow, comment="Дата создания")
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment="Дата обновления")
+    finished_at = Column(DateTime, nullable=True, comment="Дата завершения")
+    
+    # Связи
+    mood_entry = relationship("MoodEntry", back_populates="analysis_jobs")
+    
+    def __repr__(self):
+        return f"<AnalysisJob(id={self.id}, mood_entry_id={self.mood_entry_id}, status={self.status})>"
+    
+    def to_dict(self):
+        """Преобразование объекта в словарь для JSON ответов"""
+        return {
+            "job_id": self.id,
+            "mood_entry_id": self.mood_entry_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "run_after": self.run_after.isoformat() if self.run_after else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,25 @@
+"""
+Модель состояния диалога пользователя с Telegram Bot
+"""
+
+from sqlalchemy import Column, BigInteger, DateTime, JSON
+from datetime import datetime
+
+from ..core.database import Base
+
+
+class BotUserState(Base):
+    """
+    Незавершенный диалог пользователя с ботом (например, запись /mood)
+    Таблица общая для всех процессов бота, поэтому следующий шаг диалога
+    может обработать любой воркер, а состояние переживает перезапуск
+    """
+    __tablename__ = "bot_user_states"
+    
+    telegram_id = Column(BigInteger, primary_key=True, autoincrement=False, comment="Telegram ID пользователя")
+    state = Column(JSON, nullable=False, comment="Поля состояния диалога")
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="Дата изменения")
+    expires_at = Column(DateTime, nullable=False, index=True, comment="Срок действия")
+    
+    def __repr__(self):
+        return f"<BotUserState(telegram_id={self.telegram_id}, expires_at={self.expires_at})>"
@@ -0,0 +1,37 @@
+"""
+Модель дневных агрегатов настроения и эмоций
+"""
+
+from sqlalchemy import Column, Integer, Float, Date, ForeignKey, JSON
+from sqlalchemy.orm import relationship
+
+from ..core.database import Base
+
+
+class MoodDailyRollup(Base):
+    """
+    Агрегаты записей пользователя за один день
+    Временные ряды (по дням, неделям, месяцам) строятся по этим строкам
+    без загрузки самих записей и JSON анализа
+    """
+    __tablename__ = "mood_daily_rollup"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True, comment="ID пользователя")
+    day = Column(Date, primary_key=True, comment="День записей")
+    
+    # Оценки настроения
+    entries_count = Column(Integer, nullable=False, default=0, comment="Количество записей за день")
+    mood_sum = Column(Float, nullable=False, default=0.0, comment="Сумма оценок настроения")
+    positive_count = Column(Integer, nullable=False, default=0, comment="Записей с оценкой 7-10")
+    neutral_count = Column(Integer, nullable=False, default=0, comment="Записей с оценкой 4-6")
+    negative_count = Column(Integer, nullable=False, default=0, comment="Записей с оценкой 1-3")
+    
+    # Эмоции из AI анализа: {"радость": сумма} и {"радость": количество анализов}
+    emotion_sums = Column(JSON, nullable=False, default=dict, comment="Суммы интенсивности эмоций")
+    emotion_counts = Column(JSON, nullable=False, default=dict, comment="Количество значений эмоций")
+    
+    # Связи
+    user = relationship("User", back_populates="daily_rollups")
+    
+    def __repr__(self):
+        return f"<MoodDailyRollup(user_id={self.user_id}, day={self.day}, entries={self.entries_count})>"
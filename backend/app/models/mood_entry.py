@@ -2,7 +2,7 @@
 Модель записи настроения
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -15,6 +15,10 @@ class MoodEntry(Base):
     Основная сущность для хранения ежедневных записей о настроении
     """
     __tablename__ = "mood_entries"
+    __table_args__ = (
+        # Основной путь доступа: записи пользователя по дате (проверка дня, периоды, пагинация)
+        Index("ix_mood_entries_user_id_entry_date", "user_id", "entry_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="ID пользователя")
@@ -36,7 +40,8 @@ class MoodEntry(Base):
     
     # Связи
     user = relationship("User", back_populates="mood_entries")
-    ai_analysis = relationship("AIAnalysis", back_populates="mood_entry", uselist=False)
+    ai_analysis = relationship("AIAnalysis", back_populates="mood_entry", uselist=False, cascade="all, delete-orphan")
+    analysis_jobs = relationship("AnalysisJob", back_populates="mood_entry", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<MoodEntry(id={self.id}, user_id={self.user_id}, mood_score={self.mood_score}, date={self.entry_date})>"
@@ -38,6 +38,10 @@ class User(Base):
     # Связи
     mood_entries = relationship("MoodEntry", back_populates="user", cascade="all, delete-orphan")
     ai_analyses = relationship("AIAnalysis", back_populates="user", cascade="all, delete-orphan")
+    mood_stats = relationship("UserMoodStats", back_populates="user", uselist=False, cascade="all, delete-orphan")
+    daily_rollups = relationship("MoodDailyRollup", back_populates="user", cascade="all, delete-orphan")
+    insights = relationship("UserInsights", back_populates="user", cascade="all, delete-orphan")
+    history_summary = relationship("UserHistorySummary", back_populates="user", uselist=False, cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<User(id={self.id}, telegram_id={self.telegram_id}, username='{self.username}')>"
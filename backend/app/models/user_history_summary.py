@@ -0,0 +1,30 @@
+"""
+Модель сжатой истории настроения пользователя
+"""
+
+from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey, JSON
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from ..core.database import Base
+
+
+class UserHistorySummary(Base):
+    """
+    Помесячные итоги записей пользователя старше окна подробных записей
+    Дополняется днями из mood_daily_rollup по мере того, как они выходят
+    из окна, и заменяет старые записи в промпте инсайтов
+    """
+    __tablename__ = "user_history_summaries"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True, comment="ID пользователя")
+    covered_until = Column(Date, nullable=False, comment="Последний учтенный день")
+    # {"2024-05": {"entries_count", "mood_sum", "emotion_sums", "emotion_counts"}}
+    months = Column(JSON, nullable=False, default=dict, comment="Итоги по месяцам")
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="Дата обновления")
+    
+    # Связи
+    user = relationship("User", back_populates="history_summary")
+    
+    def __repr__(self):
+        return f"<UserHistorySummary(user_id={self.user_id}, covered_until={self.covered_until}, months={len(self.months or {})})>"
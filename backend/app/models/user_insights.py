@@ -0,0 +1,33 @@
+"""
+Модель сохраненных AI инсайтов пользователя
+"""
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from ..core.database import Base
+
+
+class UserInsights(Base):
+    """
+    Последние инсайты Gemini по записям пользователя за период
+    window_hash - хэш промпта по окну записей: пока новая запись не изменит
+    окно, инсайты отдаются из таблицы без запроса к модели
+    """
+    __tablename__ = "user_insights"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True, comment="ID пользователя")
+    period_days = Column(Integer, primary_key=True, comment="Период анализа в днях")
+    
+    window_hash = Column(String(64), nullable=False, comment="SHA-256 промпта по окну записей")
+    insights_text = Column(Text, nullable=False, comment="Текст инсайтов")
+    entries_analyzed = Column(Integer, nullable=False, default=0, comment="Записей в окне")
+    ai_model = Column(String(50), nullable=True, comment="Модель, сгенерировавшая инсайты")
+    generated_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="Дата генерации")
+    
+    # Связи
+    user = relationship("User", back_populates="insights")
+    
+    def __repr__(self):
+        return f"<UserInsights(user_id={self.user_id}, period_days={self.period_days}, hash={self.window_hash[:12]})>"
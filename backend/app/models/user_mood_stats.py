@@ -0,0 +1,67 @@
+"""
+Модель агрегированной статистики настроения пользователя
+"""
+
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from ..core.database import Base
+
+
+class UserMoodStats(Base):
+    """
+    Инкрементально поддерживаемая статистика пользователя
+    Обновляется в той же транзакции, что и записи настроения,
+    чтобы статистика читалась одной строкой без пересчета истории
+    """
+    __tablename__ = "user_mood_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True, comment="ID пользователя")
+    
+    # Накопительные суммы
+    entries_count = Column(Integer, nullable=False, default=0, comment="Количество записей")
+    mood_sum = Column(Float, nullable=False, default=0.0, comment="Сумма оценок настроения")
+    
+    # Распределение настроения
+    positive_count = Column(Integer, nullable=False, default=0, comment="Записей с оценкой 7-10")
+    neutral_count = Column(Integer, nullable=False, default=0, comment="Записей с оценкой 4-6")
+    negative_count = Column(Integer, nullable=False, default=0, comment="Записей с оценкой 1-3")
+    
+    # Последняя запись и серия дней
+    last_entry_date = Column(DateTime, nullable=True, comment="Дата самой поздней записи")
+    streak_days = Column(Integer, nullable=False, default=0, comment="Серия дней подряд, заканчивающаяся днем последней записи")
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment="Дата обновления")
+    
+    # Связи
+    user = relationship("User", back_populates="mood_stats")
+    
+    def __repr__(self):
+        return f"<UserMoodStats(user_id={self.user_id}, entries={self.entries_count}, streak={self.streak_days})>"
+    
+    @property
+    def average_mood(self) -> float:
+        """Средняя оценка настроения"""
+        return self.mood_sum / self.entries_count if self.entries_count else 0.0
+    
+    @property
+    def mood_distribution(self) -> dict:
+        """Распределение настроения по корзинам"""
+        return {
+            "positive": self.positive_count,
+            "neutral": self.neutral_count,
+            "negative": self.negative_count
+        }
+    
+    def to_dict(self):
+        """Преобразование объекта в словарь для JSON ответов"""
+        return {
+            "user_id": self.user_id,
+            "entries_count": self.entries_count,
+            "average_mood": round(self.average_mood, 2),
+            "mood_distribution": self.mood_distribution,
+            "last_entry_date": self.last_entry_date.isoformat() if self.last_entry_date else None,
+            "streak_days": self.streak_days,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -127,6 +127,31 @@ class AIAnalysis(AIAnalysisBase):
 class MoodEntryWithAnalysis(MoodEntry):
     """Запись настроения с AI анализом"""
     ai_analysis: Optional[AIAnalysis] = None
+    analysis_status: Optional[str] = Field(None, description="Состояние задачи анализа: queued/running/done/failed")
+
+
+class AnalysisStatus(BaseModel):
+    """Состояние AI анализа записи"""
+    mood_entry_id: int
+    status: str = Field(..., description="none/queued/running/done/failed")
+    job_id: Optional[int] = None
+    attempts: int = 0
+    last_error: Optional[str] = None
+    run_after: Optional[datetime] = Field(None, description="Время следующей попытки")
+    finished_at: Optional[datetime] = None
+    has_analysis: bool = False
+
+
+class MoodEntryPage(BaseModel):
+    """Страница записей настроения при курсорной пагинации"""
+    items: List[MoodEntryWithAnalysis]
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы, None - последняя страница")
+
+
+class UserPage(BaseModel):
+    """Страница пользователей при курсорной пагинации"""
+    items: List[User]
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы, None - последняя страница")
 
 
 class UserStats(BaseModel):
@@ -0,0 +1,134 @@
+"""
+Микро-пакетирование запросов анализа к Gemini
+Записи, пришедшие за короткое окно, отправляются одним промптом,
+каждый вызывающий получает свой результат через future
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, List, Set, Tuple
+
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Запись в очереди пакета: текст, оценка настроения и future вызывающего
+PendingItem = Tuple[str, float, asyncio.Future]
+
+
+class AnalysisBatcher:
+    """
+    Собирает запросы анализа в пакеты
+    
+    Пакет отправляется через window секунд после первой записи
+    или сразу при накоплении max_size записей. Одна запись в пакете
+    анализируется обычным промптом
+    """
+    
+    def __init__(self, service, window: float, max_size: int):
+        self.service = service
+        self.window = window
+        self.max_size = max_size
+        self._pending: List[PendingItem] = []
+        self._timer = None
+        # Ссылки на запущенные задачи, чтобы их не собрал сборщик мусора
+        self._tasks: Set[asyncio.Task] = set()
+        
+        self.batches = metrics.counter("gemini_batches", "Пакетных запросов к Gemini")
+        self.batched_items = metrics.counter("gemini_batched_items", "Записей, проанализированных пакетом")
+        self.item_fallbacks = metrics.counter(
+            "gemini_batch_item_fallbacks", "Записей пакета, переотправленных отдельным запросом"
+        )
+    
+    async def submit(self, text: str, mood_score: float) -> Dict[str, Any]:
+        """
+        Поставить запись в пакет и дождаться ее результата
+        
+        Raises:
+            Исключение запроса к Gemini, если пакет целиком не удался
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, mood_score, future))
+        
+        if len(self._pending) >= self.max_size:
+            self._spawn(self._run_batch(self._take_batch()))
+        elif self._timer is None:
+            self._timer = self._spawn(self._flush_after_window())
+        
+        return await future
+    
+    def _spawn(self, coro: Awaitable) -> asyncio.Task:
+        """Запустить фоновую задачу и хранить ссылку до ее завершения"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+    
+    def _take_batch(self) -> List[PendingItem]:
+        """Забрать из очереди не больше max_size записей"""
+        batch = self._pending[:self.max_size]
+        self._pending = self._pending[self.max_size:]
+        return batch
+    
+    async def _flush_after_window(self):
+        """Отправить накопленные записи по истечении окна"""
+        await asyncio.sleep(self.window)
+        self._timer = None
+        while self._pending:
+            self._spawn(self._run_batch(self._take_batch()))
+    
+    async def _resolve(self, future: asyncio.Future, coro: Awaitable) -> None:
+        """Передать результат или исключение корутины в future вызывающего"""
+        try:
+            result = await coro
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        
+        if not future.done():
+            future.set_result(result)
+    
+    async def _run_batch(self, batch: List[PendingItem]) -> None:
+        """Проанализировать пакет одним запросом и раздать результаты"""
+        # Вызывающий мог перестать ждать, например по таймауту
+        batch = [item for item in batch if not item[2].done()]
+        if not batch:
+            return
+        
+        if len(batch) == 1:
+            text, mood_score, future = batch[0]
+            await self._resolve(future, self.service._analyze_single(text, mood_score))
+            return
+        
+        item_ids = [str(number) for number in range(1, len(batch) + 1)]
+        try:
+            prompt = self.service._create_batch_analysis_prompt([
+                (item_id, text, mood_score) for item_id, (text, mood_score, _) in zip(item_ids, batch)
+            ])
+            response_text = await self.service._generate(prompt, self.service.batch_analysis_config)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self.batches.inc()
+        results = self.service._parse_batch_analysis_response(response_text, item_ids)
+        
+        # Испорченные элементы пакета переотправляем отдельными запросами
+        retries = []
+        for item_id, (text, mood_score, future) in zip(item_ids, batch):
+            result = results.get(item_id)
+            if result is None:
+                retries.append(self._resolve(future, self.service._analyze_single(text, mood_score)))
+                continue
+            
+            self.batched_items.inc()
+            if not future.done():
+                future.set_result(result)
+        
+        if retries:
+            logger.warning(f"Пакетный ответ Gemini: {len(retries)} из {len(batch)} записей переотправлены отдельно")
+            self.item_fallbacks.inc(len(retries))
+            await asyncio.gather(*retries)
@@ -0,0 +1,167 @@
+"""
+Кэш результатов AI анализа по содержимому записи
+Два уровня: LRU в памяти процесса и постоянное хранилище
+(таблица analysis_cache в основной БД или Redis, если задан REDIS_URL)
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import re
+from typing import Any, Dict, Optional
+
+from ..core.cache import TTLCache
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.metrics import metrics
+from ..crud.analysis_cache import analysis_cache_crud
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis нужен только при заданном REDIS_URL
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Нормализовать текст записи: регистр, ё, лишние пробелы"""
+    return _WHITESPACE_RE.sub(" ", (text or "").lower().replace("ё", "е")).strip()
+
+
+def make_cache_key(text: str, mood_score: float, model_name: str, prompt_version: str) -> str:
+    """
+    Ключ кэша по содержимому запроса к модели
+    Оценка округляется до целого: соседние оценки дают практически тот же анализ
+    """
+    payload = json.dumps(
+        [normalize_text(text), int(round(mood_score)), model_name, prompt_version],
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLAnalysisStore:
+    """Постоянный уровень кэша в таблице analysis_cache основной БД"""
+    
+    # Очистка просроченных и лишних строк раз в столько записей
+    PRUNE_EVERY = 100
+    
+    def __init__(self, ttl: int, max_rows: int):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._writes = 0
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(analysis_cache_crud.get, key)
+    
+    async def set(self, key: str, result: Dict[str, Any]) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(analysis_cache_crud.set, key, result, self.ttl)
+            
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                await db.run_sync(analysis_cache_crud.prune, self.max_rows)
+
+
+class RedisAnalysisStore:
+    """
+    Постоянный уровень кэша в Redis
+    Срок жизни задается через EXPIRE, вытеснение по размеру - политикой maxmemory
+    """
+    
+    KEY_PREFIX = "analysis:"
+    
+    def __init__(self, url: str, ttl: int):
+        self.ttl = ttl
+        self.client = aioredis.from_url(url)
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self.client.get(self.KEY_PREFIX + key)
+        return json.loads(raw) if raw else None
+    
+    async def set(self, key: str, result: Dict[str, Any]) -> None:
+        await self.client.set(self.KEY_PREFIX + key, json.dumps(result, ensure_ascii=False), ex=self.ttl)
+
+
+class AnalysisCache:
+    """
+    Двухуровневый кэш анализа
+    Ошибки постоянного хранилища не ломают анализ: считаются промахом
+    """
+    
+    def __init__(self):
+        self.enabled = settings.ANALYSIS_CACHE_ENABLED
+        self.memory = TTLCache(ttl=settings.ANALYSIS_CACHE_TTL, max_size=settings.ANALYSIS_CACHE_MEMORY_SIZE)
+        self.store = self._create_store()
+        
+        self.memory_hits = metrics.counter("analysis_cache_memory_hits", "Попадания в кэш анализа в памяти")
+        self.store_hits = metrics.counter("analysis_cache_store_hits", "Попадания в постоянный кэш анализа")
+        self.misses = metrics.counter("analysis_cache_misses", "Промахи кэша анализа")
+        self.errors = metrics.counter("analysis_cache_errors", "Ошибки постоянного кэша анализа")
+    
+    def _create_store(self):
+        """Постоянное хранилище: Redis при заданном REDIS_URL, иначе таблица в БД"""
+        if settings.REDIS_URL:
+            if aioredis is not None:
+                return RedisAnalysisStore(settings.REDIS_URL, settings.ANALYSIS_CACHE_TTL)
+            logger.warning("⚠️ REDIS_URL задан, но пакет redis не установлен, кэш анализа хранится в БД")
+        return SQLAnalysisStore(settings.ANALYSIS_CACHE_TTL, settings.ANALYSIS_CACHE_MAX_ROWS)
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Результат анализа из кэша или None"""
+        if not self.enabled:
+            return None
+        
+        result = self.memory.get(key)
+        if result is not None:
+            self.memory_hits.inc()
+            return copy.deepcopy(result)
+        
+        try:
+            result = await self.store.get(key)
+        except Exception as e:
+            logger.warning(f"Ошибка чтения кэша анализа: {e}")
+            self.errors.inc()
+            result = None
+        
+        if result is None:
+            self.misses.inc()
+            return None
+        
+        self.store_hits.inc()
+        self.memory.set(key, result)
+        return copy.deepcopy(result)
+    
+    async def set(self, key: str, result: Dict[str, Any]) -> None:
+        """Сохранить результат анализа в оба уровня"""
+        if not self.enabled:
+            return
+        
+        self.memory.set(key, copy.deepcopy(result))
+        try:
+            await self.store.set(key, result)
+        except Exception as e:
+            logger.warning(f"Ошибка записи кэша анализа: {e}")
+            self.errors.inc()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики кэша для /health"""
+        return {
+            "enabled": self.enabled,
+            "backend": "redis" if isinstance(self.store, RedisAnalysisStore) else "sql",
+            "memory_size": len(self.memory),
+            "memory_hits": self.memory_hits.value,
+            "store_hits": self.store_hits.value,
+            "misses": self.misses.value,
+            "errors": self.errors.value,
+        }
+
+
+# Создаем экземпляр кэша
+analysis_cache = AnalysisCache()
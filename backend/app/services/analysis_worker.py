@@ -0,0 +1,191 @@
+"""
+Воркеры фонового AI анализа
+Берут задачи из таблицы analysis_jobs, анализируют записи и сохраняют результат.
+Работают внутри процесса API или отдельно через run_worker.py
+"""
+
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..crud.analysis_job import analysis_job_crud
+from ..models.analysis_job import AnalysisJob, JOB_QUEUED, JOB_RUNNING
+from ..models.mood_entry import MoodEntry
+from .gemini_service import gemini_service
+from .mood_analyzer import LateResultWriter, ProgressCallback, mood_analyzer
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisWorker:
+    """Пул асинхронных воркеров очереди анализа"""
+    
+    # Как часто проверять зависшие задачи, секунды
+    REQUEUE_INTERVAL = 60
+    
+    def __init__(self):
+        self.concurrency = settings.ANALYSIS_WORKER_CONCURRENCY
+        self.poll_interval = settings.ANALYSIS_JOB_POLL_INTERVAL
+        self.max_attempts = settings.ANALYSIS_JOB_MAX_ATTEMPTS
+        self.retry_base = settings.ANALYSIS_JOB_RETRY_BASE
+        self.stale_after = settings.ANALYSIS_JOB_STALE_AFTER
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._last_requeue = 0.0
+    
+    def start(self) -> None:
+        """Запустить воркеры в текущем event loop"""
+        if self._tasks:
+            return
+        
+        self._tasks = [
+            asyncio.create_task(self._run_loop(number))
+            for number in range(self.concurrency)
+        ]
+        logger.info(f"✅ Запущено воркеров анализа: {self.concurrency}")
+    
+    async def stop(self) -> None:
+        """Остановить воркеры. Прерванные задачи вернутся в очередь как зависшие"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    def notify(self) -> None:
+        """Разбудить воркеры: в очереди появилась задача"""
+        self._wakeup.set()
+    
+    async def _run_loop(self, number: int) -> None:
+        """Цикл одного воркера"""
+        while True:
+            try:
+                if number == 0:
+                    await self._requeue_stale()
+                job = await self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Ошибка воркера анализа: {e}")
+                job = None
+            
+            if job is None:
+                await self._wait_for_work()
+    
+    async def _wait_for_work(self) -> None:
+        """Ждать уведомления о новой задаче, но не дольше интервала опроса"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+    
+    async def _requeue_stale(self) -> None:
+        """Периодически возвращать в очередь задачи упавших воркеров"""
+        if time.monotonic() - self._last_requeue < self.REQUEUE_INTERVAL:
+            return
+        
+        self._last_requeue = time.monotonic()
+        async with AsyncSessionLocal() as db:
+            requeued = await db.run_sync(analysis_job_crud.requeue_stale, self.stale_after)
+        if requeued:
+            logger.warning(f"⚠️ Возвращено в очередь зависших задач анализа: {requeued}")
+    
+    async def run_once(
+        self,
+        job_id: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> Optional[AnalysisJob]:
+        """
+        Взять и выполнить одну задачу
+        
+        Args:
+            job_id: выполнить конкретную задачу, если она еще в очереди
+            on_progress: получать поля анализа по мере ответа модели (потоковый анализ)
+        
+        Returns:
+            Задача после выполнения или None, если брать нечего
+        """
+        async with AsyncSessionLocal() as db:
+            job = await db.run_sync(analysis_job_crud.claim, job_id)
+            if job is None:
+                return None
+            
+            await self._process(db, job, on_progress)
+            return job
+    
+    async def run_job(
+        self,
+        job_id: int,
+        timeout: float,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> Optional[AnalysisJob]:
+        """
+        Выполнить задачу сразу, не дожидаясь воркеров
+        Если задачу уже взял другой воркер, дождаться ее завершения
+        (тогда on_progress не вызывается)
+        
+        Returns:
+            Задача в последнем известном состоянии
+        """
+        job = await self.run_once(job_id, on_progress)
+        if job is not None:
+            return job
+        
+        deadline = time.monotonic() + timeout
+        while True:
+            async with AsyncSessionLocal() as db:
+                job = await db.run_sync(analysis_job_crud.get_by_id, job_id)
+            if job is None or job.status not in (JOB_QUEUED, JOB_RUNNING) or time.monotonic() >= deadline:
+                return job
+            await asyncio.sleep(self.poll_interval)
+    
+    async def _requeue_entry(self, entry_id: int) -> None:
+        """Поставить запись в очередь заново: ответ модели после дедлайна так и не пришел"""
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(analysis_job_crud.enqueue, entry_id)
+        self.notify()
+    
+    async def _process(self, db, job: AnalysisJob, on_progress: Optional[ProgressCallback] = None) -> None:
+        """
+        Проанализировать запись задачи и сохранить результат
+        Если истек дедлайн вызывающего, сохраняется fallback анализ, а ответ
+        модели заменит его позже
+        """
+        late_writer: Optional[LateResultWriter] = None
+        try:
+            entry = await db.run_sync(lambda s: s.get(MoodEntry, job.mood_entry_id))
+            if entry is None:
+                await db.run_sync(analysis_job_crud.mark_failed, job, "Запись удалена", job.attempts, self.retry_base)
+                return
+            
+            # Соединение не держим, пока ждем ответ Gemini
+            await db.commit()
+            late_writer = LateResultWriter(mood_analyzer, entry, on_missing=self._requeue_entry)
+            analysis_result = await mood_analyzer.analyze_entry(entry, on_progress, late_writer)
+            
+            # Fallback вместо ответа модели: повторим позже, на последней попытке сохраним его.
+            # После дедлайна повторять не нужно - ответ модели еще придет
+            if (
+                gemini_service.is_fallback(analysis_result)
+                and not gemini_service.is_late_result_pending(analysis_result)
+                and job.attempts < self.max_attempts
+            ):
+                raise RuntimeError("Gemini AI не ответил, получен fallback анализ")
+            
+            await db.run_sync(mood_analyzer.replace_analysis, entry, analysis_result)
+            await db.run_sync(analysis_job_crud.mark_done, job)
+            logger.info(f"✅ Задача анализа {job.id} выполнена (запись {job.mood_entry_id})")
+        
+        except Exception as e:
+            logger.error(f"❌ Задача анализа {job.id}, попытка {job.attempts}: {e}")
+            await db.rollback()
+            await db.run_sync(analysis_job_crud.mark_failed, job, str(e), self.max_attempts, self.retry_base)
+        
+        finally:
+            if late_writer is not None:
+                late_writer.release()
+
+
+# Создаем экземпляр пула воркеров
+analysis_worker = AnalysisWorker()
@@ -0,0 +1,95 @@
+"""
+Сервис данных dashboard
+Все блоки dashboard строятся по одному снимку записей пользователя
+"""
+
+import logging
+from typing import Dict, Any, List
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, desc
+from datetime import datetime, timedelta
+
+from ..crud.analysis_emotion import analysis_emotion_crud
+from ..crud.mood_daily_rollup import mood_daily_rollup_crud
+from ..crud.mood_entry import mood_entry_crud
+from ..models.mood_entry import MoodEntry
+from .mood_analyzer import mood_analyzer
+
+logger = logging.getLogger(__name__)
+
+
+class EntrySnapshot:
+    """
+    Записи пользователя (с ai_analysis) начиная с заданного момента,
+    загруженные одним запросом. Порядок - по убыванию даты, затем по id
+    """
+    
+    def __init__(self, user_id: int, since: datetime, now: datetime, entries: List[MoodEntry]):
+        self.user_id = user_id
+        self.since = since
+        self.now = now
+        self.entries = entries
+    
+    @classmethod
+    def load(cls, db: Session, user_id: int, since: datetime, now: datetime) -> "EntrySnapshot":
+        """Загрузить записи пользователя с момента since"""
+        entries = db.query(MoodEntry).options(
+            joinedload(MoodEntry.ai_analysis)
+        ).filter(
+            and_(MoodEntry.user_id == user_id, MoodEntry.entry_date >= since)
+        ).order_by(desc(MoodEntry.entry_date), MoodEntry.id).all()
+        return cls(user_id, since, now, entries)
+    
+    def since_days(self, days: int) -> List[MoodEntry]:
+        """Записи за последние days дней (как get_recent_entries)"""
+        start_date = self.now - timedelta(days=days)
+        if start_date < self.since:
+            raise ValueError(f"Снимок не покрывает последние {days} дней")
+        return [entry for entry in self.entries if entry.entry_date >= start_date]
+
+
+class DashboardService:
+    """Сборка данных dashboard из одного снимка записей"""
+    
+    # Блоки dashboard: последние записи и рекомендации за 5 дней,
+    # сводка за 7 дней, аналитика за месяц
+    RECENT_DAYS = 5
+    SUMMARY_DAYS = 7
+    ANALYTICS_PERIOD = "month"
+    
+    def get_dashboard_data(self, db: Session, user_id: int) -> Dict[str, Any]:
+        """
+        Собрать данные dashboard
+        
+        Записи загружаются один раз с начала месячного периода аналитики,
+        остальные блоки считаются по подмножествам этого снимка
+        """
+        now = datetime.utcnow()
+        analytics_start = mood_entry_crud.get_analytics_start(self.ANALYTICS_PERIOD, now)
+        snapshot = EntrySnapshot.load(
+            db, user_id, datetime.combine(analytics_start, datetime.min.time()), now
+        )
+        
+        recent_entries = snapshot.since_days(self.RECENT_DAYS)
+        summary_entries = snapshot.since_days(self.SUMMARY_DAYS)
+        # Аналитика по дням заканчивается сегодняшним днем, как в get_mood_analytics
+        month_entries = [entry for entry in snapshot.entries if entry.entry_date.date() <= now.date()]
+        
+        return {
+            "summary": mood_analyzer.summarize_entries(
+                summary_entries,
+                self.SUMMARY_DAYS,
+                analysis_emotion_crud.averages_from_entries(summary_entries)
+            ),
+            "recent_entries": [entry.to_dict() for entry in recent_entries],
+            "monthly_analytics": mood_entry_crud.build_mood_analytics(
+                self.ANALYTICS_PERIOD,
+                mood_daily_rollup_crud.series_from_entries(month_entries)
+            ),
+            "recommendations": mood_analyzer.recommendations_from_entries(recent_entries),
+            "stats": mood_entry_crud.get_user_stats(db, user_id, latest_entries=snapshot.entries)
+        }
+
+
+# Создаем экземпляр сервиса
+dashboard_service = DashboardService()
@@ -0,0 +1,151 @@
+"""
+Локальная модель вместо Gemini
+Отвечает в формате SDK google-generativeai без сети и квоты: задержка
+ответа из логнормального распределения, доля ошибок и испорченных JSON
+ответов настраиваются. Нужна для нагрузочных тестов пути AI анализа
+"""
+
+import asyncio
+import json
+import random
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from .gemini_response import ANALYSIS_RESPONSE_SCHEMA
+from .local_analyzer import local_analyzer
+
+_SINGLE_RE = re.compile(r'Текст пользователя: "(.*)"\nОценка настроения \(1-10\): ([\d.]+)', re.S)
+_BATCH_MARKER = "Записи (id, текст пользователя, оценка настроения 1-10):"
+
+_ANALYSIS_FIELDS = list(ANALYSIS_RESPONSE_SCHEMA["properties"])
+
+FAKE_INSIGHTS = (
+    "Настроение в последние дни стабильное, лучшие оценки совпадают с прогулками и встречами с друзьями. "
+    "Стоит сохранить привычку вечерних прогулок и следить за сном в напряженные дни."
+)
+
+
+class FakeGeminiError(Exception):
+    """Ошибка локальной модели, как ответ 500 от Gemini API"""
+
+
+class FakeResponse:
+    """Ответ или фрагмент потокового ответа с атрибутом text, как у SDK"""
+    
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeStreamResponse:
+    """Потоковый ответ: фрагменты приходят равномерно в течение задержки модели"""
+    
+    def __init__(self, chunks: List[str], interval: float):
+        self.chunks = chunks
+        self.interval = interval
+    
+    async def __aiter__(self) -> AsyncIterator[FakeResponse]:
+        for chunk in self.chunks:
+            await asyncio.sleep(self.interval)
+            yield FakeResponse(chunk)
+
+
+class FakeGeminiModel:
+    """
+    Замена genai.GenerativeModel с методом generate_content_async
+    
+    Промпт анализа получает результат локального анализатора в JSON,
+    пакетный промпт - массив результатов с id записей, остальные промпты -
+    текст инсайтов. С вероятностью error_rate запрос завершается
+    FakeGeminiError, с вероятностью malformed_rate ответ обрезается
+    на середине JSON
+    """
+    
+    def __init__(
+        self,
+        latency: float = 0.8,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.malformed = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+    
+    @classmethod
+    def from_settings(cls) -> "FakeGeminiModel":
+        return cls(
+            latency=settings.GEMINI_FAKE_LATENCY_MS / 1000,
+            latency_sigma=settings.GEMINI_FAKE_LATENCY_SIGMA,
+            error_rate=settings.GEMINI_FAKE_ERROR_RATE,
+            malformed_rate=settings.GEMINI_FAKE_MALFORMED_RATE
+        )
+    
+    def sample_latency(self) -> float:
+        """Задержка ответа: логнормальное распределение с медианой latency"""
+        if self.latency_sigma <= 0:
+            return self.latency
+        return self.latency * self.random.lognormvariate(0, self.latency_sigma)
+    
+    def respond(self, prompt: str) -> str:
+        """Текст ответа на промпт"""
+        if _BATCH_MARKER in prompt:
+            items = self._batch_items(prompt)
+            results = local_analyzer.analyze_batch([(text, score) for _, text, score in items])
+            return json.dumps(
+                [{"id": item_id, **self._analysis_fields(result)} for (item_id, _, _), result in zip(items, results)],
+                ensure_ascii=False
+            )
+        
+        match = _SINGLE_RE.search(prompt)
+        if match:
+            result = local_analyzer.analyze(match.group(1), float(match.group(2)))
+            return json.dumps(self._analysis_fields(result), ensure_ascii=False)
+        
+        return FAKE_INSIGHTS
+    
+    def _batch_items(self, prompt: str) -> List[Tuple[str, str, float]]:
+        start = prompt.index("[", prompt.index(_BATCH_MARKER))
+        entries, _ = json.JSONDecoder().raw_decode(prompt, start)
+        return [(entry["id"], entry["text"], float(entry["mood_score"])) for entry in entries]
+    
+    def _analysis_fields(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        return {field: result[field] for field in _ANALYSIS_FIELDS if field in result}
+    
+    async def generate_content_async(self, prompt: str, generation_config: Any = None, stream: bool = False) -> Any:
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            latency = self.sample_latency()
+            text = self.respond(prompt)
+            if self.random.random() < self.malformed_rate:
+                self.malformed += 1
+                text = text[:len(text) // 2]
+            
+            if stream:
+                # Первый фрагмент приходит через треть задержки, остальные до ее конца
+                await asyncio.sleep(latency / 3)
+                self._maybe_fail()
+                size = max(1, len(text) // 4)
+                chunks = [text[i:i + size] for i in range(0, len(text), size)]
+                return FakeStreamResponse(chunks, latency * 2 / 3 / len(chunks))
+            
+            await asyncio.sleep(latency)
+            self._maybe_fail()
+            return FakeResponse(text)
+        finally:
+            self.in_flight -= 1
+    
+    def _maybe_fail(self) -> None:
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            raise FakeGeminiError("500 Internal error (локальная модель)")
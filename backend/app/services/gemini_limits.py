@@ -0,0 +1,314 @@
+"""
+Защита запросов к Gemini от перегрузки
+Token bucket по квотам RPM/TPM, адаптивный (AIMD) лимит одновременных
+запросов, circuit breaker, который при сбоях Gemini сразу отдает fallback,
+и окно задержек ответов для hedged запросов
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import List, Optional
+
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Примерное число символов на токен Gemini для смешанного русского текста
+CHARS_PER_TOKEN = 3
+
+# Границы корзин гистограмм размера промпта, токены
+PROMPT_TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов текста без обращения к API"""
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+class CircuitOpenError(Exception):
+    """Circuit breaker открыт: запрос к Gemini не отправляется"""
+
+
+class QuotaExceededError(Exception):
+    """Квоты Gemini не хватит в разумное время: запрос не отправляется"""
+
+
+class TokenBucket:
+    """
+    Token bucket с пополнением rate_per_minute токенов в минуту
+    Запас не больше capacity, rate_per_minute <= 0 отключает ограничение
+    """
+    
+    def __init__(self, name: str, rate_per_minute: float, capacity: Optional[float] = None):
+        self.name = name
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self._updated_at = time.monotonic()
+        
+        self.waits = metrics.counter(f"{name}_waits", "Запросов, ждавших пополнения квоты")
+    
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+    
+    def wait_time(self, amount: float = 1) -> float:
+        """Сколько секунд ждать amount токенов при текущем запасе"""
+        if not self.enabled:
+            return 0.0
+        
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+    
+    async def acquire(self, amount: float = 1) -> None:
+        """Дождаться и забрать amount токенов"""
+        if not self.enabled:
+            return
+        
+        # Запрос больше всей емкости иначе ждал бы вечно
+        amount = min(amount, self.capacity)
+        waited = False
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            
+            if not waited:
+                self.waits.inc()
+                waited = True
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+    
+    def consume(self, amount: float) -> None:
+        """Списать токены без ожидания, запас может уйти в минус (например, токены ответа)"""
+        if not self.enabled:
+            return
+        
+        self._refill()
+        self.tokens -= amount
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Лимит одновременных запросов по схеме AIMD
+    
+    Быстрый успешный ответ увеличивает лимит на 1/limit (примерно +1 за
+    каждые limit ответов), ошибка или ответ медленнее latency_target
+    умножает лимит на backoff. Снижение учитывает только запросы,
+    отправленные после предыдущего снижения, иначе одна волна таймаутов
+    сбросила бы лимит до минимума
+    """
+    
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        latency_target: float = 10.0,
+        backoff: float = 0.5
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._waiters: List[asyncio.Future] = []
+        self._last_decrease = 0.0
+        
+        self.limit_gauge = metrics.gauge("gemini_concurrency_limit", "Текущий лимит одновременных запросов к Gemini")
+        self.in_flight_gauge = metrics.gauge("gemini_in_flight", "Запросов к Gemini в процессе")
+        self.decreases = metrics.counter("gemini_concurrency_decreases", "Снижений лимита одновременных запросов")
+        self.limit_gauge.set(self.max_limit)
+    
+    def _has_slot(self) -> bool:
+        return self.in_flight < max(self.min_limit, int(self.limit))
+    
+    def has_capacity(self) -> bool:
+        """Есть свободный слот: новый запрос не встанет в очередь"""
+        return self._has_slot() and not self._waiters
+    
+    async def acquire(self) -> float:
+        """
+        Занять слот, дождавшись освобождения при исчерпанном лимите
+        
+        Returns:
+            Время отправки запроса для release
+        """
+        while not self._has_slot():
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        
+        self.in_flight += 1
+        self.in_flight_gauge.set(self.in_flight)
+        return time.monotonic()
+    
+    def release(self, started_at: float, success: Optional[bool]) -> None:
+        """
+        Освободить слот и скорректировать лимит
+        
+        Args:
+            started_at: значение, которое вернул acquire
+            success: результат запроса, None - запрос отменен и лимит не меняется
+        """
+        self.in_flight -= 1
+        self.in_flight_gauge.set(self.in_flight)
+        
+        if success is not None:
+            latency = time.monotonic() - started_at
+            if success and latency <= self.latency_target:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif started_at >= self._last_decrease:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = time.monotonic()
+                self.decreases.inc()
+            self.limit_gauge.set(round(self.limit, 2))
+        
+        # Будим всех: лимит мог вырасти больше чем на один слот
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters = []
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker для запросов к Gemini
+    
+    closed - запросы идут как обычно. После failure_threshold ошибок подряд
+    переходит в open: запросы сразу отклоняются. Через recovery_timeout
+    переходит в half_open и пропускает до half_open_calls пробных запросов.
+    Успешная проба закрывает breaker, ошибка снова открывает его
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    # Числовые значения состояния для метрик
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    
+    def __init__(self, failure_threshold: int, recovery_timeout: float, half_open_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_calls = half_open_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        
+        self.state_gauge = metrics.gauge(
+            "gemini_circuit_state", "Состояние circuit breaker Gemini: 0 closed, 1 half_open, 2 open"
+        )
+        self.trips = metrics.counter("gemini_circuit_trips", "Срабатываний circuit breaker Gemini")
+        self.rejected = metrics.counter("gemini_circuit_rejected", "Запросов, отклоненных открытым circuit breaker")
+    
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logger.warning(f"⚠️ Circuit breaker Gemini: {self.state} -> {state}")
+        self.state = state
+        self.state_gauge.set(self.STATE_VALUES[state])
+    
+    def _refresh(self) -> None:
+        """Перейти из open в half_open, если recovery_timeout истек"""
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._set_state(self.HALF_OPEN)
+            self._probes = 0
+    
+    def check(self) -> None:
+        """
+        Проверить breaker, не занимая пробный слот
+        Вызывается до ожидания квоты и слота, чтобы при открытом breaker
+        запрос сразу ушел в локальный анализ и не тратил квоту
+        
+        Raises:
+            CircuitOpenError: breaker открыт или все пробные запросы уже отправлены
+        """
+        self._refresh()
+        if self.state == self.CLOSED:
+            return
+        
+        if self.state == self.HALF_OPEN and self._probes < self.half_open_calls:
+            return
+        
+        self.rejected.inc()
+        raise CircuitOpenError("Gemini временно недоступен, circuit breaker открыт")
+    
+    def before_call(self) -> None:
+        """
+        Проверить, можно ли отправить запрос, и занять пробный слот в half_open
+        
+        Raises:
+            CircuitOpenError: breaker открыт или все пробные запросы уже отправлены
+        """
+        self._refresh()
+        if self.state == self.CLOSED:
+            return
+        
+        if self.state == self.HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return
+        
+        self.rejected.inc()
+        raise CircuitOpenError("Gemini временно недоступен, circuit breaker открыт")
+    
+    def record_success(self) -> None:
+        """Запрос выполнен успешно"""
+        self.failures = 0
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+    
+    def record_failure(self) -> None:
+        """Запрос завершился ошибкой или таймаутом"""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self._opened_at = time.monotonic()
+            self.trips.inc()
+            self._set_state(self.OPEN)
+    
+    def record_cancel(self) -> None:
+        """Запрос отменен до ответа: пробный слот освобождается"""
+        if self.state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+
+class LatencyTracker:
+    """
+    Скользящее окно задержек успешных ответов Gemini
+    Процентиль окна - порог, после которого отправляется hedged запрос
+    """
+    
+    def __init__(self, name: str, percentile: float, window: int = 200, min_samples: int = 20):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        
+        self.threshold_gauge = metrics.gauge(f"{name}_hedge_delay", "Задержка до hedged запроса, секунды")
+    
+    def observe(self, seconds: float) -> None:
+        """Учесть задержку успешного ответа"""
+        self._samples.append(seconds)
+        threshold = self.threshold()
+        if threshold is not None:
+            self.threshold_gauge.set(round(threshold, 3))
+    
+    def threshold(self) -> Optional[float]:
+        """Процентиль задержек окна или None, пока ответов меньше min_samples"""
+        if len(self._samples) < self.min_samples:
+            return None
+        
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)]
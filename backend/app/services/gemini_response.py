@@ -0,0 +1,347 @@
+"""
+Разбор ответов Gemini
+Схема JSON для structured output, извлечение первого полного JSON значения
+из текста с посторонними словами или из потока фрагментов и валидация
+результата анализа через pydantic модель
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator, model_validator
+
+from ..core.emotions import EMOTIONS
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_LABELS = ("positive", "negative", "neutral")
+
+_EMOTION_NAMES = list(EMOTIONS.values())
+
+# Схема результата анализа одной записи для response_schema Gemini
+ANALYSIS_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sentiment_score": {"type": "number"},
+        "sentiment_label": {"type": "string", "format": "enum", "enum": list(SENTIMENT_LABELS)},
+        "emotions": {
+            "type": "object",
+            "properties": {name: {"type": "number"} for name in _EMOTION_NAMES},
+            "required": _EMOTION_NAMES,
+        },
+        "dominant_emotion": {"type": "string"},
+        "keywords": {"type": "array", "items": {"type": "string"}},
+        "themes": {"type": "array", "items": {"type": "string"}},
+        "recommendations": {"type": "string"},
+        "insights": {"type": "string"},
+        "confidence_score": {"type": "number"},
+    },
+    "required": [
+        "sentiment_score", "sentiment_label", "emotions", "dominant_emotion",
+        "keywords", "themes", "recommendations", "insights", "confidence_score",
+    ],
+}
+
+# Схема ответа на пакетный промпт: массив результатов с id записи
+BATCH_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {
+        **ANALYSIS_RESPONSE_SCHEMA,
+        "properties": {"id": {"type": "string"}, **ANALYSIS_RESPONSE_SCHEMA["properties"]},
+        "required": ["id", *ANALYSIS_RESPONSE_SCHEMA["required"]],
+    },
+}
+
+
+class JSONStreamExtractor:
+    """
+    Инкрементальный поиск первого полного JSON значения в тексте
+    
+    Фрагменты подаются через feed по мере поступления. Сканер учитывает
+    строки и экранирование, поэтому скобки внутри текста рекомендаций не
+    сбивают подсчет вложенности. Текст до и после JSON (пояснения модели,
+    обрамление ```json) пропускается
+    
+    Поля объекта верхнего уровня попадают в fields сразу после того, как
+    значение поля получено целиком, не дожидаясь конца всего объекта
+    """
+    
+    def __init__(self, opening: str = "{["):
+        self.opening = opening
+        self.buffer = ""
+        self.result: Any = None
+        self.fields: Dict[str, Any] = {}
+        self._start: Optional[int] = None
+        self._member_start = 0
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+    
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+    
+    def feed(self, chunk: str) -> Optional[Any]:
+        """
+        Добавить фрагмент текста
+        
+        Returns:
+            Первое полное JSON значение, как только оно получено, иначе None
+        """
+        if self.done:
+            return self.result
+        
+        self.buffer += chunk
+        while self._pos < len(self.buffer):
+            char = self.buffer[self._pos]
+            self._pos += 1
+            
+            if self._start is None:
+                if char in self.opening:
+                    self._start = self._pos - 1
+                    self._member_start = self._pos
+                    self._depth = 1
+                continue
+            
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char == "," and self._depth == 1:
+                self._add_member(self._pos - 1)
+                self._member_start = self._pos
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._add_member(self._pos - 1)
+                    candidate = self.buffer[self._start:self._pos]
+                    try:
+                        self.result = json.loads(candidate)
+                        return self.result
+                    except json.JSONDecodeError:
+                        # Не JSON, а скобки в тексте: ищем дальше со следующего символа
+                        self._pos = self._start + 1
+                        self._start = None
+                        self._in_string = False
+                        self._escaped = False
+                        self.fields = {}
+        
+        return None
+    
+    def _add_member(self, end: int) -> None:
+        """Разобрать завершенное поле "ключ": значение объекта верхнего уровня"""
+        if self.buffer[self._start] != "{":
+            return
+        
+        member = self.buffer[self._member_start:end].strip()
+        if not member:
+            return
+        try:
+            self.fields.update(json.loads("{" + member + "}"))
+        except json.JSONDecodeError:
+            pass
+
+
+def extract_json(text: str, opening: str = "{[") -> Any:
+    """
+    Первое полное JSON значение в тексте
+    
+    Raises:
+        ValueError: в тексте нет полного JSON значения
+    """
+    extractor = JSONStreamExtractor(opening)
+    result = extractor.feed(text or "")
+    if result is None:
+        raise ValueError("В ответе нет полного JSON значения")
+    return result
+
+
+class AnalysisResponse(BaseModel):
+    """Результат анализа записи. Отсутствующие поля получают значения по умолчанию"""
+    
+    model_config = ConfigDict(extra="ignore")
+    
+    sentiment_score: float = 0.0
+    sentiment_label: str = "neutral"
+    emotions: Dict[str, float] = {
+        "радость": 0.3,
+        "грусть": 0.2,
+        "тревога": 0.2,
+        "спокойствие": 0.3,
+        "раздражение": 0.1,
+        "воодушевление": 0.2,
+    }
+    dominant_emotion: str = "спокойствие"
+    keywords: List[str] = ["настроение", "день"]
+    themes: List[str] = ["повседневность"]
+    recommendations: str = "Рекомендуется больше времени проводить на свежем воздухе и заниматься физической активностью."
+    insights: str = "Эмоциональное состояние находится в пределах нормы."
+    confidence_score: float = 0.5
+    
+    @field_validator("sentiment_score", "confidence_score", mode="before")
+    @classmethod
+    def _reject_bool(cls, value: Any) -> Any:
+        if isinstance(value, bool):
+            raise ValueError("ожидалось число")
+        return value
+    
+    @field_validator("sentiment_score")
+    @classmethod
+    def _clamp_sentiment(cls, value: float) -> float:
+        return min(max(value, -1.0), 1.0)
+    
+    @field_validator("confidence_score")
+    @classmethod
+    def _clamp_confidence(cls, value: float) -> float:
+        return min(max(value, 0.0), 1.0)
+    
+    @field_validator("emotions", mode="before")
+    @classmethod
+    def _numeric_emotions(cls, value: Any) -> Any:
+        # Нечисловые значения отдельных эмоций отбрасываем, а не весь словарь
+        if not isinstance(value, dict):
+            return value
+        return {
+            name: min(max(float(score), 0.0), 1.0)
+            for name, score in value.items()
+            if isinstance(name, str) and not isinstance(score, bool) and isinstance(score, (int, float))
+        }
+    
+    @field_validator("keywords", "themes", mode="before")
+    @classmethod
+    def _string_list(cls, value: Any) -> Any:
+        if isinstance(value, str):
+            return [item.strip() for item in value.split(",") if item.strip()]
+        if isinstance(value, list):
+            return [str(item) for item in value if item is not None]
+        return value
+    
+    @model_validator(mode="after")
+    def _label_from_score(self) -> "AnalysisResponse":
+        self.sentiment_label = str(self.sentiment_label).lower()
+        if self.sentiment_label not in SENTIMENT_LABELS:
+            if self.sentiment_score > 0.2:
+                self.sentiment_label = "positive"
+            elif self.sentiment_score < -0.2:
+                self.sentiment_label = "negative"
+            else:
+                self.sentiment_label = "neutral"
+        return self
+
+
+class BatchAnalysisItem(AnalysisResponse):
+    """Элемент пакетного ответа: без id, оценки тональности и эмоций элемент испорчен"""
+    
+    id: str
+    sentiment_score: float
+    emotions: Dict[str, float]
+    
+    @field_validator("id", mode="before")
+    @classmethod
+    def _id_to_string(cls, value: Any) -> Any:
+        return str(value) if isinstance(value, (int, str)) else value
+
+
+class ResponseParser:
+    """Разбор и валидация ответов Gemini со счетчиками неудач"""
+    
+    def __init__(self):
+        self.parsed = metrics.counter("gemini_responses_parsed", "Ответов Gemini, успешно разобранных")
+        self.failures = metrics.counter("gemini_parse_failures", "Ответов Gemini, которые не удалось разобрать")
+        self.failure_rate = metrics.gauge("gemini_parse_failure_rate", "Доля неразобранных ответов Gemini")
+    
+    def _record(self, success: bool) -> None:
+        (self.parsed if success else self.failures).inc()
+        total = self.parsed.value + self.failures.value
+        self.failure_rate.set(round(self.failures.value / total, 4))
+    
+    def _validate(self, model, data: Any) -> BaseModel:
+        """
+        Валидация с повторной попыткой без испорченных полей:
+        для них берутся значения по умолчанию, а обязательные поля
+        пакетного элемента все равно дадут ошибку
+        """
+        try:
+            return model.model_validate(data)
+        except ValidationError as e:
+            invalid = {error["loc"][0] for error in e.errors() if error["loc"] and error["type"] != "missing"}
+            if not isinstance(data, dict) or not invalid:
+                raise
+            logger.warning(f"Некорректные поля в ответе Gemini: {', '.join(map(str, sorted(invalid, key=str)))}")
+            return model.model_validate({key: value for key, value in data.items() if key not in invalid})
+    
+    def _log_missing(self, result: BaseModel) -> None:
+        missing = set(AnalysisResponse.model_fields) - result.model_fields_set
+        if missing:
+            logger.warning(f"Отсутствуют поля в ответе Gemini: {', '.join(sorted(missing))}")
+    
+    def parse_analysis(self, response_text: str) -> Dict[str, Any]:
+        """
+        Разобрать ответ на промпт анализа одной записи
+        
+        Raises:
+            ValueError: ответ не содержит объект анализа
+        """
+        try:
+            data = extract_json(response_text, opening="{")
+            result = self._validate(AnalysisResponse, data)
+        except (ValueError, ValidationError) as e:
+            self._record(False)
+            logger.error(f"Ошибка разбора ответа Gemini: {e}")
+            logger.error(f"Ответ: {(response_text or '')[:500]}...")
+            raise ValueError(f"Некорректный ответ Gemini: {e}") from e
+        
+        self._record(True)
+        self._log_missing(result)
+        return result.model_dump()
+    
+    def parse_batch(self, response_text: str, item_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Разобрать ответ на пакетный промпт
+        
+        Элементы разбираются независимо: если элемент испорчен или отсутствует,
+        для его id возвращается None, а остальные результаты используются
+        
+        Returns:
+            {id записи: результат анализа или None}
+        """
+        results: Dict[str, Optional[Dict[str, Any]]] = {item_id: None for item_id in item_ids}
+        try:
+            items = extract_json(response_text)
+        except ValueError as e:
+            self._record(False)
+            logger.error(f"Ошибка разбора пакетного ответа Gemini: {e}")
+            return results
+        
+        # Модель может вернуть объект {id: анализ} вместо массива
+        if isinstance(items, dict):
+            items = [
+                {**item, "id": item_id} if isinstance(item, dict) else item
+                for item_id, item in items.items()
+            ]
+        
+        for item in items:
+            try:
+                parsed = self._validate(BatchAnalysisItem, item)
+            except ValidationError:
+                continue
+            if parsed.id in results and results[parsed.id] is None:
+                results[parsed.id] = parsed.model_dump(exclude={"id"})
+        
+        broken = sum(result is None for result in results.values())
+        self._record(broken == 0)
+        return results
+
+
+# Создаем экземпляр парсера
+response_parser = ResponseParser()
@@ -3,30 +3,141 @@
 Анализ эмоций, тональности и генерация рекомендаций
 """
 
+import asyncio
 import google.generativeai as genai
+import hashlib
 import json
 import time
 import logging
-from typing import Dict, List, Optional, Any
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Any, Set, Tuple
 from datetime import datetime
 
 from ..core.config import settings
+from ..core.deadline import DeadlineExceededError, time_remaining
+from ..core.metrics import metrics
+from .analysis_batcher import AnalysisBatcher
+from .analysis_cache import analysis_cache, make_cache_key
+from .gemini_fake import FakeGeminiModel
+from .local_analyzer import local_analyzer
+from .gemini_limits import (
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+    PROMPT_TOKEN_BUCKETS,
+    QuotaExceededError,
+    TokenBucket,
+    estimate_tokens,
+)
+from .gemini_response import ANALYSIS_RESPONSE_SCHEMA, BATCH_RESPONSE_SCHEMA, JSONStreamExtractor, response_parser
 
 logger = logging.getLogger(__name__)
 
+# Колбэк ответа, пришедшего после дедлайна: результат или None, если модель так и не ответила
+LateResultCallback = Callable[[Optional[Any]], Awaitable[None]]
+
 
 class GeminiService:
     """Сервис для работы с Google Gemini AI"""
     
+    # Версия промпта анализа, входит в ключ кэша. Увеличивать при изменении промпта
+    PROMPT_VERSION = "1"
+    
+    # Ключ fallback анализа, выданного по дедлайну: ответ модели еще придет
+    LATE_RESULT_PENDING = "late_result_pending"
+    
+    # Версия промпта инсайтов, входит в хэш окна записей
+    INSIGHTS_PROMPT_VERSION = "2"
+    
+    # Ответы вместо инсайтов, когда модель недоступна. Не сохраняются
+    INSIGHTS_NO_DATA = "Недостаточно данных для анализа тенденций."
+    INSIGHTS_UNAVAILABLE = "Анализ тенденций временно недоступен."
+    
+    # Формат JSON результата анализа одной записи
+    ANALYSIS_JSON_FORMAT = """{
+    "sentiment_score": число от -1 до 1 (негативное/позитивное),
+    "sentiment_label": "positive" | "negative" | "neutral",
+    "emotions": {
+        "радость": значение от 0 до 1,
+        "грусть": значение от 0 до 1,
+        "тревога": значение от 0 до 1,
+        "спокойствие": значение от 0 до 1,
+        "раздражение": значение от 0 до 1,
+        "воодушевление": значение от 0 до 1
+    },
+    "dominant_emotion": "название доминирующей эмоции",
+    "keywords": ["ключевое_слово1", "ключевое_слово2", "ключевое_слово3"],
+    "themes": ["тема1", "тема2"],
+    "recommendations": "Персональные рекомендации для улучшения настроения (2-3 предложения)",
+    "insights": "Краткий анализ эмоционального состояния (1-2 предложения)",
+    "confidence_score": число от 0 до 1
+}"""
+
     def __init__(self):
         """Инициализация сервиса"""
         self.api_key = settings.GEMINI_API_KEY
         self.model_name = "gemini-1.5-flash"
         self.model = None
+        self.timeout = settings.GEMINI_TIMEOUT
+        # Квоты Gemini на процесс: запросы и токены в минуту
+        self.request_bucket = TokenBucket("gemini_rpm", settings.GEMINI_RPM)
+        self.token_bucket = TokenBucket("gemini_tpm", settings.GEMINI_TPM)
+        self.max_quota_wait = settings.GEMINI_MAX_QUOTA_WAIT
+        self.quota_rejected = metrics.counter("gemini_quota_rejected", "Запросов, не дождавшихся квоты Gemini")
+        self.prompt_tokens = metrics.histogram(
+            "gemini_prompt_tokens", PROMPT_TOKEN_BUCKETS, "Оценка размера промптов Gemini в токенах"
+        )
+        # Лимит одновременных запросов снижается при ошибках и медленных ответах
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            max_limit=settings.GEMINI_MAX_CONCURRENCY,
+            min_limit=settings.GEMINI_MIN_CONCURRENCY,
+            latency_target=settings.GEMINI_LATENCY_TARGET
+        )
+        self.circuit = CircuitBreaker(
+            failure_threshold=settings.GEMINI_CIRCUIT_FAILURE_THRESHOLD,
+            recovery_timeout=settings.GEMINI_CIRCUIT_RECOVERY_TIMEOUT,
+            half_open_calls=settings.GEMINI_CIRCUIT_HALF_OPEN_CALLS
+        )
+        # Hedged запросы: дубль уходит, если ответа нет дольше процентиля задержек
+        self.hedge_enabled = settings.GEMINI_HEDGE_ENABLED
+        self.hedge_max_ratio = settings.GEMINI_HEDGE_MAX_RATIO
+        self.analysis_latency = LatencyTracker(
+            "gemini_analysis", settings.GEMINI_HEDGE_PERCENTILE, min_samples=settings.GEMINI_HEDGE_MIN_SAMPLES
+        )
+        self.insights_latency = LatencyTracker(
+            "gemini_insights", settings.GEMINI_HEDGE_PERCENTILE, min_samples=settings.GEMINI_HEDGE_MIN_SAMPLES
+        )
+        self.hedgeable = metrics.counter("gemini_hedgeable_calls", "Запросов, для которых известен порог hedged дубля")
+        self.hedges = metrics.counter("gemini_hedges", "Отправленных hedged дублей")
+        self.hedge_wins = metrics.counter("gemini_hedge_wins", "Hedged дублей, ответивших раньше основного запроса")
+        # Ответ после дедлайна вызывающего не выбрасывается, а сохраняется в фоне
+        self.deadline_exceeded = metrics.counter("gemini_deadline_exceeded", "Вызовов, получивших fallback по дедлайну")
+        self.late_results = metrics.counter("gemini_late_results", "Ответов модели, полученных после дедлайна")
+        self._late_tasks: Set[asyncio.Task] = set()
+        # Structured output: модель отвечает JSON по схеме, если SDK это поддерживает
+        self.analysis_config = self._json_generation_config(ANALYSIS_RESPONSE_SCHEMA)
+        self.batch_analysis_config = (
+            self._json_generation_config(BATCH_RESPONSE_SCHEMA) if self.analysis_config is not None else None
+        )
+        # Поток без схемы: со схемой модель может переставить поля, а нам важен порядок промпта
+        self.stream_config = self._json_generation_config(None) if self.analysis_config is not None else None
+        self.batcher = None
+        if settings.GEMINI_BATCH_MAX_SIZE > 1:
+            self.batcher = AnalysisBatcher(
+                self,
+                window=settings.GEMINI_BATCH_WINDOW_MS / 1000,
+                max_size=settings.GEMINI_BATCH_MAX_SIZE
+            )
         self._initialize_client()
     
     def _initialize_client(self):
         """Инициализация клиента Gemini AI"""
+        if settings.GEMINI_FAKE_MODEL:
+            self.use_model(FakeGeminiModel.from_settings())
+            logger.warning("⚠️ Вместо Gemini AI используется локальная модель (GEMINI_FAKE_MODEL)")
+            return
+        
         if not self.api_key:
             logger.warning("⚠️ Gemini API ключ не настроен")
             return
@@ -39,48 +150,417 @@ class GeminiService:
             logger.error(f"❌ Ошибка инициализации Gemini AI: {e}")
             self.model = None
     
+    def _json_generation_config(self, schema: Optional[Dict[str, Any]]):
+        """
+        Настройки генерации с JSON ответом по схеме (без схемы, если schema None)
+        None, если structured output выключен или не поддерживается версией SDK
+        (тогда формат задает только промпт, а ответ разбирается терпимым парсером)
+        """
+        if not settings.GEMINI_STRUCTURED_OUTPUT:
+            return None
+        
+        try:
+            if schema is None:
+                return genai.GenerationConfig(response_mime_type="application/json")
+            return genai.GenerationConfig(response_mime_type="application/json", response_schema=schema)
+        except TypeError:
+            logger.warning("⚠️ Версия google-generativeai не поддерживает response_schema, JSON задается промптом")
+            return None
+    
+    def use_model(self, model: Any) -> None:
+        """
+        Подменить клиент Gemini объектом с методом generate_content_async
+        (например, FakeGeminiModel для нагрузочных тестов без квоты)
+        """
+        self.model = model
+        self.api_key = self.api_key or "local"
+    
     def is_available(self) -> bool:
         """Проверка доступности сервиса"""
         return self.model is not None and bool(self.api_key)
     
-    async def analyze_mood_text(self, text: str, mood_score: float) -> Dict[str, Any]:
+    @asynccontextmanager
+    async def _guarded_call(self, prompt: str):
+        """
+        Ограничители вокруг одного запроса к Gemini
+        
+        Запрос ждет квоты RPM/TPM и свободного слота адаптивного лимита
+        одновременных запросов (не больше GEMINI_MAX_CONCURRENCY). Пока circuit
+        breaker открыт, запрос не отправляется вовсе. Результат тела блока
+        (успех, ошибка или отмена) корректирует лимит и состояние breaker
+        
+        Raises:
+            CircuitOpenError: Gemini недавно раз за разом не отвечал
+            QuotaExceededError: квоты RPM/TPM не хватит дольше GEMINI_MAX_QUOTA_WAIT секунд
+        """
+        # Открытый breaker отклоняет запрос до ожидания и расхода квоты
+        self.circuit.check()
+        
+        # Квота исчерпана надолго: быстрее ответить локальным анализом, чем ждать
+        prompt_tokens = estimate_tokens(prompt)
+        self.prompt_tokens.observe(prompt_tokens)
+        quota_wait = max(self.request_bucket.wait_time(), self.token_bucket.wait_time(prompt_tokens))
+        if quota_wait > self.max_quota_wait:
+            self.quota_rejected.inc()
+            raise QuotaExceededError(f"Квота Gemini исчерпана, ожидание {quota_wait:.1f}с")
+        
+        await self.request_bucket.acquire()
+        await self.token_bucket.acquire(prompt_tokens)
+        started_at = await self.concurrency.acquire()
+        
+        success = None
+        try:
+            # Проверяем после ожидания очереди: breaker мог открыться, пока запрос ждал слот
+            self.circuit.before_call()
+            try:
+                yield
+                success = True
+            except Exception:
+                success = False
+                raise
+            finally:
+                if success:
+                    self.circuit.record_success()
+                elif success is None:
+                    self.circuit.record_cancel()
+                else:
+                    self.circuit.record_failure()
+        finally:
+            self.concurrency.release(started_at, success)
+    
+    async def _generate(self, prompt: str, generation_config=None) -> str:
+        """
+        Неблокирующий запрос к Gemini через ограничители _guarded_call
+        
+        Raises:
+            CircuitOpenError, QuotaExceededError: запрос не отправлен
+            asyncio.TimeoutError: если модель не ответила за GEMINI_TIMEOUT секунд
+        """
+        async with self._guarded_call(prompt):
+            if generation_config is not None:
+                request = self.model.generate_content_async(prompt, generation_config=generation_config)
+            else:
+                request = self.model.generate_content_async(prompt)
+            response = await asyncio.wait_for(request, timeout=self.timeout)
+            response_text = response.text
+        
+        self.token_bucket.consume(estimate_tokens(response_text))
+        return response_text
+    
+    async def _generate_stream(self, prompt: str, generation_config=None) -> AsyncIterator[str]:
+        """
+        Потоковый запрос к Gemini: фрагменты текста ответа по мере генерации
+        Весь ответ, как и обычный запрос, ограничен GEMINI_TIMEOUT секундами
+        
+        Raises:
+            CircuitOpenError, QuotaExceededError: запрос не отправлен
+            asyncio.TimeoutError: если модель не закончила ответ вовремя
+        """
+        deadline = time.monotonic() + self.timeout
+        response_tokens = 0
+        async with self._guarded_call(prompt):
+            kwargs = {"generation_config": generation_config} if generation_config is not None else {}
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(prompt, stream=True, **kwargs),
+                timeout=self.timeout
+            )
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(deadline - time.monotonic(), 0))
+                except StopAsyncIteration:
+                    break
+                response_tokens += estimate_tokens(chunk.text)
+                yield chunk.text
+        
+        self.token_bucket.consume(response_tokens)
+    
+    async def _timed_generate(self, prompt: str, generation_config, latency: LatencyTracker) -> str:
+        """_generate с учетом задержки успешного ответа в окне latency"""
+        started_at = time.monotonic()
+        response_text = await self._generate(prompt, generation_config)
+        latency.observe(time.monotonic() - started_at)
+        return response_text
+    
+    def _can_hedge(self, prompt: str) -> bool:
+        """Дубль не ждет квоты или слота и не превышает GEMINI_HEDGE_MAX_RATIO запросов"""
+        remaining = time_remaining()
+        return (
+            self.circuit.state == CircuitBreaker.CLOSED
+            and self.concurrency.has_capacity()
+            and self.request_bucket.wait_time() == 0
+            and self.token_bucket.wait_time(estimate_tokens(prompt)) == 0
+            and self.hedges.value < self.hedge_max_ratio * self.hedgeable.value
+            and (remaining is None or remaining > 0)
+        )
+    
+    async def _generate_hedged(self, prompt: str, generation_config, latency: LatencyTracker) -> str:
+        """
+        Запрос к Gemini с hedged дублем
+        
+        Если основной запрос не ответил за процентиль задержек последних
+        ответов (GEMINI_HEDGE_PERCENTILE), отправляется такой же второй запрос.
+        Берется первый успешный ответ, оставшийся запрос отменяется
+        """
+        hedge_delay = latency.threshold() if self.hedge_enabled else None
+        if hedge_delay is None:
+            return await self._timed_generate(prompt, generation_config, latency)
+        
+        self.hedgeable.inc()
+        primary = asyncio.ensure_future(self._timed_generate(prompt, generation_config, latency))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done and self._can_hedge(prompt):
+                self.hedges.inc()
+                pending.add(asyncio.ensure_future(self._timed_generate(prompt, generation_config, latency)))
+            
+            winner, error = None, None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = winner or task
+                    else:
+                        error = task.exception()
+            
+            if winner is None:
+                raise error
+            if winner is not primary:
+                self.hedge_wins.inc()
+            return winner.result()
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _await_within_deadline(self, call: asyncio.Future) -> Any:
+        """
+        Дождаться результата вызова, но не дольше дедлайна запроса
+        
+        Raises:
+            DeadlineExceededError: дедлайн истек, вызов продолжает выполняться
+        """
+        timeout = time_remaining()
+        if timeout is None:
+            return await call
+        
+        try:
+            done, _ = await asyncio.wait({call}, timeout=timeout)
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        
+        if not done:
+            raise DeadlineExceededError(f"Дедлайн запроса истек через {timeout:.1f}с")
+        return call.result()
+    
+    def _deliver_late(self, call: asyncio.Future, on_late_result: Optional[LateResultCallback]) -> None:
+        """Дождаться вызова после дедлайна в фоне и передать результат в on_late_result"""
+        self.deadline_exceeded.inc()
+        
+        async def finish():
+            try:
+                result = await call
+            except Exception as e:
+                logger.warning(f"⚠️ Gemini AI не ответил и после дедлайна: {e}")
+                result = None
+            else:
+                self.late_results.inc()
+            
+            if on_late_result is not None:
+                try:
+                    await on_late_result(result)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка сохранения позднего ответа Gemini: {e}")
+        
+        task = asyncio.create_task(finish())
+        self._late_tasks.add(task)
+        task.add_done_callback(self._late_tasks.discard)
+    
+    async def _analyze_single(self, text: str, mood_score: float) -> Dict[str, Any]:
+        """Анализ одной записи отдельным запросом к Gemini"""
+        # Создаем промпт для анализа
+        prompt = self._create_analysis_prompt(text, mood_score)
+        
+        # Отправляем запрос к Gemini
+        response_text = await self._generate_hedged(prompt, self.analysis_config, self.analysis_latency)
+        
+        # Парсим ответ
+        return self._parse_analysis_response(response_text)
+    
+    async def analyze_mood_text(
+        self,
+        text: str,
+        mood_score: float,
+        on_late_result: Optional[LateResultCallback] = None
+    ) -> Dict[str, Any]:
         """
         Анализ текста настроения с помощью Gemini AI
         
         Args:
             text: Текст описания настроения от пользователя
             mood_score: Оценка настроения от 1 до 10
-            
+            on_late_result: Если дедлайн запроса истек раньше ответа модели,
+                возвращается fallback анализ, а ответ модели (или None)
+                передается в этот колбэк, когда придет
+        
         Returns:
             Словарь с результатами анализа
         """
         if not self.is_available():
-            logger.warning("Gemini AI недоступен, возвращаю mock данные")
-            return self._get_mock_analysis(text, mood_score)
+            logger.warning("Gemini AI недоступен, использую локальный анализ")
+            return local_analyzer.analyze(text, mood_score)
         
         start_time = time.time()
         
+        # Такой же текст с той же оценкой уже анализировался
+        cache_key = make_cache_key(text, mood_score, self.model_name, self.PROMPT_VERSION)
+        cached_result = await analysis_cache.get(cache_key)
+        if cached_result is not None:
+            cached_result["processing_time"] = time.time() - start_time
+            logger.info("✅ Анализ взят из кэша")
+            return cached_result
+        
+        call = asyncio.ensure_future(self._model_analysis(text, mood_score, cache_key, start_time))
         try:
-            # Создаем промпт для анализа
-            prompt = self._create_analysis_prompt(text, mood_score)
-            
-            # Отправляем запрос к Gemini
-            response = self.model.generate_content(prompt)
-            
-            processing_time = time.time() - start_time
-            
-            # Парсим ответ
-            analysis_result = self._parse_analysis_response(response.text)
-            analysis_result["processing_time"] = processing_time
-            analysis_result["ai_model"] = self.model_name
-            
-            logger.info(f"✅ Анализ выполнен за {processing_time:.2f}с")
+            analysis_result = await self._await_within_deadline(call)
+            logger.info(f"✅ Анализ выполнен за {analysis_result['processing_time']:.2f}с")
             return analysis_result
+        
+        except DeadlineExceededError as e:
+            # Ответ модели попадет в кэш и в on_late_result, когда придет
+            self._deliver_late(call, on_late_result)
+            analysis_result = self._handle_analysis_error(e, text, mood_score, start_time)
+            analysis_result[self.LATE_RESULT_PENDING] = True
+            return analysis_result
+        
+        except Exception as e:
+            return self._handle_analysis_error(e, text, mood_score, start_time)
+    
+    async def _model_analysis(self, text: str, mood_score: float, cache_key: str, start_time: float) -> Dict[str, Any]:
+        """Анализ моделью и сохранение результата в кэш"""
+        # В час пик записи разных пользователей уходят в Gemini одним промптом
+        if self.batcher:
+            analysis_result = await self.batcher.submit(text, mood_score)
+        else:
+            analysis_result = await self._analyze_single(text, mood_score)
+        
+        analysis_result["processing_time"] = time.time() - start_time
+        analysis_result["ai_model"] = self.model_name
+        
+        # Кэшируем только ответы модели, fallback анализ не сохраняем
+        await analysis_cache.set(cache_key, analysis_result)
+        return analysis_result
+    
+    async def stream_analysis(
+        self,
+        text: str,
+        mood_score: float,
+        on_late_result: Optional[LateResultCallback] = None
+    ) -> AsyncIterator[Tuple[Dict[str, Any], bool]]:
+        """
+        Потоковый анализ текста настроения
+        
+        Поля ответа приходят в порядке промпта: сначала тональность
+        и эмоции, потом рекомендации и инсайты. Пакетирование не используется,
+        ответ нужен пользователю сразу. По дедлайну запроса, как и в
+        analyze_mood_text, выдается fallback, а ответ уходит в on_late_result
+        
+        Yields:
+            (поля анализа, полученные к этому моменту, False), последним -
+            (полный результат как у analyze_mood_text, True)
+        """
+        if not self.is_available():
+            logger.warning("Gemini AI недоступен, использую локальный анализ")
+            yield local_analyzer.analyze(text, mood_score), True
+            return
+        
+        start_time = time.time()
+        
+        cache_key = make_cache_key(text, mood_score, self.model_name, self.PROMPT_VERSION)
+        cached_result = await analysis_cache.get(cache_key)
+        if cached_result is not None:
+            cached_result["processing_time"] = time.time() - start_time
+            logger.info("✅ Анализ взят из кэша")
+            yield cached_result, True
+            return
+        
+        updates: asyncio.Queue = asyncio.Queue()
+        call = asyncio.ensure_future(self._model_stream_analysis(text, mood_score, cache_key, start_time, updates))
+        late = False
+        try:
+            while True:
+                next_update = asyncio.ensure_future(updates.get())
+                try:
+                    done, _ = await asyncio.wait(
+                        {call, next_update}, timeout=time_remaining(), return_when=asyncio.FIRST_COMPLETED
+                    )
+                finally:
+                    next_update.cancel()
+                
+                if next_update in done:
+                    yield next_update.result(), False
+                elif call in done:
+                    break
+                else:
+                    raise DeadlineExceededError("Дедлайн запроса истек до конца потокового ответа")
             
+            analysis_result = call.result()
+            logger.info(f"✅ Потоковый анализ выполнен за {analysis_result['processing_time']:.2f}с")
+        
+        except DeadlineExceededError as e:
+            late = True
+            self._deliver_late(call, on_late_result)
+            analysis_result = self._handle_analysis_error(e, text, mood_score, start_time)
+            analysis_result[self.LATE_RESULT_PENDING] = True
+        
         except Exception as e:
-            logger.error(f"❌ Ошибка анализа Gemini AI: {e}")
-            processing_time = time.time() - start_time
-            return self._get_fallback_analysis(text, mood_score, processing_time)
+            analysis_result = self._handle_analysis_error(e, text, mood_score, start_time)
+        
+        finally:
+            # Потребитель закрыл поток раньше времени: запрос больше не нужен
+            if not late and not call.done():
+                call.cancel()
+        
+        yield analysis_result, True
+    
+    async def _model_stream_analysis(
+        self,
+        text: str,
+        mood_score: float,
+        cache_key: str,
+        start_time: float,
+        updates: asyncio.Queue
+    ) -> Dict[str, Any]:
+        """Потоковый анализ моделью: поля ответа по мере поступления идут в updates"""
+        prompt = self._create_analysis_prompt(text, mood_score)
+        extractor = JSONStreamExtractor("{")
+        chunks = []
+        async for chunk in self._generate_stream(prompt, self.stream_config):
+            chunks.append(chunk)
+            known_fields = len(extractor.fields)
+            extractor.feed(chunk)
+            if len(extractor.fields) > known_fields:
+                updates.put_nowait(dict(extractor.fields))
+        
+        analysis_result = self._parse_analysis_response("".join(chunks))
+        analysis_result["processing_time"] = time.time() - start_time
+        analysis_result["ai_model"] = self.model_name
+        
+        await analysis_cache.set(cache_key, analysis_result)
+        return analysis_result
+    
+    def _handle_analysis_error(self, error: Exception, text: str, mood_score: float, start_time: float) -> Dict[str, Any]:
+        """Записать ошибку анализа в лог и вернуть fallback анализ"""
+        if isinstance(error, (CircuitOpenError, QuotaExceededError, DeadlineExceededError)):
+            logger.warning(f"⚠️ {error}, возвращаю локальный анализ")
+        elif isinstance(error, asyncio.TimeoutError):
+            logger.error(f"❌ Gemini AI не ответил за {self.timeout}с")
+        else:
+            logger.error(f"❌ Ошибка анализа Gemini AI: {error}")
+        
+        processing_time = time.time() - start_time
+        return self._get_fallback_analysis(text, mood_score, processing_time)
     
     def _create_analysis_prompt(self, text: str, mood_score: float) -> str:
         """Создание промпта для анализа настроения"""
@@ -92,173 +572,148 @@ class GeminiService:
 Оценка настроения (1-10): {mood_score}
 
 Верни JSON со следующими полями:
-{{
-    "sentiment_score": число от -1 до 1 (негативное/позитивное),
-    "sentiment_label": "positive" | "negative" | "neutral",
-    "emotions": {{
-        "радость": значение от 0 до 1,
-        "грусть": значение от 0 до 1,
-        "тревога": значение от 0 до 1,
-        "спокойствие": значение от 0 до 1,
-        "раздражение": значение от 0 до 1,
-        "воодушевление": значение от 0 до 1
-    }},
-    "dominant_emotion": "название доминирующей эмоции",
-    "keywords": ["ключевое_слово1", "ключевое_слово2", "ключевое_слово3"],
-    "themes": ["тема1", "тема2"],
-    "recommendations": "Персональные рекомендации для улучшения настроения (2-3 предложения)",
-    "insights": "Краткий анализ эмоционального состояния (1-2 предложения)",
-    "confidence_score": число от 0 до 1
-}}
+{self.ANALYSIS_JSON_FORMAT}
 
 Отвечай ТОЛЬКО JSON, без дополнительного текста. Рекомендации и инсайты на русском языке.
 """
-    
+
+    def _create_batch_analysis_prompt(self, items: List[Tuple[str, str, float]]) -> str:
+        """
+        Создание одного промпта для анализа нескольких записей
+        
+        Args:
+            items: Список (id, текст, оценка настроения)
+        """
+        entries = json.dumps(
+            [{"id": item_id, "text": text, "mood_score": mood_score} for item_id, text, mood_score in items],
+            ensure_ascii=False,
+            indent=2
+        )
+        return f"""
+Ты - эксперт психолог, специализирующийся на анализе эмоций и настроения. 
+Проанализируй каждую из следующих записей о настроении пользователей независимо друг от друга
+и верни результат СТРОГО в JSON формате.
+
+Записи (id, текст пользователя, оценка настроения 1-10):
+{entries}
+
+Верни JSON массив, по одному объекту на каждую запись. В каждом объекте поле "id"
+со значением id записи и следующие поля:
+{self.ANALYSIS_JSON_FORMAT}
+
+Отвечай ТОЛЬКО JSON массивом, без дополнительного текста. Рекомендации и инсайты на русском языке.
+"""
+
     def _parse_analysis_response(self, response_text: str) -> Dict[str, Any]:
         """Парсинг ответа от Gemini AI"""
-        try:
-            # Извлекаем JSON из ответа
-            response_text = response_text.strip()
-            
-            # Иногда Gemini обрамляет JSON в ```json блоки
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            
-            response_text = response_text.strip()
-            
-            # Парсим JSON
-            analysis = json.loads(response_text)
-            
-            # Валидируем структуру
-            required_fields = [
-                "sentiment_score", "sentiment_label", "emotions", 
-                "dominant_emotion", "keywords", "themes", 
-                "recommendations", "insights", "confidence_score"
-            ]
-            
-            for field in required_fields:
-                if field not in analysis:
-                    logger.warning(f"Отсутствует поле {field} в ответе Gemini")
-                    analysis[field] = self._get_default_value(field)
-            
-            return analysis
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Ошибка парсинга JSON от Gemini: {e}")
-            logger.error(f"Ответ: {response_text[:500]}...")
-            raise
-        except Exception as e:
-            logger.error(f"Ошибка обработки ответа Gemini: {e}")
-            raise
+        return response_parser.parse_analysis(response_text)
     
-    def _get_default_value(self, field: str) -> Any:
-        """Получить значение по умолчанию для поля"""
-        defaults = {
-            "sentiment_score": 0.0,
-            "sentiment_label": "neutral",
-            "emotions": {
-                "радость": 0.3,
-                "грусть": 0.2,
-                "тревога": 0.2,
-                "спокойствие": 0.3,
-                "раздражение": 0.1,
-                "воодушевление": 0.2
-            },
-            "dominant_emotion": "спокойствие",
-            "keywords": ["настроение", "день"],
-            "themes": ["повседневность"],
-            "recommendations": "Рекомендуется больше времени проводить на свежем воздухе и заниматься физической активностью.",
-            "insights": "Эмоциональное состояние находится в пределах нормы.",
-            "confidence_score": 0.5
-        }
-        return defaults.get(field, None)
-    
-    def _get_mock_analysis(self, text: str, mood_score: float) -> Dict[str, Any]:
-        """Возвращает mock данные когда Gemini недоступен"""
-        # Простой анализ на основе оценки настроения
-        if mood_score >= 7:
-            sentiment_score = 0.7
-            sentiment_label = "positive"
-            dominant_emotion = "радость"
-        elif mood_score >= 4:
-            sentiment_score = 0.0
-            sentiment_label = "neutral"
-            dominant_emotion = "спокойствие"
-        else:
-            sentiment_score = -0.7
-            sentiment_label = "negative"
-            dominant_emotion = "грусть"
-        
-        return {
-            "sentiment_score": sentiment_score,
-            "sentiment_label": sentiment_label,
-            "emotions": {
-                "радость": max(0.1, (mood_score - 5) / 5),
-                "грусть": max(0.1, (5 - mood_score) / 5),
-                "тревога": 0.2,
-                "спокойствие": 0.4,
-                "раздражение": 0.1,
-                "воодушевление": max(0.1, (mood_score - 6) / 4)
-            },
-            "dominant_emotion": dominant_emotion,
-            "keywords": ["настроение", "день", "эмоции"],
-            "themes": ["ежедневная жизнь"],
-            "recommendations": "Попробуйте медитацию или прогулку на свежем воздухе для улучшения настроения.",
-            "insights": f"Текущая оценка настроения {mood_score}/10 говорит о {'хорошем' if mood_score >= 6 else 'среднем' if mood_score >= 4 else 'низком'} эмоциональном состоянии.",
-            "confidence_score": 0.6,
-            "processing_time": 0.1,
-            "ai_model": "mock"
-        }
+    def _parse_batch_analysis_response(self, response_text: str, item_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Парсинг ответа на пакетный промпт: {id записи: результат анализа или None}"""
+        return response_parser.parse_batch(response_text, item_ids)
     
     def _get_fallback_analysis(self, text: str, mood_score: float, processing_time: float) -> Dict[str, Any]:
-        """Fallback анализ при ошибке Gemini"""
-        analysis = self._get_mock_analysis(text, mood_score)
+        """Fallback анализ при ошибке Gemini: локальный словарный анализ текста"""
+        analysis = local_analyzer.analyze(text, mood_score)
         analysis["processing_time"] = processing_time
         analysis["ai_model"] = f"{self.model_name}_fallback"
-        analysis["recommendations"] = "Извините, анализ временно недоступен. Рекомендуем обратиться к специалисту при необходимости."
         return analysis
     
-    async def generate_daily_insights(self, mood_entries: List[Dict[str, Any]]) -> str:
+    def limits_stats(self) -> Dict[str, Any]:
+        """Состояние ограничителей запросов к Gemini для /health"""
+        return {
+            "circuit_state": self.circuit.state,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+        }
+    
+    def is_fallback(self, analysis: Dict[str, Any]) -> bool:
+        """Анализ получен без ответа модели (ошибка или таймаут Gemini)"""
+        return analysis.get("ai_model") == f"{self.model_name}_fallback"
+    
+    def is_late_result_pending(self, analysis: Dict[str, Any]) -> bool:
+        """Fallback выдан по дедлайну, ответ модели придет в on_late_result"""
+        return bool(analysis.get(self.LATE_RESULT_PENDING))
+    
+    async def generate_daily_insights(
+        self,
+        mood_entries: List[Dict[str, Any]],
+        history_summary: str = "",
+        on_late_result: Optional[LateResultCallback] = None
+    ) -> str:
         """
         Генерация ежедневных инсайтов на основе нескольких записей
         
         Args:
-            mood_entries: Список записей настроения за период
-            
+            mood_entries: Записи для промпта в хронологическом порядке
+                (отбирает и сокращает InsightsPromptBuilder)
+            history_summary: Сжатая история настроения до этих записей
+            on_late_result: Получит текст инсайтов (или None), если ответ
+                модели придет после дедлайна запроса
+        
         Returns:
             Текст с инсайтами и рекомендациями
         """
-        if not self.is_available() or not mood_entries:
-            return "Недостаточно данных для анализа тенденций."
+        if not self.is_available() or not (mood_entries or history_summary):
+            return self.INSIGHTS_NO_DATA
         
+        # Создаем промпт для анализа тенденций
+        prompt = self._create_insights_prompt(mood_entries, history_summary)
+        call = asyncio.ensure_future(self._generate_insights(prompt))
         try:
-            # Создаем промпт для анализа тенденций
-            prompt = self._create_insights_prompt(mood_entries)
-            
-            response = self.model.generate_content(prompt)
-            
-            return response.text.strip()
-            
+            return await self._await_within_deadline(call)
+        
+        except DeadlineExceededError as e:
+            logger.warning(f"{e}, инсайты будут сохранены, когда ответит модель")
+            self._deliver_late(call, on_late_result)
+            return self.INSIGHTS_UNAVAILABLE
+        
+        except (CircuitOpenError, QuotaExceededError) as e:
+            logger.warning(f"{e}, инсайты не сгенерированы")
+            return self.INSIGHTS_UNAVAILABLE
+        
+        except asyncio.TimeoutError:
+            logger.error(f"Gemini AI не ответил на запрос инсайтов за {self.timeout}с")
+            return self.INSIGHTS_UNAVAILABLE
+        
         except Exception as e:
             logger.error(f"Ошибка генерации инсайтов: {e}")
-            return "Анализ тенденций временно недоступен."
+            return self.INSIGHTS_UNAVAILABLE
     
-    def _create_insights_prompt(self, mood_entries: List[Dict[str, Any]]) -> str:
+    async def _generate_insights(self, prompt: str) -> str:
+        """Текст инсайтов от модели"""
+        response_text = await self._generate_hedged(prompt, None, self.insights_latency)
+        return response_text.strip()
+    
+    def insights_window_hash(self, mood_entries: List[Dict[str, Any]], history_summary: str = "") -> str:
+        """
+        Хэш окна записей для инсайтов
+        Считается по готовому промпту, поэтому меняется ровно тогда, когда
+        модель получила бы другой запрос
+        """
+        payload = "\n".join([self.model_name, self.INSIGHTS_PROMPT_VERSION, self._create_insights_prompt(mood_entries, history_summary)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def is_insights_fallback(self, insights_text: str) -> bool:
+        """Вместо инсайтов получен ответ-заглушка"""
+        return not insights_text or insights_text in (self.INSIGHTS_NO_DATA, self.INSIGHTS_UNAVAILABLE)
+    
+    def _create_insights_prompt(self, mood_entries: List[Dict[str, Any]], history_summary: str = "") -> str:
         """Создание промпта для анализа тенденций"""
         entries_text = ""
-        for entry in mood_entries[-7:]:  # Последние 7 записей
-            entries_text += f"Дата: {entry.get('date', 'неизвестно')}, Оценка: {entry.get('mood_score', 0)}/10, Текст: {entry.get('mood_text', '')[:100]}...\n"
+        for entry in mood_entries:
+            emotion = f", Эмоция: {entry['dominant_emotion']}" if entry.get("dominant_emotion") else ""
+            entries_text += f"{entry.get('date', 'неизвестно')}, Оценка: {entry.get('mood_score', 0)}/10{emotion}: {entry.get('mood_text', '')}\n"
+        
+        history_text = f"\nИстория настроения до этих записей (по месяцам):\n{history_summary}\n" if history_summary else ""
         
         return f"""
 Ты - опытный психолог. Проанализируй записи настроения пользователя за последнее время и дай краткие инсайты.
-
+{history_text}
 Записи пользователя:
 {entries_text}
-
 Напиши краткий анализ (3-4 предложения) включающий:
-1. Общий тренд настроения
+1. Общий тренд настроения (с учетом истории, если она есть)
 2. Выявленные паттерны
 3. Одну конкретную рекомендацию
 
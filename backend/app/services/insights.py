@@ -0,0 +1,241 @@
+"""
+AI инсайты по записям пользователя
+Инсайты хранятся в таблице user_insights с хэшем окна записей и отдаются
+оттуда, пока новая запись не изменит окно. Ночной планировщик заранее
+генерирует инсайты активным пользователям с ограниченной частотой запросов
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.metrics import metrics
+from ..crud.mood_entry import async_mood_entry_crud
+from ..crud.user_history_summary import history_horizon, user_history_summary_crud
+from ..crud.user_insights import user_insights_crud
+from .gemini_limits import PROMPT_TOKEN_BUCKETS, TokenBucket
+from .gemini_service import gemini_service
+from .insights_prompt import InsightsPromptBuilder
+
+logger = logging.getLogger(__name__)
+
+
+class InsightsService:
+    """Инсайты пользователя с хранением по хэшу окна записей"""
+    
+    def __init__(self):
+        self.detail_days = settings.INSIGHTS_DETAIL_DAYS
+        self.builder = InsightsPromptBuilder(
+            token_budget=settings.INSIGHTS_PROMPT_TOKEN_BUDGET,
+            entry_max_chars=settings.INSIGHTS_ENTRY_MAX_CHARS,
+            min_recent=settings.INSIGHTS_MIN_RECENT_ENTRIES,
+            history_months=settings.INSIGHTS_HISTORY_MONTHS
+        )
+        self.hits = metrics.counter("insights_cache_hits", "Инсайтов, отданных из таблицы user_insights")
+        self.misses = metrics.counter("insights_cache_misses", "Инсайтов, сгенерированных при запросе")
+        self.prompt_tokens = metrics.histogram(
+            "insights_prompt_tokens", PROMPT_TOKEN_BUCKETS, "Оценка размера промптов инсайтов в токенах"
+        )
+        self.generation_seconds = metrics.histogram(
+            "insights_generation_seconds", (0.5, 1, 2, 5, 10, 30), "Время генерации инсайтов"
+        )
+    
+    async def build_prompt(self, db: AsyncSession, user_id: int, days: int) -> Dict[str, Any]:
+        """
+        Данные промпта инсайтов за период
+        
+        Последние INSIGHTS_DETAIL_DAYS дней идут подробными записями, более
+        ранняя часть периода - помесячными итогами из сжатой истории
+        """
+        if days <= self.detail_days:
+            entries = await async_mood_entry_crud.get_recent_entries(db, user_id, days)
+            months = {}
+        else:
+            horizon = history_horizon()
+            summary = await db.run_sync(user_history_summary_crud.roll_forward, user_id, horizon)
+            months = summary.months
+            entries = await async_mood_entry_crud.get_user_entries(
+                db, user_id, start_date=datetime.combine(horizon + timedelta(days=1), datetime.min.time())
+            )
+        
+        period_start = (datetime.utcnow() - timedelta(days=days)).date()
+        return self.builder.build(entries, months, period_start)
+    
+    async def get_insights(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        days: int,
+        generate: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Инсайты пользователя за период
+        
+        Args:
+            db: асинхронная сессия. Перед запросом к модели транзакция
+                фиксируется, чтобы не держать соединение
+            generate: генерировать ли инсайты, если сохраненные устарели
+        
+        Returns:
+            {"ai_insights", "entries_analyzed", "cached", "generated_at"}
+            или None, если записей за период нет (или устаревшие инсайты
+            не генерировались)
+        """
+        prompt = await self.build_prompt(db, user_id, days)
+        entries_data, history_summary = prompt["entries_data"], prompt["history_summary"]
+        if not entries_data and not history_summary:
+            return None
+        
+        window_hash = gemini_service.insights_window_hash(entries_data, history_summary)
+        
+        stored = await db.run_sync(user_insights_crud.get, user_id, days)
+        if stored is not None and stored.window_hash == window_hash:
+            self.hits.inc()
+            return {
+                "ai_insights": stored.insights_text,
+                "entries_analyzed": stored.entries_analyzed,
+                "cached": True,
+                "generated_at": stored.generated_at.isoformat(),
+            }
+        
+        if not generate:
+            return None
+        
+        def save(session, text: str) -> None:
+            user_insights_crud.save(
+                session, user_id, days, window_hash, text, len(entries_data), gemini_service.model_name
+            )
+        
+        async def save_late(text: Optional[str]) -> None:
+            # Ответ после дедлайна запроса: следующий запрос получит его из таблицы
+            if text and not gemini_service.is_insights_fallback(text):
+                async with AsyncSessionLocal() as late_db:
+                    await late_db.run_sync(save, text)
+        
+        # Соединение не держим, пока ждем ответ Gemini
+        await db.commit()
+        self.misses.inc()
+        self.prompt_tokens.observe(prompt["tokens"])
+        started_at = time.perf_counter()
+        insights_text = await gemini_service.generate_daily_insights(entries_data, history_summary, save_late)
+        self.generation_seconds.observe(time.perf_counter() - started_at)
+        generated_at = datetime.utcnow()
+        
+        # Заглушку не сохраняем: следующий запрос снова попробует модель
+        if not gemini_service.is_insights_fallback(insights_text):
+            await db.run_sync(save, insights_text)
+        
+        return {
+            "ai_insights": insights_text,
+            "entries_analyzed": len(entries_data),
+            "cached": False,
+            "generated_at": generated_at.isoformat(),
+        }
+
+
+class InsightsScheduler:
+    """
+    Ночная генерация инсайтов активным пользователям
+    
+    Раз в сутки в INSIGHTS_PRECOMPUTE_HOUR (UTC) обходит пользователей с
+    записями за последние INSIGHTS_ACTIVE_DAYS дней и обновляет инсайты,
+    у которых изменилось окно записей. Запросы к модели идут не чаще
+    INSIGHTS_PRECOMPUTE_RPM в минуту, чтобы не выбирать квоту Gemini
+    """
+    
+    def __init__(self, service: InsightsService):
+        self.service = service
+        self.hour = settings.INSIGHTS_PRECOMPUTE_HOUR
+        self.active_days = settings.INSIGHTS_ACTIVE_DAYS
+        self.period_days = settings.INSIGHTS_PRECOMPUTE_DAYS
+        self.rate = TokenBucket("insights_precompute", settings.INSIGHTS_PRECOMPUTE_RPM, capacity=1)
+        self.precomputed = metrics.counter("insights_precomputed", "Инсайтов, сгенерированных ночным планировщиком")
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Запустить планировщик в текущем event loop"""
+        if self._task is not None:
+            return
+        
+        self._task = asyncio.create_task(self._run_loop())
+        logger.info(f"✅ Ночная генерация инсайтов запланирована на {self.hour:02d}:00 UTC")
+    
+    async def stop(self) -> None:
+        """Остановить планировщик, прервав текущий обход"""
+        if self._task is None:
+            return
+        
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+    
+    def seconds_until_run(self, now: Optional[datetime] = None) -> float:
+        """Секунды до ближайшего запуска"""
+        now = now or datetime.utcnow()
+        next_run = now.replace(hour=self.hour, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+    
+    async def _run_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.seconds_until_run())
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Ошибка ночной генерации инсайтов: {e}")
+    
+    async def run_once(self) -> int:
+        """
+        Обойти активных пользователей и обновить устаревшие инсайты
+        
+        Returns:
+            Количество сгенерированных инсайтов
+        """
+        if not gemini_service.is_available():
+            logger.info("Gemini AI не настроен, ночная генерация инсайтов пропущена")
+            return 0
+        
+        since = datetime.utcnow() - timedelta(days=self.active_days)
+        async with AsyncSessionLocal() as db:
+            user_ids = await async_mood_entry_crud.get_active_user_ids(db, since)
+        
+        logger.info(f"🌙 Генерация инсайтов для активных пользователей: {len(user_ids)}")
+        generated = 0
+        for user_id in user_ids:
+            try:
+                if await self._precompute_user(user_id):
+                    generated += 1
+            except Exception as e:
+                logger.error(f"❌ Инсайты пользователя {user_id} не сгенерированы: {e}")
+        
+        logger.info(f"✅ Ночная генерация инсайтов завершена: обновлено {generated} из {len(user_ids)}")
+        return generated
+    
+    async def _precompute_user(self, user_id: int) -> bool:
+        """Обновить инсайты пользователя, если окно записей изменилось"""
+        async with AsyncSessionLocal() as db:
+            # Сначала проверяем без генерации: неизмененные окна не тратят квоту
+            if await self.service.get_insights(db, user_id, self.period_days, generate=False) is not None:
+                return False
+            
+            await db.commit()
+            await self.rate.acquire()
+            result = await self.service.get_insights(db, user_id, self.period_days)
+        
+        if result is None or gemini_service.is_insights_fallback(result["ai_insights"]):
+            return False
+        
+        self.precomputed.inc()
+        return True
+
+
+# Создаем экземпляры сервиса и планировщика
+insights_service = InsightsService()
+insights_scheduler = InsightsScheduler(insights_service)
@@ -0,0 +1,141 @@
+"""
+Промпт инсайтов в пределах бюджета токенов
+Из записей окна выбираются самые информативные, тексты сокращаются,
+а более старая история попадает в промпт помесячными итогами
+"""
+
+import re
+from datetime import date
+from typing import Any, Dict, List
+
+from ..core.emotions import canonical_emotion_names
+from .gemini_limits import estimate_tokens
+from .gemini_service import gemini_service
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class InsightsPromptBuilder:
+    """
+    Сборка данных промпта инсайтов под бюджет токенов
+    
+    Несколько самых свежих записей входят всегда. Остальные ранжируются по
+    информативности: свежесть, отклонение оценки от средней за окно,
+    подробность текста и сила эмоции в анализе. Помесячные итоги истории
+    занимают не больше трети бюджета. Записи в промпте идут по возрастанию
+    даты, чтобы модель видела тренд
+    """
+    
+    # Часть бюджета для помесячных итогов истории
+    HISTORY_SHARE = 1 / 3
+    
+    def __init__(self, token_budget: int, entry_max_chars: int, min_recent: int, history_months: int):
+        self.token_budget = token_budget
+        self.entry_max_chars = entry_max_chars
+        self.min_recent = min_recent
+        self.history_months = history_months
+    
+    def condense_text(self, text: str) -> str:
+        """Текст записи без лишних пробелов, обрезанный по границе слова"""
+        text = _WHITESPACE_RE.sub(" ", text or "").strip()
+        if len(text) <= self.entry_max_chars:
+            return text
+        
+        cut = text[:self.entry_max_chars].rsplit(" ", 1)[0]
+        return cut.rstrip(",.;:!?- ") + "…"
+    
+    def entry_item(self, entry: Any) -> Dict[str, Any]:
+        """Данные одной записи для промпта"""
+        analysis = entry.ai_analysis
+        return {
+            "date": entry.entry_date.strftime("%Y-%m-%d"),
+            "mood_score": entry.mood_score,
+            "mood_text": self.condense_text(entry.mood_text),
+            "dominant_emotion": analysis.dominant_emotion if analysis else None,
+        }
+    
+    def _informativeness(self, entry: Any, rank: int, mean_score: float) -> float:
+        """Оценка информативности записи: чем больше, тем важнее для инсайтов"""
+        recency = 1 / (1 + rank / 7)
+        deviation = abs(entry.mood_score - mean_score) / 9
+        detail = min(len(entry.mood_text or ""), self.entry_max_chars) / self.entry_max_chars
+        emotions = canonical_emotion_names(entry.ai_analysis.emotions) if entry.ai_analysis else {}
+        intensity = max(emotions.values(), default=0.0)
+        return recency + deviation + 0.5 * detail + 0.5 * intensity
+    
+    def render_history(self, months: Dict[str, Dict[str, Any]], since: date, token_budget: int) -> str:
+        """
+        Помесячные итоги начиная с месяца since, от новых к старым, пока
+        хватает бюджета. Строки возвращаются по возрастанию месяца
+        """
+        since_key = since.strftime("%Y-%m")
+        lines = []
+        used = 0
+        for key in sorted(months, reverse=True)[:self.history_months]:
+            month = months[key]
+            if key < since_key or not month["entries_count"]:
+                continue
+            
+            average = month["mood_sum"] / month["entries_count"]
+            averages = {
+                emotion: total / month["emotion_counts"][emotion]
+                for emotion, total in month["emotion_sums"].items()
+                if month["emotion_counts"].get(emotion)
+            }
+            top = sorted(averages, key=averages.get, reverse=True)[:2]
+            line = f"{key}: записей {month['entries_count']}, среднее {average:.1f}/10"
+            if top:
+                line += f", чаще всего {', '.join(top)}"
+            
+            cost = estimate_tokens(line)
+            if used + cost > token_budget:
+                break
+            lines.append(line)
+            used += cost
+        
+        return "\n".join(reversed(lines))
+    
+    def build(self, entries: List[Any], months: Dict[str, Dict[str, Any]], history_since: date) -> Dict[str, Any]:
+        """
+        Собрать данные промпта
+        
+        Args:
+            entries: записи окна от новых к старым (с загруженным ai_analysis)
+            months: помесячные итоги истории до окна
+            history_since: начало периода, итоги более ранних месяцев не нужны
+        
+        Returns:
+            {"entries_data": записи от старых к новым, "history_summary": итоги
+            по месяцам, "tokens": оценка размера промпта}
+        """
+        base_tokens = estimate_tokens(gemini_service._create_insights_prompt([]))
+        history_summary = self.render_history(
+            months, history_since, int((self.token_budget - base_tokens) * self.HISTORY_SHARE)
+        )
+        
+        items = [self.entry_item(entry) for entry in entries]
+        selected = set(range(min(self.min_recent, len(items))))
+        
+        if entries:
+            mean_score = sum(entry.mood_score for entry in entries) / len(entries)
+            ranked = sorted(
+                range(len(entries)),
+                key=lambda index: self._informativeness(entries[index], index, mean_score),
+                reverse=True
+            )
+            used = estimate_tokens(gemini_service._create_insights_prompt(
+                [items[index] for index in sorted(selected)], history_summary
+            ))
+            for index in ranked:
+                if index in selected:
+                    continue
+                cost = estimate_tokens(gemini_service._create_insights_prompt([items[index]])) - base_tokens
+                if used + cost > self.token_budget:
+                    continue
+                selected.add(index)
+                used += cost
+        
+        # От старых к новым
+        entries_data = [items[index] for index in sorted(selected, reverse=True)]
+        tokens = estimate_tokens(gemini_service._create_insights_prompt(entries_data, history_summary))
+        return {"entries_data": entries_data, "history_summary": history_summary, "tokens": tokens}
@@ -0,0 +1,396 @@
+"""
+Локальный анализ настроения без обращения к сети
+Словарь тональности и эмоций русского языка со стеммером Snowball.
+Дает мгновенный предварительный анализ в боте и fallback, когда Gemini
+недоступен или исчерпана квота. Формат результата как у Gemini
+"""
+
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.emotions import EMOTIONS
+
+
+class RussianStemmer:
+    """
+    Стеммер Snowball для русского языка
+    https://snowballstem.org/algorithms/russian/stemmer.html
+    """
+    
+    VOWELS = "аеиоуыэюя"
+    
+    PERFECTIVE_GERUND = re.compile(r"(?:(?<=[ая])(?:вшись|вши|в)|ившись|ывшись|ивши|ывши|ив|ыв)$")
+    REFLEXIVE = re.compile(r"(?:ся|сь)$")
+    ADJECTIVAL = re.compile(
+        r"(?:(?<=[ая])(?:ем|нн|вш|ющ|щ)|ивш|ывш|ующ)?"
+        r"(?:ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$"
+    )
+    VERB = re.compile(
+        r"(?:(?<=[ая])(?:ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)"
+        r"|ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)$"
+    )
+    NOUN = re.compile(
+        r"(?:иями|ями|ами|иях|иям|ией|ием|ев|ов|ие|ье|еи|ии|ей|ой|ий|ям|ем|ам|ом|ах|ях|ию|ью|ия|ья"
+        r"|а|е|и|й|о|у|ы|ь|ю|я)$"
+    )
+    DERIVATIONAL = re.compile(r"ост(?:ь)?$")
+    SUPERLATIVE = re.compile(r"(?:ейше|ейш)$")
+    
+    def _regions(self, word: str) -> Tuple[int, int]:
+        """Начало областей RV и R2"""
+        rv = len(word)
+        for i, char in enumerate(word):
+            if char in self.VOWELS:
+                rv = i + 1
+                break
+        
+        r1 = r2 = len(word)
+        for i in range(1, len(word)):
+            if word[i - 1] in self.VOWELS and word[i] not in self.VOWELS:
+                r1 = i + 1
+                break
+        for i in range(r1 + 1, len(word)):
+            if word[i - 1] in self.VOWELS and word[i] not in self.VOWELS:
+                r2 = i + 1
+                break
+        return rv, r2
+    
+    def _strip(self, pattern, text: str) -> Optional[str]:
+        match = pattern.search(text)
+        return text[:match.start()] if match else None
+    
+    def stem(self, word: str) -> str:
+        """Основа слова в нижнем регистре"""
+        word = word.lower().replace("ё", "е")
+        rv_start, r2_start = self._regions(word)
+        prefix, rv = word[:rv_start], word[rv_start:]
+        
+        # Шаг 1: деепричастие, иначе возвратная частица и прилагательное/глагол/существительное
+        stripped = self._strip(self.PERFECTIVE_GERUND, rv)
+        if stripped is not None:
+            rv = stripped
+        else:
+            stripped = self._strip(self.REFLEXIVE, rv)
+            if stripped is not None:
+                rv = stripped
+            for pattern in (self.ADJECTIVAL, self.VERB, self.NOUN):
+                stripped = self._strip(pattern, rv)
+                if stripped is not None:
+                    rv = stripped
+                    break
+        
+        # Шаг 2
+        if rv.endswith("и"):
+            rv = rv[:-1]
+        
+        # Шаг 3: словообразовательный суффикс в R2
+        match = self.DERIVATIONAL.search(rv)
+        if match and rv_start + match.start() >= r2_start:
+            rv = rv[:match.start()]
+        
+        # Шаг 4
+        stripped = self._strip(self.SUPERLATIVE, rv)
+        if stripped is not None:
+            rv = stripped
+        if rv.endswith("нн"):
+            rv = rv[:-1]
+        elif rv.endswith("ь"):
+            rv = rv[:-1]
+        
+        return prefix + rv
+
+
+# Полярность эмоций для оценки тональности
+EMOTION_POLARITY = {
+    "радость": 1.0,
+    "воодушевление": 1.0,
+    "спокойствие": 0.5,
+    "грусть": -1.0,
+    "тревога": -0.8,
+    "раздражение": -0.9,
+}
+
+# Слова эмоций канонического словаря (core/emotions.py)
+EMOTION_WORDS = {
+    "радость": [
+        "радость", "радостный", "рад", "радоваться", "счастье", "счастливый", "весело", "веселый",
+        "веселиться", "улыбка", "улыбаться", "смеяться", "смех", "хорошо", "хороший", "отлично",
+        "отличный", "прекрасно", "прекрасный", "замечательно", "замечательный", "классно", "здорово",
+        "приятно", "приятный", "кайф", "любить", "люблю", "наслаждаться", "удовольствие", "повезло",
+        "благодарность", "благодарен", "доволен", "довольный", "праздник", "подарок",
+    ],
+    "грусть": [
+        "грусть", "грустно", "грустный", "печаль", "печально", "тоска", "тоскливо", "скучать",
+        "плохо", "плохой", "плакать", "слезы", "одиноко", "одиночество", "одинокий", "уныние",
+        "депрессия", "тяжело", "тяжелый", "разочарование", "разочарован", "жаль", "потеря",
+        "пусто", "пустота", "апатия", "несчастный", "ужасно", "ужасный", "отвратительно",
+    ],
+    "тревога": [
+        "тревога", "тревожно", "тревожный", "беспокойство", "беспокоиться", "волноваться",
+        "волнение", "страх", "страшно", "бояться", "боюсь", "паника", "стресс", "нервы",
+        "нервничать", "переживать", "переживания", "дедлайн", "неуверенность", "опасение",
+        "напряжение", "напряженный", "неопределенность", "бессонница",
+    ],
+    "спокойствие": [
+        "спокойствие", "спокойно", "спокойный", "тихо", "тихий", "уютно", "уют", "расслабиться",
+        "расслабленный", "отдых", "отдыхать", "отдохнуть", "выспаться", "гармония", "умиротворение",
+        "баланс", "медитация", "прогулка", "гулять", "размеренно", "стабильно", "нормально",
+    ],
+    "раздражение": [
+        "раздражение", "раздражать", "бесить", "бесит", "злиться", "злой", "злость", "гнев",
+        "достать", "надоело", "обидно", "обида", "ссора", "поругаться", "ругаться", "конфликт",
+        "ненавидеть", "возмущение", "несправедливо", "раздраженный", "агрессия", "кричать",
+    ],
+    "воодушевление": [
+        "воодушевление", "вдохновение", "вдохновлять", "энергия", "энергичный", "мотивация",
+        "мотивированный", "успех", "успешно", "получилось", "достижение", "победа", "гордость",
+        "гордиться", "восторг", "восхитительно", "интересно", "интересный", "цель", "мечта",
+        "планы", "продуктивно", "продуктивный", "азарт", "сила",
+    ],
+}
+
+# Слова только с тональностью, без явной эмоции
+SENTIMENT_WORDS = {
+    1.0: ["удачно", "удачный", "лучше", "лучший", "супер", "круто", "легко", "тепло", "вкусно"],
+    -1.0: ["устал", "усталость", "уставший", "болеть", "болезнь", "больно", "сложно", "трудно", "хуже", "провал"],
+}
+
+NEGATIONS = {"не", "нет", "ни", "без", "никак", "нисколько"}
+INTENSIFIERS = {"очень", "сильно", "совсем", "крайне", "невероятно", "слишком", "безумно", "жутко", "так", "весьма"}
+
+# Роли служебных слов в оценке (метки вместо попадания в словарь)
+NEGATION = object()
+INTENSIFIER = object()
+
+# Темы записи по ключевым словам
+THEME_WORDS = {
+    "работа": ["работа", "работать", "офис", "начальник", "коллега", "проект", "совещание", "зарплата", "клиент"],
+    "учеба": ["учеба", "учиться", "экзамен", "университет", "школа", "лекция", "сессия", "курсы", "домашка"],
+    "семья": ["семья", "мама", "папа", "родители", "ребенок", "дети", "сын", "дочь", "брат", "сестра", "бабушка"],
+    "отношения": ["друг", "подруга", "друзья", "парень", "девушка", "муж", "жена", "любовь", "свидание", "ссора"],
+    "здоровье": ["здоровье", "болеть", "болезнь", "врач", "больница", "температура", "голова", "простуда"],
+    "сон": ["сон", "спать", "выспаться", "бессонница", "проснуться", "недосып"],
+    "спорт": ["спорт", "тренировка", "зал", "бег", "пробежка", "йога", "футбол", "бассейн"],
+    "отдых": ["отдых", "отпуск", "выходные", "прогулка", "парк", "кино", "путешествие", "море", "концерт"],
+    "погода": ["погода", "дождь", "солнце", "снег", "холодно", "жара"],
+}
+
+# Служебные слова, которые не бывают ключевыми
+STOPWORDS = {
+    "был", "была", "было", "были", "быть", "есть", "это", "этот", "эта", "эти", "того", "тоже", "также",
+    "когда", "потом", "после", "перед", "через", "очень", "сегодня", "вчера", "завтра", "день", "меня",
+    "мне", "себя", "свой", "своя", "свои", "весь", "вся", "все", "всех", "всем", "который", "которая",
+    "чтобы", "только", "ещё", "еще", "уже", "просто", "сейчас", "какой", "какая", "почему", "потому",
+    "вообще", "немного", "много", "снова", "опять", "где", "там", "тут", "здесь", "даже", "если", "или",
+    "надо", "нужно", "можно", "могу", "может", "будет", "буду", "были", "стал", "стало", "чем", "как", "так", "что",
+}
+
+RECOMMENDATIONS = {
+    "радость": "Отметьте, что сегодня принесло радость, и постарайтесь повторить это в ближайшие дни.",
+    "грусть": "Позвольте себе отдых и поговорите с близким человеком. Короткая прогулка тоже может помочь.",
+    "тревога": "Попробуйте дыхательное упражнение 4-7-8 и запишите, что именно вызывает беспокойство.",
+    "спокойствие": "Сохраните этот баланс: регулярный сон и прогулки помогают удерживать спокойствие.",
+    "раздражение": "Сделайте паузу перед ответом и дайте себе физическую нагрузку, чтобы снять напряжение.",
+    "воодушевление": "Используйте прилив энергии для важной задачи, но не забудьте про отдых.",
+}
+
+SENTIMENT_LABELS_RU = {"positive": "позитивная", "negative": "негативная", "neutral": "нейтральная"}
+
+_WORD_RE = re.compile(r"[а-яё]+(?:-[а-яё]+)?")
+
+
+class LocalMoodAnalyzer:
+    """
+    Словарный анализатор тональности и эмоций
+    
+    Попадания в словарь с учетом отрицаний (не, нет, без) и усилителей
+    (очень, сильно) смешиваются с оценкой настроения пользователя: чем
+    больше попаданий, тем больше вес текста. Пакетный анализ стеммит и
+    ищет в словаре каждое уникальное слово пакета один раз, а оценка записи
+    проходит по уже найденным ролям слов
+    """
+    
+    MODEL_NAME = "local-lexicon"
+    
+    # Размер кэша основ слов между вызовами
+    STEM_CACHE_SIZE = 50000
+    
+    def __init__(self):
+        self.stemmer = RussianStemmer()
+        self._stem_cache: Dict[str, str] = {}
+        self.emotion_names = list(EMOTIONS.values())
+        self.emotion_index = {name: index for index, name in enumerate(self.emotion_names)}
+        
+        # Основа слова -> (полярность, индекс эмоции или None)
+        self.lexicon: Dict[str, Tuple[float, Optional[int]]] = {}
+        for emotion, words in EMOTION_WORDS.items():
+            for word in words:
+                self.lexicon[self.stem(word)] = (EMOTION_POLARITY[emotion], self.emotion_index[emotion])
+        for polarity, words in SENTIMENT_WORDS.items():
+            for word in words:
+                self.lexicon.setdefault(self.stem(word), (polarity, None))
+        
+        self.themes: Dict[str, str] = {}
+        for theme, words in THEME_WORDS.items():
+            for word in words:
+                self.themes.setdefault(self.stem(word), theme)
+    
+    def stem(self, word: str) -> str:
+        """Основа слова с кэшированием"""
+        stem = self._stem_cache.get(word)
+        if stem is None:
+            if len(self._stem_cache) >= self.STEM_CACHE_SIZE:
+                self._stem_cache.clear()
+            stem = self._stem_cache[word] = self.stemmer.stem(word)
+        return stem
+    
+    def tokenize(self, text: str) -> List[str]:
+        """Слова текста в нижнем регистре"""
+        return _WORD_RE.findall((text or "").lower().replace("ё", "е"))
+    
+    def analyze(self, text: str, mood_score: float) -> Dict[str, Any]:
+        """Анализ одной записи"""
+        return self.analyze_batch([(text, mood_score)])[0]
+    
+    def analyze_batch(self, items: List[Tuple[str, float]]) -> List[Dict[str, Any]]:
+        """
+        Анализ пакета записей
+        
+        Args:
+            items: Список (текст, оценка настроения 1-10)
+        
+        Returns:
+            Результаты в формате анализа Gemini, в порядке items
+        """
+        start_time = time.perf_counter()
+        tokenized = [self.tokenize(text) for text, _ in items]
+        
+        # Каждое уникальное слово пакета стеммится и ищется в словаре один раз
+        vocabulary = {token for tokens in tokenized for token in tokens}
+        stems = {token: self.stem(token) for token in vocabulary}
+        hits = {token: self._lookup(token, stems[token]) for token in vocabulary}
+        
+        results = [
+            self._score(tokens, [stems[token] for token in tokens], [hits[token] for token in tokens], mood_score)
+            for tokens, (_, mood_score) in zip(tokenized, items)
+        ]
+        
+        processing_time = (time.perf_counter() - start_time) / max(len(items), 1)
+        for result in results:
+            result["processing_time"] = processing_time
+        return results
+    
+    def _lookup(self, token: str, stem: str) -> Any:
+        """Роль слова в оценке: отрицание, усилитель, попадание в словарь или None"""
+        if token in NEGATIONS:
+            return NEGATION
+        if token in INTENSIFIERS:
+            return INTENSIFIER
+        return self.lexicon.get(stem)
+    
+    def _score(
+        self,
+        tokens: List[str],
+        stems: List[str],
+        hits: List[Any],
+        mood_score: float
+    ) -> Dict[str, Any]:
+        """Оценка одной записи по словам, их основам и найденным для пакета ролям слов"""
+        emotion_sums = [0.0] * len(self.emotion_names)
+        sentiment_sum = 0.0
+        weight_sum = 0.0
+        negated = 0
+        intensity = 1.0
+        
+        for hit in hits:
+            if hit is NEGATION:
+                negated = 3  # Отрицание действует на следующие слова до первого попадания
+                continue
+            if hit is INTENSIFIER:
+                intensity = 1.5
+                continue
+            
+            if hit is None:
+                negated = max(negated - 1, 0)
+                continue
+            
+            polarity, emotion = hit
+            if negated:
+                # "не радостно" - скорее слабый негатив, чем противоположная эмоция
+                sentiment_sum -= polarity * 0.5 * intensity
+            else:
+                sentiment_sum += polarity * intensity
+                if emotion is not None:
+                    emotion_sums[emotion] += intensity
+            weight_sum += intensity
+            negated = 0
+            intensity = 1.0
+        
+        # Априорная оценка по шкале настроения, вес текста растет с числом попаданий
+        prior = min(max((mood_score - 5.5) / 4.5, -1.0), 1.0)
+        text_weight = weight_sum / (weight_sum + 2)
+        lexical = sentiment_sum / weight_sum if weight_sum else 0.0
+        sentiment_score = round(text_weight * lexical + (1 - text_weight) * prior, 2)
+        
+        if sentiment_score > 0.2:
+            sentiment_label = "positive"
+        elif sentiment_score < -0.2:
+            sentiment_label = "negative"
+        else:
+            sentiment_label = "neutral"
+        
+        emotions = self._emotions(emotion_sums, mood_score)
+        dominant_emotion = max(emotions, key=emotions.get)
+        
+        return {
+            "sentiment_score": sentiment_score,
+            "sentiment_label": sentiment_label,
+            "emotions": emotions,
+            "dominant_emotion": dominant_emotion,
+            "keywords": self._keywords(tokens, stems),
+            "themes": sorted({self.themes[stem] for stem in stems if stem in self.themes}) or ["повседневность"],
+            "recommendations": RECOMMENDATIONS[dominant_emotion],
+            "insights": (
+                f"По тексту записи преобладает {dominant_emotion}, "
+                f"тональность {SENTIMENT_LABELS_RU[sentiment_label]} при оценке {mood_score}/10."
+            ),
+            "confidence_score": round(0.3 + 0.5 * text_weight, 2),
+            "ai_model": self.MODEL_NAME,
+        }
+    
+    def _emotions(self, emotion_sums: List[float], mood_score: float) -> Dict[str, float]:
+        """Значения эмоций 0..1: доли попаданий в словарь поверх оценки настроения"""
+        prior = {
+            "радость": max(0.1, (mood_score - 5) / 5),
+            "грусть": max(0.1, (5 - mood_score) / 5),
+            "тревога": 0.2,
+            "спокойствие": 0.3,
+            "раздражение": 0.1,
+            "воодушевление": max(0.1, (mood_score - 6) / 4),
+        }
+        
+        total = sum(emotion_sums)
+        text_weight = total / (total + 1)
+        return {
+            name: round(min(1.0, (1 - text_weight) * prior[name] + text_weight * emotion_sums[index] / total), 2)
+            if total else round(min(1.0, prior[name]), 2)
+            for index, name in enumerate(self.emotion_names)
+        }
+    
+    def _keywords(self, tokens: List[str], stems: List[str], limit: int = 5) -> List[str]:
+        """Частые значимые слова текста, по одной форме на основу"""
+        counts = Counter()
+        forms: Dict[str, str] = {}
+        for token, stem in zip(tokens, stems):
+            if len(token) < 4 or token in STOPWORDS or token in NEGATIONS or token in INTENSIFIERS:
+                continue
+            counts[stem] += 1
+            forms.setdefault(stem, token)
+        
+        return [forms[stem] for stem, _ in counts.most_common(limit)]
+
+
+# Создаем экземпляр анализатора
+local_analyzer = LocalMoodAnalyzer()
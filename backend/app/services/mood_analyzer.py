@@ -3,18 +3,62 @@
 Объединяет работу с базой данных и AI анализом
 """
 
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Awaitable, Callable, List, Optional
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from .gemini_service import gemini_service
+from ..core.database import AsyncSessionLocal
+from ..crud.analysis_emotion import analysis_emotion_crud
+from ..crud.mood_daily_rollup import mood_daily_rollup_crud
 from ..models.ai_analysis import AIAnalysis
 from ..models.mood_entry import MoodEntry
 from ..schemas import AIAnalysisCreate
 
 logger = logging.getLogger(__name__)
 
+# Колбэк потокового анализа: получает поля ответа, пришедшие к этому моменту
+ProgressCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class LateResultWriter:
+    """
+    Колбэк on_late_result для записи: ответ модели, пришедший после
+    дедлайна, заменяет сохраненный fallback анализ
+    
+    Ответ ждет release: вызывающий сначала сохраняет fallback, иначе
+    fallback перезаписал бы более поздний результат модели. Если модель так
+    и не ответила, вызывается on_missing с ID записи
+    """
+    
+    def __init__(
+        self,
+        analyzer: "MoodAnalyzer",
+        mood_entry: MoodEntry,
+        on_missing: Optional[Callable[[int], Awaitable[None]]] = None
+    ):
+        self.analyzer = analyzer
+        self.entry_id = mood_entry.id
+        self.mood_text = mood_entry.mood_text
+        self.mood_score = mood_entry.mood_score
+        self.on_missing = on_missing
+        self._released = asyncio.Event()
+    
+    def release(self) -> None:
+        """Вызывающий закончил сохранение: поздний ответ можно записывать"""
+        self._released.set()
+    
+    async def __call__(self, analysis_result: Optional[Dict[str, Any]]) -> None:
+        await self._released.wait()
+        if analysis_result is None:
+            if self.on_missing is not None:
+                await self.on_missing(self.entry_id)
+            return
+        
+        await self.analyzer.save_late_result(self.entry_id, self.mood_text, self.mood_score, analysis_result)
+
 
 class MoodAnalyzer:
     """Сервис для анализа настроения с сохранением в БД"""
@@ -22,63 +66,113 @@ class MoodAnalyzer:
     def __init__(self):
         self.ai_service = gemini_service
     
-    async def analyze_and_save(
-        self, 
-        db: Session, 
-        mood_entry: MoodEntry
-    ) -> Optional[AIAnalysis]:
+    async def analyze_entry(
+        self,
+        mood_entry: MoodEntry,
+        on_progress: Optional[ProgressCallback] = None,
+        on_late_result: Optional[LateResultWriter] = None
+    ) -> Dict[str, Any]:
         """
-        Анализирует запись настроения и сохраняет результат в БД
+        Провести AI анализ записи настроения
+        
+        Дедлайн берется из текущего deadline_scope (маршрут API или
+        обработчик бота). Если модель не успела, возвращается fallback
+        анализ, а ответ модели позже получит on_late_result
         
         Args:
-            db: Сессия базы данных
-            mood_entry: Запись настроения для анализа
-            
-        Returns:
-            Созданный объект AIAnalysis или None при ошибке
+            on_progress: если задан, анализ идет потоком и колбэк получает
+                поля ответа по мере их поступления
         """
-        try:
-            logger.info(f"🧠 Начинаю анализ записи настроения ID: {mood_entry.id}")
-            
-            # Проводим AI анализ
-            analysis_result = await self.ai_service.analyze_mood_text(
+        logger.info(f"🧠 Начинаю анализ записи настроения ID: {mood_entry.id}")
+        
+        if on_progress is None:
+            return await self.ai_service.analyze_mood_text(
                 text=mood_entry.mood_text,
-                mood_score=mood_entry.mood_score
-            )
-            
-            # Создаем запись в БД
-            analysis_data = AIAnalysisCreate(
-                mood_entry_id=mood_entry.id,
-                sentiment_score=analysis_result.get("sentiment_score"),
-                sentiment_label=analysis_result.get("sentiment_label"),
-                emotions=analysis_result.get("emotions"),
-                dominant_emotion=analysis_result.get("dominant_emotion"),
-                keywords=analysis_result.get("keywords"),
-                themes=analysis_result.get("themes"),
-                recommendations=analysis_result.get("recommendations"),
-                insights=analysis_result.get("insights"),
-                ai_model=analysis_result.get("ai_model", "gemini-1.5-flash"),
-                processing_time=analysis_result.get("processing_time"),
-                confidence_score=analysis_result.get("confidence_score")
+                mood_score=mood_entry.mood_score,
+                on_late_result=on_late_result
             )
+        
+        async for fields, done in self.ai_service.stream_analysis(
+            mood_entry.mood_text, mood_entry.mood_score, on_late_result
+        ):
+            if done:
+                return fields
+            await on_progress(fields)
+    
+    async def save_late_result(
+        self,
+        entry_id: int,
+        mood_text: str,
+        mood_score: float,
+        analysis_result: Dict[str, Any]
+    ) -> None:
+        """Заменить fallback анализ записи ответом модели, пришедшим после дедлайна"""
+        async with AsyncSessionLocal() as db:
+            entry = await db.run_sync(lambda session: session.get(MoodEntry, entry_id))
+            # Запись удалена или изменена: ответ относится к старому тексту
+            if entry is None or entry.mood_text != mood_text or entry.mood_score != mood_score:
+                return
             
-            # Сохраняем в базу данных
-            db_analysis = AIAnalysis(
-                user_id=mood_entry.user_id,
-                **analysis_data.model_dump()
-            )
-            
-            db.add(db_analysis)
-            db.commit()
-            db.refresh(db_analysis)
-            
-            logger.info(f"✅ Анализ сохранен в БД с ID: {db_analysis.id}")
-            return db_analysis
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка анализа настроения: {e}")
-            db.rollback()
-            return None
+            await db.run_sync(self.replace_analysis, entry, analysis_result)
+        logger.info(f"✅ Поздний ответ Gemini сохранен для записи {entry_id}")
+    
+    def _save_analysis(
+        self, 
+        db: Session, 
+        mood_entry: MoodEntry, 
+        analysis_result: Dict[str, Any]
+    ) -> AIAnalysis:
+        """Сохранить результат AI анализа в БД"""
+        # Создаем запись в БД
+        analysis_data = AIAnalysisCreate(
+            mood_entry_id=mood_entry.id,
+            sentiment_score=analysis_result.get("sentiment_score"),
+            sentiment_label=analysis_result.get("sentiment_label"),
+            emotions=analysis_result.get("emotions"),
+            dominant_emotion=analysis_result.get("dominant_emotion"),
+            keywords=analysis_result.get("keywords"),
+            themes=analysis_result.get("themes"),
+            recommendations=analysis_result.get("recommendations"),
+            insights=analysis_result.get("insights"),
+            ai_model=analysis_result.get("ai_model", "gemini-1.5-flash"),
+            processing_time=analysis_result.get("processing_time"),
+            confidence_score=analysis_result.get("confidence_score")
+        )
+        
+        # Сохраняем в базу данных
+        db_analysis = AIAnalysis(
+            user_id=mood_entry.user_id,
+            **analysis_data.model_dump()
+        )
+        
+        # Эмоции в каноническом словаре для агрегации в SQL
+        db_analysis.emotion_scores = analysis_emotion_crud.build_scores(db_analysis.emotions)
+        mood_daily_rollup_crud.on_analysis_saved(db, mood_entry, db_analysis.emotions)
+        db.add(db_analysis)
+        db.commit()
+        db.refresh(db_analysis)
+        
+        logger.info(f"✅ Анализ сохранен в БД с ID: {db_analysis.id}")
+        return db_analysis
+    
+    def replace_analysis(
+        self, 
+        db: Session, 
+        mood_entry: MoodEntry, 
+        analysis_result: Dict[str, Any]
+    ) -> AIAnalysis:
+        """
+        Сохранить результат AI анализа вместо предыдущего
+        Старый анализ удаляется в той же транзакции, поэтому запись
+        не остается без анализа, пока идет повторный анализ
+        """
+        if mood_entry.ai_analysis:
+            mood_daily_rollup_crud.on_analysis_deleted(db, mood_entry, mood_entry.ai_analysis.emotions)
+            db.delete(mood_entry.ai_analysis)
+            db.flush()
+            db.expire(mood_entry, ["ai_analysis"])
+        
+        return self._save_analysis(db, mood_entry, analysis_result)
     
     def get_mood_summary(self, db: Session, user_id: int, days: int = 7) -> Dict[str, Any]:
         """
@@ -88,7 +182,7 @@ class MoodAnalyzer:
             db: Сессия базы данных
             user_id: ID пользователя
             days: Количество дней для анализа
-            
+        
         Returns:
             Словарь со сводкой настроения
         """
@@ -97,68 +191,12 @@ class MoodAnalyzer:
             from ..crud.mood_entry import mood_entry_crud
             entries = mood_entry_crud.get_recent_entries(db, user_id, days)
             
-            if not entries:
-                return {
-                    "period_days": days,
-                    "total_entries": 0,
-                    "message": "Нет записей за указанный период"
-                }
-            
-            # Базовая статистика
-            total_entries = len(entries)
-            average_mood = sum(entry.mood_score for entry in entries) / total_entries
-            
-            # Анализ эмоций (из AI анализов)
-            emotion_stats = {}
-            sentiment_stats = {"positive": 0, "negative": 0, "neutral": 0}
-            
-            for entry in entries:
-                if entry.ai_analysis:
-                    # Статистика эмоций
-                    if entry.ai_analysis.emotions:
-                        for emotion, value in entry.ai_analysis.emotions.items():
-                            if emotion not in emotion_stats:
-                                emotion_stats[emotion] = []
-                            emotion_stats[emotion].append(value)
-                    
-                    # Статистика тональности
-                    sentiment = entry.ai_analysis.sentiment_label
-                    if sentiment in sentiment_stats:
-                        sentiment_stats[sentiment] += 1
-            
-            # Вычисляем средние значения эмоций
-            avg_emotions = {}
-            for emotion, values in emotion_stats.items():
-                avg_emotions[emotion] = round(sum(values) / len(values), 2) if values else 0
-            
-            # Находим доминирующую эмоцию
-            dominant_emotion = max(avg_emotions.items(), key=lambda x: x[1])[0] if avg_emotions else "неопределено"
-            
-            # Тренд настроения
-            if len(entries) >= 3:
-                recent_avg = sum(entry.mood_score for entry in entries[:3]) / 3
-                older_avg = sum(entry.mood_score for entry in entries[-3:]) / 3
-                
-                if recent_avg > older_avg + 0.5:
-                    trend = "улучшается 📈"
-                elif recent_avg < older_avg - 0.5:
-                    trend = "ухудшается 📉"
-                else:
-                    trend = "стабильно ➡️"
-            else:
-                trend = "недостаточно данных"
-            
-            return {
-                "period_days": days,
-                "total_entries": total_entries,
-                "average_mood": round(average_mood, 1),
-                "mood_trend": trend,
-                "dominant_emotion": dominant_emotion,
-                "emotion_averages": avg_emotions,
-                "sentiment_distribution": sentiment_stats,
-                "latest_entry_date": entries[0].entry_date.strftime("%d.%m.%Y") if entries else None
-            }
+            # Средние значения эмоций считаются в SQL по нормализованным оценкам
+            start_date = datetime.utcnow() - timedelta(days=days)
+            emotion_averages = analysis_emotion_crud.get_averages(db, user_id, start_date=start_date) if entries else {}
             
+            return self.summarize_entries(entries, days, emotion_averages)
+        
         except Exception as e:
             logger.error(f"Ошибка получения сводки настроения: {e}")
             return {
@@ -166,6 +204,70 @@ class MoodAnalyzer:
                 "error": "Ошибка при получении данных"
             }
     
+    def summarize_entries(
+        self, 
+        entries: List[MoodEntry], 
+        days: int, 
+        emotion_averages: Dict[str, float]
+    ) -> Dict[str, Any]:
+        """
+        Сводка настроения по уже загруженным записям (по убыванию даты)
+        
+        Args:
+            entries: Записи за период с ai_analysis
+            days: Количество дней периода
+            emotion_averages: Средние значения эмоций за период
+        """
+        if not entries:
+            return {
+                "period_days": days,
+                "total_entries": 0,
+                "message": "Нет записей за указанный период"
+            }
+        
+        # Базовая статистика
+        total_entries = len(entries)
+        average_mood = sum(entry.mood_score for entry in entries) / total_entries
+        
+        # Статистика тональности (из AI анализов)
+        sentiment_stats = {"positive": 0, "negative": 0, "neutral": 0}
+        
+        for entry in entries:
+            if entry.ai_analysis:
+                sentiment = entry.ai_analysis.sentiment_label
+                if sentiment in sentiment_stats:
+                    sentiment_stats[sentiment] += 1
+        
+        avg_emotions = {emotion: round(average, 2) for emotion, average in emotion_averages.items()}
+        
+        # Находим доминирующую эмоцию
+        dominant_emotion = max(avg_emotions.items(), key=lambda x: x[1])[0] if avg_emotions else "неопределено"
+        
+        # Тренд настроения
+        if len(entries) >= 3:
+            recent_avg = sum(entry.mood_score for entry in entries[:3]) / 3
+            older_avg = sum(entry.mood_score for entry in entries[-3:]) / 3
+            
+            if recent_avg > older_avg + 0.5:
+                trend = "улучшается 📈"
+            elif recent_avg < older_avg - 0.5:
+                trend = "ухудшается 📉"
+            else:
+                trend = "стабильно ➡️"
+        else:
+            trend = "недостаточно данных"
+        
+        return {
+            "period_days": days,
+            "total_entries": total_entries,
+            "average_mood": round(average_mood, 1),
+            "mood_trend": trend,
+            "dominant_emotion": dominant_emotion,
+            "emotion_averages": avg_emotions,
+            "sentiment_distribution": sentiment_stats,
+            "latest_entry_date": entries[0].entry_date.strftime("%d.%m.%Y") if entries else None
+        }
+    
     def get_recommendations_for_user(self, db: Session, user_id: int) -> Dict[str, Any]:
         """
         Получить персональные рекомендации для пользователя
@@ -173,7 +275,7 @@ class MoodAnalyzer:
         Args:
             db: Сессия базы данных
             user_id: ID пользователя
-            
+        
         Returns:
             Словарь с рекомендациями
         """
@@ -182,58 +284,8 @@ class MoodAnalyzer:
             
             # Получаем последние записи с анализом
             recent_entries = mood_entry_crud.get_recent_entries(db, user_id, 5)
-            
-            if not recent_entries:
-                return {
-                    "message": "Недостаточно данных для рекомендаций",
-                    "recommendations": [
-                        "Начните вести дневник настроения регулярно",
-                        "Записывайте не только оценку, но и подробности дня"
-                    ]
-                }
-            
-            # Собираем рекомендации из AI анализов
-            all_recommendations = []
-            mood_scores = []
-            
-            for entry in recent_entries:
-                mood_scores.append(entry.mood_score)
-                if entry.ai_analysis and entry.ai_analysis.recommendations:
-                    all_recommendations.append(entry.ai_analysis.recommendations)
-            
-            # Анализируем паттерны
-            avg_mood = sum(mood_scores) / len(mood_scores)
-            
-            # Базовые рекомендации в зависимости от среднего настроения
-            base_recommendations = []
-            
-            if avg_mood < 4:
-                base_recommendations = [
-                    "🌱 Рассмотрите возможность обращения к специалисту",
-                    "🚶‍♀️ Попробуйте ежедневные прогулки на свежем воздухе",
-                    "🧘‍♀️ Практикуйте техники релаксации или медитацию"
-                ]
-            elif avg_mood < 6:
-                base_recommendations = [
-                    "💪 Добавьте физическую активность в свой день",
-                    "👥 Проводите больше времени с близкими людьми",
-                    "🎯 Поставьте себе небольшие достижимые цели"
-                ]
-            else:
-                base_recommendations = [
-                    "✨ Продолжайте в том же духе!",
-                    "📚 Попробуйте изучить что-то новое",
-                    "🤝 Поделитесь своим позитивом с окружающими"
-                ]
-            
-            return {
-                "average_mood": round(avg_mood, 1),
-                "period": "последние 5 записей",
-                "ai_recommendations": all_recommendations[-3:] if all_recommendations else [],
-                "general_recommendations": base_recommendations,
-                "total_entries_analyzed": len(recent_entries)
-            }
-            
+            return self.recommendations_from_entries(recent_entries)
+        
         except Exception as e:
             logger.error(f"Ошибка получения рекомендаций: {e}")
             return {
@@ -244,6 +296,60 @@ class MoodAnalyzer:
                     "Поддерживайте социальные связи"
                 ]
             }
+    
+    def recommendations_from_entries(self, recent_entries: List[MoodEntry]) -> Dict[str, Any]:
+        """Рекомендации по уже загруженным последним записям с ai_analysis"""
+        if not recent_entries:
+            return {
+                "message": "Недостаточно данных для рекомендаций",
+                "recommendations": [
+                    "Начните вести дневник настроения регулярно",
+                    "Записывайте не только оценку, но и подробности дня"
+                ]
+            }
+        
+        # Собираем рекомендации из AI анализов
+        all_recommendations = []
+        mood_scores = []
+        
+        for entry in recent_entries:
+            mood_scores.append(entry.mood_score)
+            if entry.ai_analysis and entry.ai_analysis.recommendations:
+                all_recommendations.append(entry.ai_analysis.recommendations)
+        
+        # Анализируем паттерны
+        avg_mood = sum(mood_scores) / len(mood_scores)
+        
+        # Базовые рекомендации в зависимости от среднего настроения
+        base_recommendations = []
+        
+        if avg_mood < 4:
+            base_recommendations = [
+                "🌱 Рассмотрите возможность обращения к специалисту",
+                "🚶‍♀️ Попробуйте ежедневные прогулки на свежем воздухе",
+                "🧘‍♀️ Практикуйте техники релаксации или медитацию"
+            ]
+        elif avg_mood < 6:
+            base_recommendations = [
+                "💪 Добавьте физическую активность в свой день",
+                "👥 Проводите больше времени с близкими людьми",
+                "🎯 Поставьте себе небольшие достижимые цели"
+            ]
+        else:
+            base_recommendations = [
+                "✨ Продолжайте в том же духе!",
+                "📚 Попробуйте изучить что-то новое",
+                "🤝 Поделитесь своим позитивом с окружающими"
+            ]
+        
+        return {
+            "average_mood": round(avg_mood, 1),
+            "period": "последние 5 записей",
+            # Локальный анализ дает один совет на эмоцию, повторы показываем один раз
+            "ai_recommendations": list(dict.fromkeys(all_recommendations))[-3:],
+            "general_recommendations": base_recommendations,
+            "total_entries_analyzed": len(recent_entries)
+        }
 
 
 # Создаем экземпляр анализатора
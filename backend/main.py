@@ -10,8 +10,15 @@ import uvicorn
 import logging
 from contextlib import asynccontextmanager
 
+from app.bot.bot import mood_bot
+from app.bot.webhook import webhook_router
 from app.core.config import settings
-from app.core.database import create_tables
+from app.core.database import SessionLocal, create_tables, dispose_engines, track_sql_statements
+from app.core.deadline import deadline_scope
+from app.crud.analysis_emotion import analysis_emotion_crud
+from app.crud.mood_daily_rollup import mood_daily_rollup_crud
+from app.services.analysis_worker import analysis_worker
+from app.services.insights import insights_scheduler
 from app.api import api_router
 
 # Настройка логирования
@@ -22,6 +29,15 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def backfill_aggregates():
+    """Заполнить производные таблицы из истории при первом запуске с новыми таблицами"""
+    with SessionLocal() as db:
+        if mood_daily_rollup_crud.backfill_if_empty(db):
+            logger.info("✅ Дневные агрегаты настроения заполнены из истории")
+        if analysis_emotion_crud.backfill_if_empty(db):
+            logger.info("✅ Оценки эмоций перенесены в analysis_emotions")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Управление жизненным циклом приложения"""
@@ -29,11 +45,26 @@ async def lifespan(app: FastAPI):
     
     # Создание таблиц в базе данных
     create_tables()
+    backfill_aggregates()
     logger.info("✅ База данных инициализирована")
     
+    # Воркеры фонового анализа (или отдельный процесс run_worker.py)
+    if settings.ANALYSIS_WORKER_ENABLED:
+        analysis_worker.start()
+        if settings.INSIGHTS_PRECOMPUTE_ENABLED:
+            insights_scheduler.start()
+    
+    # Telegram Bot в режиме webhook: обновления принимает маршрут этого API
+    if settings.bot_webhook_enabled and mood_bot.setup_application(webhook=True):
+        await mood_bot.start_webhook()
+    
     yield
     
     logger.info("🛑 Завершение работы backend...")
+    await mood_bot.stop_webhook()
+    await insights_scheduler.stop()
+    await analysis_worker.stop()
+    await dispose_engines()
 
 
 # Создание FastAPI приложения
@@ -56,6 +87,28 @@ app.add_middleware(
 )
 
 
+# Дедлайн AI вызовов внутри запроса: не успевший ответ модели заменяется локальным
+@app.middleware("http")
+async def request_deadline(request, call_next):
+    with deadline_scope(settings.API_REQUEST_DEADLINE):
+        return await call_next(request)
+
+
+# Отладочный заголовок с количеством SQL запросов
+if settings.DEBUG_SQL_HEADER:
+    @app.middleware("http")
+    async def sql_statements_header(request, call_next):
+        with track_sql_statements() as counter:
+            response = await call_next(request)
+        response.headers["X-SQL-Statements"] = str(counter.count)
+        return response
+
+
+# Маршрут webhook Telegram Bot
+if settings.bot_webhook_enabled:
+    app.include_router(webhook_router)
+
+
 # Глобальный обработчик ошибок
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Пересчет статистики пользователей (user_mood_stats), дневных агрегатов
+(mood_daily_rollup) из mood_entries и оценок эмоций (analysis_emotions)
+из AIAnalysis.emotions
+
+Запуск:
+    python backend/rebuild_stats.py            # пересчитать и сохранить
+    python backend/rebuild_stats.py --check    # только показать расхождения
+    python backend/rebuild_stats.py --user 1 --user 2
+"""
+
+import argparse
+import sys
+import os
+
+# Добавляем путь к модулям
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(backend_dir)
+sys.path.append(backend_dir)
+
+# Устанавливаем путь к .env файлу
+os.chdir(project_dir)
+
+from app.core.database import SessionLocal, create_tables
+from app.crud.analysis_emotion import analysis_emotion_crud
+from app.crud.mood_daily_rollup import mood_daily_rollup_crud
+from app.crud.user_history_summary import user_history_summary_crud
+from app.crud.user_mood_stats import user_mood_stats_crud
+
+
+def main():
+    """Главная функция пересчета"""
+    parser = argparse.ArgumentParser(description="Пересчет статистики настроения пользователей")
+    parser.add_argument("--check", action="store_true", help="Только проверить расхождения, ничего не меняя")
+    parser.add_argument("--user", type=int, action="append", dest="user_ids", help="ID пользователя (можно несколько)")
+    args = parser.parse_args()
+    
+    create_tables()
+    
+    with SessionLocal() as db:
+        drift = user_mood_stats_crud.rebuild(db, user_ids=args.user_ids, dry_run=args.check)
+        drift += mood_daily_rollup_crud.rebuild(db, user_ids=args.user_ids, dry_run=args.check)
+        if not args.user_ids:
+            drift += analysis_emotion_crud.rebuild(db, dry_run=args.check)
+        if not args.check:
+            # Сжатая история собирается из дневных агрегатов, после пересчета соберем заново
+            user_history_summary_crud.reset(db, user_ids=args.user_ids)
+    
+    for item in drift:
+        if "analysis_id" in item:
+            print(f"analysis_id={item['analysis_id']} эмоции: сохранено={item['stored']} ожидается={item['expected']}")
+            continue
+        day = f" {item['day']}" if "day" in item else ""
+        print(f"user_id={item['user_id']}{day} {item['field']}: сохранено={item['stored']} ожидается={item['expected']}")
+    
+    if not drift:
+        print("✅ Статистика совпадает с записями")
+    elif args.check:
+        print(f"⚠️ Найдено расхождений: {len(drift)}")
+        return 1
+    else:
+        print(f"✅ Исправлено расхождений: {len(drift)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -46,6 +46,12 @@ async def main():
         create_tables()
         logger.info("✅ База данных инициализирована")
         
+        # В режиме webhook бота обслуживает API (main.py), polling конфликтовал бы с webhook
+        from app.core.config import settings
+        if settings.bot_webhook_enabled:
+            logger.info(f"Бот работает в режиме webhook внутри API ({settings.BOT_WEBHOOK_URL}), polling не запускается")
+            return
+        
         # Настраиваем приложение
         app = mood_bot.setup_application()
         if not app:
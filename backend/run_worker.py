@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Запуск воркеров фонового AI анализа и ночной генерации инсайтов отдельно от API
+Используется с ANALYSIS_WORKER_ENABLED=false у процессов API
+"""
+
+import asyncio
+import logging
+import signal
+import sys
+import os
+
+# Добавляем путь к модулям
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(backend_dir)
+sys.path.append(backend_dir)
+
+# Устанавливаем путь к .env файлу
+os.chdir(project_dir)
+
+from app.core.config import settings
+from app.services.analysis_worker import analysis_worker
+from app.services.insights import insights_scheduler
+
+
+def setup_logging():
+    """Настройка логирования"""
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO,
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler('worker.log', encoding='utf-8')
+        ]
+    )
+
+
+async def main():
+    """Главная функция запуска воркеров"""
+    setup_logging()
+    logger = logging.getLogger(__name__)
+    
+    logger.info("🚀 Запускаю воркеры AI анализа...")
+    
+    from app.core.database import create_tables, dispose_engines
+    try:
+        # Инициализируем базу данных
+        create_tables()
+        
+        # Работаем до сигнала остановки
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in [signal.SIGINT, signal.SIGTERM]:
+            loop.add_signal_handler(sig, stop_event.set)
+        
+        analysis_worker.start()
+        if settings.INSIGHTS_PRECOMPUTE_ENABLED:
+            insights_scheduler.start()
+        await stop_event.wait()
+        logger.info("🛑 Получен сигнал завершения")
+    
+    except Exception as e:
+        logger.error(f"❌ Критическая ошибка: {e}")
+        import traceback
+        logger.error(f"Трассировка: {traceback.format_exc()}")
+    finally:
+        # Прерванные задачи другие воркеры вернут в очередь как зависшие
+        await insights_scheduler.stop()
+        await analysis_worker.stop()
+        await dispose_engines()
+        logger.info("🔚 Воркеры завершили работу")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n🛑 Воркеры остановлены пользователем")
@@ -0,0 +1,59 @@
+"""
+Общие фикстуры тестов backend
+
+Настройки читаются при импорте app, поэтому база данных тестов
+(временный файл SQLite) задается в окружении до импорта
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+_db_dir = tempfile.mkdtemp(prefix="mood_diary_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ["GEMINI_API_KEY"] = ""
+os.environ["TELEGRAM_BOT_TOKEN"] = ""
+os.environ["REDIS_URL"] = ""
+
+# Добавляем путь к модулям приложения
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import models  # noqa: E402,F401 - регистрирует все таблицы в Base.metadata
+from app.core.database import Base, SessionLocal, engine  # noqa: E402
+from app.crud.mood_entry import mood_entry_crud  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.schemas import MoodEntryCreate  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """Сессия чистой базы: таблицы создаются перед тестом и удаляются после"""
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+@pytest.fixture
+def user(db):
+    """Пользователь без записей"""
+    user = User(telegram_id=1001, first_name="Тест")
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def add_entry(db, user):
+    """Создать запись пользователя через MoodEntryCRUD, как это делают API и бот"""
+    def add(entry_date: datetime, mood_score: float = 7.0, mood_text: str = "Обычный день"):
+        entry_in = MoodEntryCreate(mood_score=mood_score, mood_text=mood_text, entry_date=entry_date)
+        return mood_entry_crud.create(db, entry_in, user.id)
+    return add
@@ -0,0 +1,125 @@
+"""
+Тесты очереди задач AI анализа
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.database import SessionLocal
+from app.crud.analysis_job import analysis_job_crud
+from app.models.analysis_job import JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING
+
+
+@pytest.fixture
+def entry(add_entry):
+    """Запись, которую анализирует очередь"""
+    return add_entry(datetime(2024, 3, 1, 12, 0))
+
+
+def test_enqueue_reuses_pending_job(db, entry):
+    """Повторная постановка записи в очередь не создает вторую задачу"""
+    job = analysis_job_crud.enqueue(db, entry.id)
+    again = analysis_job_crud.enqueue(db, entry.id)
+    
+    assert again.id == job.id
+    assert analysis_job_crud.count_by_status(db)[JOB_QUEUED] == 1
+
+
+def test_enqueue_while_running_adds_job(db, entry):
+    """Запись изменили, пока воркер анализирует старый текст: анализ повторится после него"""
+    job = analysis_job_crud.enqueue(db, entry.id)
+    analysis_job_crud.claim(db)
+    
+    again = analysis_job_crud.enqueue(db, entry.id)
+    
+    assert again.id != job.id
+    assert analysis_job_crud.count_by_status(db) == {JOB_QUEUED: 1, JOB_RUNNING: 1, JOB_DONE: 0, JOB_FAILED: 0}
+
+
+def test_claim_marks_job_running(db, entry):
+    """claim переводит задачу в running и учитывает попытку"""
+    job = analysis_job_crud.enqueue(db, entry.id)
+    
+    claimed = analysis_job_crud.claim(db)
+    
+    assert claimed.id == job.id
+    assert claimed.status == JOB_RUNNING
+    assert claimed.attempts == 1
+    assert claimed.locked_at is not None
+    assert analysis_job_crud.claim(db) is None
+
+
+def test_claimed_job_not_taken_by_another_worker(db, add_entry):
+    """Второй воркер со своей сессией берет следующую задачу, а не уже взятую"""
+    first = analysis_job_crud.enqueue(db, add_entry(datetime(2024, 3, 1, 12, 0)).id)
+    second = analysis_job_crud.enqueue(db, add_entry(datetime(2024, 3, 2, 12, 0)).id)
+    
+    other_worker = SessionLocal()
+    try:
+        assert analysis_job_crud.claim(db).id == first.id
+        assert analysis_job_crud.claim(other_worker).id == second.id
+        # Устаревшее представление об очереди: конкретная задача уже взята
+        assert analysis_job_crud.claim(other_worker, job_id=first.id) is None
+    finally:
+        other_worker.close()
+
+
+def test_failed_job_retried_with_backoff(db, entry):
+    """Неудачная попытка возвращает задачу в очередь с экспоненциальной задержкой"""
+    analysis_job_crud.enqueue(db, entry.id)
+    
+    delays = []
+    for _ in range(2):
+        job = analysis_job_crud.claim(db, job_id=analysis_job_crud.get_latest_for_entry(db, entry.id).id)
+        before = datetime.utcnow()
+        job = analysis_job_crud.mark_failed(db, job, "timeout", max_attempts=3, retry_base=10)
+        assert job.status == JOB_QUEUED
+        delays.append((job.run_after - before).total_seconds())
+        
+        # До run_after воркер задачу не берет
+        assert analysis_job_crud.claim(db) is None
+    
+    assert delays[0] == pytest.approx(10, abs=1)
+    assert delays[1] == pytest.approx(20, abs=1)
+    assert job.last_error == "timeout"
+
+
+def test_job_fails_after_max_attempts(db, entry):
+    """После max_attempts попыток задача больше не повторяется"""
+    job = analysis_job_crud.enqueue(db, entry.id)
+    
+    for attempt in range(1, 4):
+        job = analysis_job_crud.claim(db, job_id=job.id)
+        assert job.attempts == attempt
+        job = analysis_job_crud.mark_failed(db, job, "ошибка модели", max_attempts=3, retry_base=0)
+    
+    assert job.status == JOB_FAILED
+    assert job.finished_at is not None
+    assert analysis_job_crud.claim(db) is None
+
+
+def test_repeated_enqueue_cancels_backoff(db, entry):
+    """Повторная постановка отменяет отложенный повтор: задача готова сразу"""
+    job = analysis_job_crud.enqueue(db, entry.id)
+    job = analysis_job_crud.mark_failed(db, analysis_job_crud.claim(db), "timeout", max_attempts=5, retry_base=600)
+    assert analysis_job_crud.claim(db) is None
+    
+    analysis_job_crud.enqueue(db, entry.id)
+    
+    claimed = analysis_job_crud.claim(db)
+    assert claimed.id == job.id
+    assert claimed.attempts == 1
+
+
+def test_stale_running_job_requeued(db, entry):
+    """Задача воркера, упавшего посреди анализа, возвращается в очередь"""
+    job = analysis_job_crud.enqueue(db, entry.id)
+    job = analysis_job_crud.claim(db)
+    job.locked_at = datetime.utcnow() - timedelta(minutes=10)
+    db.commit()
+    
+    assert analysis_job_crud.requeue_stale(db, stale_after=60) == 1
+    
+    db.expire_all()
+    assert analysis_job_crud.claim(db).id == job.id
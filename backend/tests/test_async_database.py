@@ -0,0 +1,41 @@
+"""
+Тесты асинхронного слоя базы данных
+"""
+
+import pytest
+
+from app.core.database import AsyncSessionLocal, async_engine, get_async_database_url
+from app.crud.user import async_user_crud, user_crud
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("sqlite:///./mood_diary.db", "sqlite+aiosqlite:///./mood_diary.db"),
+    ("postgresql://user:pass@db:5432/mood", "postgresql+asyncpg://user:pass@db:5432/mood"),
+    ("mysql://user:pass@db/mood", "mysql+aiomysql://user:pass@db/mood"),
+    ("sqlite+aiosqlite:///./mood_diary.db", "sqlite+aiosqlite:///./mood_diary.db"),
+])
+def test_async_database_url(url, expected):
+    """Синхронный URL из настроек получает асинхронный драйвер, явно указанный драйвер не меняется"""
+    assert get_async_database_url(url) == expected
+
+
+def test_async_database_url_unknown_backend():
+    """Для базы без асинхронного драйвера - понятная ошибка"""
+    with pytest.raises(ValueError):
+        get_async_database_url("oracle://user:pass@db/mood")
+
+
+@pytest.mark.asyncio
+async def test_async_crud_shares_database_with_sync_session(db):
+    """Асинхронный CRUD пишет в ту же базу, что и синхронные сессии бота и скриптов"""
+    try:
+        async with AsyncSessionLocal() as session:
+            user, created = await async_user_crud.get_or_create(session, 2002, {"first_name": "Асинхронный"})
+            assert created
+            
+            _, created_again = await async_user_crud.get_or_create(session, 2002, {"first_name": "Асинхронный"})
+            assert not created_again
+        
+        assert user_crud.get_by_telegram_id(db, 2002).id == user.id
+    finally:
+        await async_engine.dispose()
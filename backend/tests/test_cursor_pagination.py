@@ -0,0 +1,93 @@
+"""
+Тесты курсорной (keyset) пагинации записей и пользователей
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.pagination import decode_entry_cursor, decode_id_cursor, encode_cursor
+from app.crud.mood_entry import mood_entry_crud
+from app.crud.user import user_crud
+from app.models.user import User
+
+START = datetime(2024, 3, 1, 9, 0)
+
+
+def walk_entry_pages(db, user_id: int, limit: int):
+    """Пройти все страницы записей через курсор, как клиент API"""
+    pages = []
+    cursor = ""
+    while cursor is not None:
+        entries, next_key = mood_entry_crud.get_user_entries_page(
+            db, user_id, limit=limit, after=decode_entry_cursor(cursor)
+        )
+        pages.append([entry.id for entry in entries])
+        cursor = encode_cursor(*next_key) if next_key else None
+    return pages
+
+
+def test_entry_pages_cover_all_entries_once(db, user, add_entry):
+    """Страницы идут от новых записей к старым без пропусков и повторов"""
+    entries = [add_entry(START + timedelta(days=number)) for number in range(7)]
+    
+    pages = walk_entry_pages(db, user.id, limit=3)
+    
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [entry_id for page in pages for entry_id in page] == [entry.id for entry in reversed(entries)]
+
+
+def test_entry_pages_break_ties_by_id(db, user, add_entry):
+    """Записи с одинаковой датой упорядочены по id и не теряются на границе страниц"""
+    same_time = [add_entry(START) for _ in range(4)]
+    older = add_entry(START - timedelta(hours=1))
+    
+    pages = walk_entry_pages(db, user.id, limit=2)
+    
+    assert pages == [
+        [same_time[3].id, same_time[2].id],
+        [same_time[1].id, same_time[0].id],
+        [older.id],
+    ]
+
+
+def test_entry_pages_not_shifted_by_new_entries(db, user, add_entry):
+    """Новая запись между запросами не сдвигает следующую страницу, в отличие от OFFSET"""
+    entries = [add_entry(START + timedelta(days=number)) for number in range(4)]
+    first_page, next_key = mood_entry_crud.get_user_entries_page(db, user.id, limit=2)
+    
+    add_entry(START + timedelta(days=10))
+    second_page, next_key = mood_entry_crud.get_user_entries_page(db, user.id, limit=2, after=next_key)
+    
+    assert [entry.id for entry in first_page] == [entries[3].id, entries[2].id]
+    assert [entry.id for entry in second_page] == [entries[1].id, entries[0].id]
+    assert next_key is None
+
+
+def test_user_pages_by_id(db):
+    """Страницы пользователей идут по возрастанию id"""
+    users = [User(telegram_id=5000 + number) for number in range(5)]
+    db.add_all(users)
+    db.commit()
+    
+    page, after_id = user_crud.get_page(db, limit=2)
+    ids = [item.id for item in page]
+    while after_id is not None:
+        page, after_id = user_crud.get_page(db, limit=2, after_id=decode_id_cursor(encode_cursor(after_id)))
+        ids.extend(item.id for item in page)
+    
+    assert ids == sorted(user.id for user in users)
+
+
+def test_entry_cursor_round_trip():
+    """Курсор записей сохраняет дату с микросекундами и id"""
+    key = (datetime(2024, 3, 1, 9, 30, 15, 123456), 42)
+    assert decode_entry_cursor(encode_cursor(*key)) == key
+    assert decode_entry_cursor("") is None
+
+
+@pytest.mark.parametrize("cursor", ["не-base64!", encode_cursor("2024-03-01"), encode_cursor("дата", 1)])
+def test_invalid_entry_cursor(cursor):
+    """Поврежденный курсор дает ValueError, который API превращает в 400"""
+    with pytest.raises(ValueError):
+        decode_entry_cursor(cursor)
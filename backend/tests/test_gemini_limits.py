@@ -0,0 +1,269 @@
+"""
+Тесты защиты запросов к Gemini: token bucket, AIMD лимит и circuit breaker
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import gemini_limits
+from app.services.gemini_limits import (
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    """Управляемое время вместо time.monotonic"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+    
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Подменить время модуля gemini_limits"""
+    fake = FakeClock()
+    monkeypatch.setattr(gemini_limits, "time", SimpleNamespace(monotonic=fake))
+    return fake
+
+
+# Token bucket
+
+def test_bucket_starts_full_and_refills(clock):
+    """Запас равен минутной квоте и пополняется rate/60 токенов в секунду"""
+    bucket = TokenBucket("test_rpm", rate_per_minute=60)
+    assert bucket.wait_time(60) == 0
+    
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    
+    clock.advance(0.5)
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    
+    clock.advance(600)
+    assert bucket.wait_time(60) == 0
+    assert bucket.tokens == pytest.approx(60)
+
+
+def test_bucket_consume_goes_negative(clock):
+    """Токены ответа списываются после запроса и могут увести запас в минус"""
+    bucket = TokenBucket("test_tpm", rate_per_minute=600)
+    bucket.consume(900)
+    
+    assert bucket.wait_time(100) == pytest.approx(40.0)
+
+
+def test_bucket_request_larger_than_capacity(clock):
+    """Запрос больше емкости ждет полного запаса, а не вечно"""
+    bucket = TokenBucket("test_tpm", rate_per_minute=600)
+    bucket.consume(600)
+    
+    assert bucket.wait_time(10000) == pytest.approx(60.0)
+
+
+def test_bucket_disabled(clock):
+    """rate_per_minute <= 0 отключает ограничение"""
+    bucket = TokenBucket("test_off", rate_per_minute=0)
+    bucket.consume(100)
+    
+    assert bucket.wait_time(100) == 0
+
+
+@pytest.mark.asyncio
+async def test_bucket_acquire_waits_for_refill(clock, monkeypatch):
+    """acquire ждет ровно столько, сколько нужно для пополнения"""
+    slept = []
+    
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+        clock.advance(seconds)
+    
+    monkeypatch.setattr(gemini_limits, "asyncio", SimpleNamespace(sleep=fake_sleep))
+    bucket = TokenBucket("test_acquire", rate_per_minute=60)
+    bucket.consume(60)
+    waits = bucket.waits.value
+    
+    await bucket.acquire(2)
+    
+    assert sum(slept) == pytest.approx(2.0)
+    assert bucket.tokens == pytest.approx(0)
+    assert bucket.waits.value == waits + 1
+
+
+# AIMD лимит одновременных запросов
+
+def test_limiter_halves_on_failure_once_per_wave(clock):
+    """Ошибка умножает лимит на backoff, ответы волны до снижения его больше не снижают"""
+    limiter = AdaptiveConcurrencyLimiter(max_limit=8, latency_target=5.0)
+    wave_started = clock()
+    clock.advance(1)
+    
+    limiter.in_flight = 3
+    limiter.release(wave_started, success=False)
+    assert limiter.limit == 4
+    limiter.release(wave_started, success=False)
+    assert limiter.limit == 4
+    
+    clock.advance(1)
+    limiter.release(clock(), success=False)
+    assert limiter.limit == 2
+
+
+def test_limiter_slow_response_counts_as_failure(clock):
+    """Ответ медленнее latency_target снижает лимит, как ошибка"""
+    limiter = AdaptiveConcurrencyLimiter(max_limit=4, latency_target=5.0)
+    started = clock()
+    clock.advance(6)
+    
+    limiter.in_flight = 1
+    limiter.release(started, success=True)
+    
+    assert limiter.limit == 2
+
+
+def test_limiter_grows_additively_up_to_max(clock):
+    """Быстрый успешный ответ добавляет 1/limit, но не выше max_limit"""
+    limiter = AdaptiveConcurrencyLimiter(max_limit=4, min_limit=1)
+    limiter.limit = 2.0
+    
+    limiter.in_flight = 2
+    for _ in range(2):
+        limiter.release(clock(), success=True)
+    assert limiter.limit == pytest.approx(2.0 + 1 / 2 + 1 / 2.5)
+    
+    limiter.limit = 3.9
+    limiter.in_flight = 1
+    limiter.release(clock(), success=True)
+    assert limiter.limit == 4
+
+
+def test_limiter_never_below_min(clock):
+    """Лимит не опускается ниже min_limit, а отмена его не меняет"""
+    limiter = AdaptiveConcurrencyLimiter(max_limit=4, min_limit=2)
+    for _ in range(3):
+        clock.advance(1)
+        limiter.in_flight = 1
+        limiter.release(clock(), success=False)
+    assert limiter.limit == 2
+    
+    limiter.in_flight = 1
+    limiter.release(clock(), success=None)
+    assert limiter.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_blocks_above_limit():
+    """Запрос сверх лимита ждет освобождения слота"""
+    limiter = AdaptiveConcurrencyLimiter(max_limit=2)
+    started = [await limiter.acquire(), await limiter.acquire()]
+    assert not limiter.has_capacity()
+    
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not waiting.done()
+    
+    limiter.release(started[0], success=True)
+    await asyncio.wait_for(waiting, timeout=1)
+    assert limiter.in_flight == 2
+
+
+# Circuit breaker
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    """failure_threshold ошибок подряд открывают breaker, успех между ними сбрасывает счет"""
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_half_open_after_recovery_timeout(clock):
+    """После recovery_timeout breaker пропускает half_open_calls проб, check пробу не занимает"""
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30, half_open_calls=1)
+    open_breaker(breaker)
+    
+    clock.advance(29)
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    
+    clock.advance(1)
+    breaker.check()
+    breaker.check()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_probe_success_closes(clock):
+    """Успешная проба закрывает breaker"""
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+    open_breaker(breaker)
+    clock.advance(30)
+    
+    breaker.before_call()
+    breaker.record_success()
+    
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+    breaker.before_call()
+
+
+def test_breaker_probe_failure_reopens(clock):
+    """Ошибка пробы снова открывает breaker на полный recovery_timeout"""
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+    open_breaker(breaker)
+    clock.advance(30)
+    
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    
+    clock.advance(29)
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock.advance(1)
+    breaker.check()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_breaker_cancelled_probe_frees_slot(clock):
+    """Отмененная проба освобождает слот для следующего запроса"""
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+    open_breaker(breaker)
+    clock.advance(30)
+    
+    breaker.before_call()
+    breaker.record_cancel()
+    
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
@@ -0,0 +1,136 @@
+"""
+Тесты разбора ответов Gemini
+"""
+
+import json
+
+import pytest
+
+from app.services.gemini_response import JSONStreamExtractor, ResponseParser, extract_json
+
+ANALYSIS = {
+    "sentiment_score": 0.6,
+    "sentiment_label": "positive",
+    "emotions": {"радость": 0.8, "грусть": 0.1},
+    "dominant_emotion": "радость",
+    "keywords": ["прогулка", "друзья"],
+    "themes": ["отдых"],
+    "recommendations": "Повторите прогулку {с друзьями} на выходных",
+    "insights": "День с \"хорошими\" новостями]",
+    "confidence_score": 0.9,
+}
+
+
+def feed_chunks(text: str, size: int, opening: str = "{["):
+    """Подать текст фрагментами по size символов, вернуть номер фрагмента с результатом"""
+    extractor = JSONStreamExtractor(opening)
+    for number, start in enumerate(range(0, len(text), size)):
+        result = extractor.feed(text[start:start + size])
+        if result is not None:
+            return result, number
+    return None, None
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 10000])
+def test_stream_extracts_object_split_into_chunks(size):
+    """Объект собирается из фрагментов любого размера, скобки и кавычки в строках не сбивают подсчет"""
+    text = "Вот анализ:\n```json\n" + json.dumps(ANALYSIS, ensure_ascii=False) + "\n```\nНадеюсь, это поможет!"
+    
+    result, _ = feed_chunks(text, size)
+    
+    assert result == ANALYSIS
+
+
+def test_stream_returns_as_soon_as_object_closes():
+    """Результат готов на фрагменте с закрывающей скобкой, хвост ответа не нужен"""
+    body = json.dumps({"a": 1})
+    text = body + " и еще много текста после объекта"
+    
+    result, number = feed_chunks(text, 1)
+    
+    assert result == {"a": 1}
+    assert number == len(body) - 1
+
+
+def test_stream_skips_brackets_in_prose():
+    """Скобки в тексте до JSON, которые не образуют JSON, пропускаются"""
+    text = "Оценка {примерно} такая [см. ниже]: {\"sentiment_score\": -0.4}"
+    
+    assert extract_json(text) == {"sentiment_score": -0.4}
+    assert extract_json(text, opening="{") == {"sentiment_score": -0.4}
+
+
+def test_stream_opening_selects_value_type():
+    """opening ограничивает, с каких скобок начинается значение"""
+    text = "[1, 2] {\"id\": \"7\"}"
+    
+    assert extract_json(text) == [1, 2]
+    assert extract_json(text, opening="{") == {"id": "7"}
+
+
+def test_stream_keeps_result_after_done():
+    """После результата новые фрагменты не меняют его"""
+    extractor = JSONStreamExtractor()
+    extractor.feed("{\"a\": 1}")
+    
+    assert extractor.done
+    assert extractor.feed("{\"b\": 2}") == {"a": 1}
+
+
+@pytest.mark.parametrize("text", ["", "Нет JSON в ответе", "{\"sentiment_score\": 0.5, \"keywords\": [\"обрезан"])
+def test_extract_json_without_complete_value(text):
+    """Текст без полного JSON значения (в том числе обрезанный ответ) дает ValueError"""
+    with pytest.raises(ValueError):
+        extract_json(text)
+
+
+def test_parse_analysis_validates_and_fills_defaults():
+    """Испорченные поля заменяются значениями по умолчанию, метка тональности выводится из оценки"""
+    parser = ResponseParser()
+    text = json.dumps({
+        "sentiment_score": -3,
+        "sentiment_label": "очень плохо",
+        "emotions": {"грусть": 2, "тревога": "высокая"},
+        "keywords": "работа, дедлайн",
+        "confidence_score": True,
+    }, ensure_ascii=False)
+    
+    result = parser.parse_analysis(text)
+    
+    assert result["sentiment_score"] == -1.0
+    assert result["sentiment_label"] == "negative"
+    assert result["emotions"] == {"грусть": 1.0}
+    assert result["keywords"] == ["работа", "дедлайн"]
+    assert result["confidence_score"] == 0.5
+    assert result["themes"] == ["повседневность"]
+
+
+def test_parse_failures_tracked():
+    """Неразобранный ответ дает ValueError и учитывается в доле неудач"""
+    parser = ResponseParser()
+    parsed, failures = parser.parsed.value, parser.failures.value
+    
+    parser.parse_analysis(json.dumps(ANALYSIS, ensure_ascii=False))
+    with pytest.raises(ValueError):
+        parser.parse_analysis("Извините, не могу проанализировать запись")
+    
+    assert parser.parsed.value == parsed + 1
+    assert parser.failures.value == failures + 1
+    assert parser.failure_rate.value == round(parser.failures.value / (parser.parsed.value + parser.failures.value), 4)
+
+
+def test_parse_batch_keeps_valid_items():
+    """Испорченный элемент пакета дает None только для своей записи"""
+    parser = ResponseParser()
+    text = "```json\n" + json.dumps([
+        {**ANALYSIS, "id": 1},
+        {"id": "2", "sentiment_label": "neutral"},
+        {**ANALYSIS, "id": "9"},
+    ], ensure_ascii=False) + "\n```"
+    
+    results = parser.parse_batch(text, ["1", "2", "3"])
+    
+    assert results["1"]["dominant_emotion"] == "радость"
+    assert results["2"] is None
+    assert results["3"] is None
+    assert "9" not in results
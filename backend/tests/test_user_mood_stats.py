@@ -0,0 +1,130 @@
+"""
+Тесты инкрементальной статистики настроения пользователя
+"""
+
+from datetime import datetime, timedelta
+
+from app.crud.mood_entry import mood_entry_crud
+from app.crud.user_mood_stats import user_mood_stats_crud
+from app.models.user_mood_stats import UserMoodStats
+from app.schemas import MoodEntryUpdate
+
+DAY_1 = datetime(2024, 3, 1, 12, 0)
+
+
+def day(number: int, hour: int = 12) -> datetime:
+    """Дата записи: день number серии тестов"""
+    return DAY_1.replace(hour=hour) + timedelta(days=number - 1)
+
+
+def assert_matches_history(db, user_id: int) -> UserMoodStats:
+    """Сохраненная строка совпадает с пересчетом из mood_entries"""
+    stats = db.get(UserMoodStats, user_id)
+    expected = user_mood_stats_crud.compute_from_entries(db, user_id)
+    for field in user_mood_stats_crud.TRACKED_FIELDS:
+        assert getattr(stats, field) == getattr(expected, field), field
+    return stats
+
+
+def test_first_entry_creates_stats_row(db, user, add_entry):
+    """Первая запись создает строку статистики с серией в один день"""
+    add_entry(day(1), mood_score=8)
+    
+    stats = assert_matches_history(db, user.id)
+    assert stats.entries_count == 1
+    assert stats.mood_sum == 8
+    assert (stats.positive_count, stats.neutral_count, stats.negative_count) == (1, 0, 0)
+    assert stats.streak_days == 1
+
+
+def test_consecutive_days_extend_streak(db, user, add_entry):
+    """Запись на следующий день продлевает серию, вторая запись за день - нет, пропуск сбрасывает"""
+    add_entry(day(1), mood_score=8)
+    add_entry(day(2), mood_score=5)
+    add_entry(day(2, hour=20), mood_score=2)
+    assert db.get(UserMoodStats, user.id).streak_days == 2
+    
+    add_entry(day(5), mood_score=6)
+    stats = assert_matches_history(db, user.id)
+    assert stats.streak_days == 1
+    assert stats.entries_count == 4
+    assert (stats.positive_count, stats.neutral_count, stats.negative_count) == (1, 2, 1)
+
+
+def test_backdated_entry_merges_two_streaks(db, user, add_entry):
+    """Запись задним числом в единственный пропущенный день склеивает две серии"""
+    for number in (1, 2, 4, 5):
+        add_entry(day(number))
+    assert db.get(UserMoodStats, user.id).streak_days == 2
+    
+    add_entry(day(3))
+    
+    stats = assert_matches_history(db, user.id)
+    assert stats.streak_days == 5
+    assert stats.last_entry_date == day(5)
+
+
+def test_backdated_entry_before_gap_keeps_streak(db, user, add_entry):
+    """Запись задним числом, не примыкающая к текущей серии, серию не меняет"""
+    for number in (4, 5):
+        add_entry(day(number))
+    
+    add_entry(day(1))
+    
+    stats = assert_matches_history(db, user.id)
+    assert stats.streak_days == 2
+    assert stats.entries_count == 3
+
+
+def test_update_and_delete_move_score_between_buckets(db, user, add_entry):
+    """Изменение оценки переносит запись в другую корзину, удаление вычитает ее"""
+    add_entry(day(1), mood_score=8)
+    entry = add_entry(day(2), mood_score=8)
+    
+    mood_entry_crud.update(db, entry.id, MoodEntryUpdate(mood_score=3))
+    stats = assert_matches_history(db, user.id)
+    assert (stats.positive_count, stats.negative_count) == (1, 1)
+    
+    mood_entry_crud.delete(db, entry.id)
+    stats = assert_matches_history(db, user.id)
+    assert stats.entries_count == 1
+    assert stats.streak_days == 1
+
+
+def test_rebuild_reports_and_repairs_drift(db, user, add_entry):
+    """rebuild находит расхождения, dry_run их не исправляет, обычный запуск исправляет"""
+    for number in (1, 2, 3):
+        add_entry(day(number), mood_score=7)
+    
+    stats = db.get(UserMoodStats, user.id)
+    stats.entries_count = 10
+    stats.mood_sum = 0.0
+    stats.streak_days = 7
+    db.commit()
+    
+    drift = user_mood_stats_crud.rebuild(db, dry_run=True)
+    assert {(item["field"], item["stored"], item["expected"]) for item in drift} == {
+        ("entries_count", 10, 3),
+        ("mood_sum", 0.0, 21.0),
+        ("streak_days", 7, 3),
+    }
+    db.expire_all()
+    assert db.get(UserMoodStats, user.id).entries_count == 10
+    
+    user_mood_stats_crud.rebuild(db)
+    db.expire_all()
+    assert_matches_history(db, user.id)
+    assert user_mood_stats_crud.rebuild(db, dry_run=True) == []
+
+
+def test_rebuild_creates_missing_row(db, user, add_entry):
+    """Строка, которой нет (история до появления таблицы), создается из записей"""
+    add_entry(day(1), mood_score=4)
+    db.delete(db.get(UserMoodStats, user.id))
+    db.commit()
+    
+    drift = user_mood_stats_crud.rebuild(db, user_ids=[user.id])
+    
+    assert drift == [{"user_id": user.id, "field": "row", "stored": None, "expected": "missing"}]
+    stats = assert_matches_history(db, user.id)
+    assert stats.neutral_count == 1
@@ -50,6 +50,14 @@ export const api = {
     return await apiClient.get('/users', { params })
   },
 
+  // Cursor pagination: an empty cursor requests the first page,
+  // the response is { items, next_cursor } (next_cursor is null on the last page)
+  async getUsersPage(cursor = '', limit = 100, activeOnly = false) {
+    return await apiClient.get('/users', {
+      params: { cursor, limit, active_only: activeOnly }
+    })
+  },
+
   async getUser(userId) {
     return await apiClient.get(`/users/${userId}`)
   },
@@ -79,6 +87,12 @@ export const api = {
     return await apiClient.get('/mood-entries', { params })
   },
 
+  async getMoodEntriesPage(userId, cursor = '', limit = 50) {
+    return await apiClient.get('/mood-entries', {
+      params: { user_id: userId, cursor, limit }
+    })
+  },
+
   async getMoodEntry(entryId) {
     return await apiClient.get(`/mood-entries/${entryId}`)
   },
@@ -99,6 +113,11 @@ export const api = {
     return await apiClient.delete(`/mood-entries/${entryId}`)
   },
 
+  // Состояние фонового AI анализа: queued/running/done/failed
+  async getAnalysisStatus(entryId) {
+    return await apiClient.get(`/mood-entries/${entryId}/analysis-status`)
+  },
+
   async getUserRecentEntries(userId, days = 7) {
     return await apiClient.get(`/mood-entries/user/${userId}/recent`, {
       params: { days }
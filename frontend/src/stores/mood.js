@@ -14,6 +14,9 @@ export const useMoodStore = defineStore('mood', {
     // Mood entries
     moodEntries: [],
     recentEntries: [],
+    entriesCursor: '',
+    hasMoreEntries: true,
+    entriesLoading: false,
     
     // Analytics
     moodStats: null,
@@ -256,6 +259,34 @@ export const useMoodStore = defineStore('mood', {
       }
     },
 
+    // Fetch the next page of the mood entries history
+    // Uses cursor pagination, so every page costs the same regardless of depth
+    async fetchMoodEntriesPage(userId, { reset = false, limit = 50 } = {}) {
+      if (reset) {
+        this.moodEntries = []
+        this.entriesCursor = ''
+        this.hasMoreEntries = true
+      }
+      if (!this.hasMoreEntries || this.entriesLoading) return []
+
+      try {
+        this.entriesLoading = true
+        const response = await api.getMoodEntriesPage(userId, this.entriesCursor, limit)
+        const { items, next_cursor: nextCursor } = response.data
+
+        this.moodEntries.push(...items)
+        this.entriesCursor = nextCursor
+        this.hasMoreEntries = nextCursor !== null
+        return items
+      } catch (error) {
+        console.error('Error fetching mood entries:', error)
+        this.setError('Не удалось загрузить историю записей')
+        return []
+      } finally {
+        this.entriesLoading = false
+      }
+    },
+
     // Fetch global statistics
     async fetchGlobalStats() {
       try {
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный бенчмарк пути AI анализа
+
+Записи поступают с фиксированной частотой (--rate в секунду, --poisson для
+случайных интервалов) в течение --duration секунд: через
+POST /api/v1/mood-entries/?analyze=true и через сохранение записи в боте
+(тот же обработчик, что и для сообщения пользователя, с локальными объектами
+Telegram). Вместо Gemini отвечает FakeGeminiModel с логнормальной задержкой,
+долей ошибок и испорченных JSON ответов, поэтому квота не расходуется.
+
+Для каждого пути выводятся пропускная способность и перцентили задержек:
+ответа обработчика (запись сохранена) и готовности анализа (задача
+выполнена, в боте - итоговая правка сообщения). Так можно сравнить
+очередь, кэш и пакетирование без обращения к API.
+
+Запуск:
+    python tests/performance/bench_ai_path.py --rate 5 --duration 20
+    python tests/performance/bench_ai_path.py --path api --rate 20 --batch-size 16 --error-rate 0.05
+    python tests/performance/bench_ai_path.py --path bot --rate 2 --repeat-ratio 0.3
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from bench_utils import arrivals, print_summary, setup_backend_env
+
+setup_backend_env(BOT_EDIT_INTERVAL="0.2")
+
+import httpx  # noqa: E402
+
+from app.bot.bot import MoodDiaryBot  # noqa: E402
+from app.core.database import SessionLocal, create_tables, dispose_engines  # noqa: E402
+from app.core.metrics import metrics  # noqa: E402
+from app.models import AIAnalysis, AnalysisJob, User  # noqa: E402
+from app.models.analysis_job import JOB_DONE, JOB_FAILED  # noqa: E402
+from app.services.analysis_batcher import AnalysisBatcher  # noqa: E402
+from app.services.analysis_worker import analysis_worker  # noqa: E402
+from app.services.gemini_fake import FakeGeminiModel  # noqa: E402
+from app.services.gemini_limits import AdaptiveConcurrencyLimiter, TokenBucket  # noqa: E402
+from app.services.gemini_service import gemini_service  # noqa: E402
+from main import app  # noqa: E402
+
+WORDS = (
+    "сегодня работа друзья усталость радость прогулка экзамен семья дождь спорт кино "
+    "тревога спокойно отлично грустно устал выспался поссорился встреча дедлайн отпуск"
+).split()
+
+
+class TextSource:
+    """Тексты записей: доля repeat_ratio повторяет уже отправленные (попадания в кэш анализа)"""
+
+    def __init__(self, repeat_ratio: float, seed: int):
+        self.repeat_ratio = repeat_ratio
+        self.random = random.Random(seed)
+        self.sent = []
+
+    def next(self) -> tuple:
+        if self.sent and self.random.random() < self.repeat_ratio:
+            return self.random.choice(self.sent)
+        text = " ".join(self.random.choice(WORDS) for _ in range(self.random.randint(8, 40)))
+        item = (text.capitalize(), float(self.random.randint(1, 10)))
+        self.sent.append(item)
+        return item
+
+
+class FakeMessage:
+    """Сообщение Telegram: ответы и правки только запоминаются"""
+
+    def __init__(self, text: str = ""):
+        self.text = text
+        self.edits = 0
+
+    async def reply_text(self, text: str, **kwargs) -> "FakeMessage":
+        return FakeMessage(text)
+
+    async def edit_text(self, text: str, **kwargs) -> None:
+        self.text = text
+        self.edits += 1
+
+
+def seed_users(count: int) -> list:
+    """Пользователи, от имени которых поступают записи"""
+    with SessionLocal() as db:
+        users = [
+            User(telegram_id=random.randint(1, 10**9), username=f"bench{i}", mood_entries_count=0)
+            for i in range(count)
+        ]
+        db.add_all(users)
+        db.commit()
+        return [user.id for user in users]
+
+
+async def run_api(args, user_ids: list, texts: TextSource) -> dict:
+    """Записи через API, анализ выполняют воркеры очереди"""
+    handler_latencies, posted = [], {}
+    entries_per_user = {}
+    tasks = []
+
+    async def post_entry(client: httpx.AsyncClient, user_id: int):
+        text, score = texts.next()
+        # API принимает одну запись в день: записи пользователя идут в прошлые дни
+        days_back = entries_per_user[user_id] = entries_per_user.get(user_id, -1) + 1
+        posted_at = datetime.utcnow()
+        start = time.perf_counter()
+        response = await client.post(
+            "/api/v1/mood-entries/",
+            params={"user_id": user_id, "analyze": "true"},
+            json={
+                "mood_score": score,
+                "mood_text": text,
+                "entry_date": (posted_at - timedelta(days=days_back)).isoformat(),
+            },
+        )
+        handler_latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+        posted[response.json()["id"]] = posted_at
+
+    analysis_worker.start()
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        async for _ in arrivals(args.rate, args.duration, args.poisson, rng):
+            tasks.append(asyncio.create_task(post_entry(client, rng.choice(user_ids))))
+        await asyncio.gather(*tasks)
+
+        # Ждем, пока воркеры выполнят (или исчерпают попытки) все задачи
+        drain_until = time.perf_counter() + args.drain_timeout
+        while time.perf_counter() < drain_until:
+            with SessionLocal() as db:
+                pending = db.query(AnalysisJob).filter(
+                    AnalysisJob.mood_entry_id.in_(posted),
+                    AnalysisJob.status.notin_([JOB_DONE, JOB_FAILED])
+                ).count()
+            if not pending:
+                break
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - start
+    await analysis_worker.stop()
+
+    with SessionLocal() as db:
+        jobs = db.query(AnalysisJob).filter(AnalysisJob.mood_entry_id.in_(posted)).all()
+        ready = [
+            (job.finished_at - posted[job.mood_entry_id]).total_seconds()
+            for job in jobs if job.status == JOB_DONE and job.finished_at
+        ]
+        failed = sum(job.status == JOB_FAILED for job in jobs)
+        fallbacks = db.query(AIAnalysis).filter(
+            AIAnalysis.mood_entry_id.in_(posted), AIAnalysis.ai_model.like("%fallback")
+        ).count()
+
+    return {
+        "title": "API POST /mood-entries?analyze=true",
+        "submitted": len(posted),
+        "elapsed": elapsed,
+        "handler": handler_latencies,
+        "ready": ready,
+        "details": f"провалено задач: {failed}, fallback анализов: {fallbacks}",
+    }
+
+
+async def run_bot(args, user_ids: list, texts: TextSource) -> dict:
+    """Записи через обработчик бота: анализ выполняется сразу, сообщение правится по мере ответа"""
+    bot = MoodDiaryBot()
+    analysis_tasks = []
+    bot.application = SimpleNamespace(create_task=lambda coro: analysis_tasks.append(asyncio.create_task(coro)))
+    handler_latencies, ready = [], []
+
+    async def save_entry(user_id: int):
+        text, score = texts.next()
+        start = time.perf_counter()
+        known = len(analysis_tasks)
+        await bot._save_mood_entry(SimpleNamespace(message=FakeMessage()), user_id, score, text)
+        handler_latencies.append(time.perf_counter() - start)
+        if len(analysis_tasks) > known:
+            task = analysis_tasks[known]
+            task.add_done_callback(lambda _: ready.append(time.perf_counter() - start))
+
+    rng = random.Random(args.seed + 1)
+    tasks = []
+    start = time.perf_counter()
+    async for _ in arrivals(args.rate, args.duration, args.poisson, rng):
+        tasks.append(asyncio.create_task(save_entry(rng.choice(user_ids))))
+    await asyncio.gather(*tasks)
+    await asyncio.wait_for(asyncio.gather(*analysis_tasks), timeout=args.drain_timeout)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "title": "Бот: сохранение записи",
+        "submitted": len(tasks),
+        "elapsed": elapsed,
+        "handler": handler_latencies,
+        "ready": ready,
+        "details": f"поздних ответов модели: {metrics.snapshot().get('gemini_late_results', 0)}",
+    }
+
+
+def report(result: dict) -> None:
+    print(
+        f"\n{result['title']}: записей {result['submitted']}, анализов готово {len(result['ready'])} "
+        f"за {result['elapsed']:.1f}с ({len(result['ready']) / result['elapsed']:.2f}/с)"
+    )
+    print_summary("  ответ обработчика", result["handler"])
+    print_summary("  анализ готов", result["ready"])
+    print(f"  {result['details']}")
+
+
+async def run(args):
+    create_tables()
+    user_ids = seed_users(args.users)
+    texts = TextSource(args.repeat_ratio, args.seed)
+
+    model = FakeGeminiModel(
+        latency=args.latency_ms / 1000,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed
+    )
+    gemini_service.use_model(model)
+    gemini_service.concurrency = AdaptiveConcurrencyLimiter(max_limit=args.max_concurrency)
+    gemini_service.request_bucket = TokenBucket("gemini_rpm", args.rpm)
+    gemini_service.token_bucket = TokenBucket("gemini_tpm", 0)
+    gemini_service.batcher = None
+    if args.batch_size > 1:
+        gemini_service.batcher = AnalysisBatcher(gemini_service, args.batch_window_ms / 1000, args.batch_size)
+    analysis_worker.concurrency = args.workers
+    analysis_worker.retry_base = args.retry_base
+
+    print(
+        f"Частота: {args.rate}/с{' (пуассоновский поток)' if args.poisson else ''}, длительность: {args.duration}с, "
+        f"модель: {args.latency_ms:.0f}ms (sigma {args.latency_sigma}), ошибок {args.error_rate:.0%}, "
+        f"испорченных JSON {args.malformed_rate:.0%}, повторов текста {args.repeat_ratio:.0%}"
+    )
+    print(
+        f"GEMINI_MAX_CONCURRENCY: {args.max_concurrency}, воркеров: {args.workers}, пакет: {args.batch_size}, "
+        f"RPM: {args.rpm or 'без ограничения'}"
+    )
+
+    try:
+        if args.path in ("api", "both"):
+            report(await run_api(args, user_ids, texts))
+        if args.path in ("bot", "both"):
+            report(await run_bot(args, user_ids, texts))
+    finally:
+        await dispose_engines()
+
+    snapshot = metrics.snapshot()
+    print(
+        f"\nЗапросов к модели: {model.calls} (одновременно до {model.max_in_flight}), ошибок: {model.errors}, "
+        f"испорченных ответов: {model.malformed}, попаданий в кэш: {snapshot['analysis_cache_memory_hits'] + snapshot['analysis_cache_store_hits']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", choices=("api", "bot", "both"), default="both", help="Путь поступления записей")
+    parser.add_argument("--rate", type=float, default=5, help="Записей в секунду")
+    parser.add_argument("--duration", type=float, default=10, help="Длительность подачи записей, сек")
+    parser.add_argument("--poisson", action="store_true", help="Случайные интервалы между записями")
+    parser.add_argument("--users", type=int, default=50, help="Пользователей, от имени которых идут записи")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0, help="Доля записей с уже отправленным текстом")
+    parser.add_argument("--latency-ms", type=float, default=800, help="Медиана задержки модели, мс")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Разброс задержки (логнормальный)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля запросов к модели с ошибкой")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Доля ответов с обрезанным JSON")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="Лимит одновременных запросов к модели")
+    parser.add_argument("--rpm", type=int, default=0, help="Квота запросов к модели в минуту (0 - без ограничения)")
+    parser.add_argument("--workers", type=int, default=4, help="Воркеров очереди анализа")
+    parser.add_argument("--batch-size", type=int, default=1, help="Записей в пакетном промпте (1 - без пакетов)")
+    parser.add_argument("--batch-window-ms", type=int, default=200, help="Окно сбора пакета, мс")
+    parser.add_argument("--retry-base", type=float, default=0.5, help="Задержка повтора задачи, сек")
+    parser.add_argument("--drain-timeout", type=float, default=60, help="Ожидание оставшихся анализов, сек")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
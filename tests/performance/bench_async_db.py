@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк асинхронного слоя БД
+
+Измеряет задержку /health, пока параллельно выполняются тяжелые запросы
+/api/v1/analytics/trends/{id}?period=year. С асинхронной сессией p99 /health
+должен оставаться близким к базовому значению.
+
+Запуск:
+    python tests/performance/bench_async_db.py --years 3 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from bench_utils import print_summary, setup_backend_env
+
+setup_backend_env()
+
+import httpx  # noqa: E402
+
+from app.core.database import SessionLocal, create_tables, dispose_engines  # noqa: E402
+from app.crud.mood_daily_rollup import mood_daily_rollup_crud  # noqa: E402
+from app.crud.user_mood_stats import user_mood_stats_crud  # noqa: E402
+from app.models import AIAnalysis, MoodEntry, User  # noqa: E402
+from main import app  # noqa: E402
+
+
+def seed(years: int) -> int:
+    """Создать пользователя с ежедневными записями за несколько лет"""
+    create_tables()
+    with SessionLocal() as db:
+        user = User(telegram_id=random.randint(1, 10**9), username="bench", mood_entries_count=0)
+        db.add(user)
+        db.flush()
+
+        now = datetime.utcnow()
+        for day in range(365 * years):
+            score = round(random.uniform(1, 10), 1)
+            entry = MoodEntry(
+                user_id=user.id,
+                mood_score=score,
+                mood_text="Обычный день, работа и прогулка вечером. " * 5,
+                entry_date=now - timedelta(days=day, hours=1),
+            )
+            entry.ai_analysis = AIAnalysis(
+                user_id=user.id,
+                sentiment_score=(score - 5.5) / 4.5,
+                sentiment_label="neutral",
+                emotions={"радость": random.random(), "грусть": random.random(), "спокойствие": random.random()},
+                dominant_emotion="спокойствие",
+                keywords=["работа", "прогулка"],
+                themes=["повседневность"],
+            )
+            db.add(entry)
+        user.mood_entries_count = 365 * years
+        db.commit()
+
+        # Записи созданы напрямую, агрегаты строим из истории
+        user_mood_stats_crud.rebuild(db, [user.id])
+        mood_daily_rollup_crud.rebuild(db, [user.id])
+        return user.id
+
+
+async def sample_health(client: httpx.AsyncClient, duration: float, interval: float) -> list:
+    """Опрашивать /health и собирать задержки"""
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/health")
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def trends_load(client: httpx.AsyncClient, user_id: int, stop: asyncio.Event, counter: list):
+    """Непрерывно запрашивать годовой тренд"""
+    while not stop.is_set():
+        response = await client.get(f"/api/v1/analytics/trends/{user_id}", params={"period": "year"})
+        assert response.status_code == 200, response.text
+        counter.append(1)
+
+
+async def run(args):
+    user_id = seed(args.years)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Прогрев
+        await client.get(f"/api/v1/analytics/trends/{user_id}", params={"period": "year"})
+
+        baseline = await sample_health(client, args.duration, args.interval)
+
+        stop = asyncio.Event()
+        counter = []
+        workers = [
+            asyncio.create_task(trends_load(client, user_id, stop, counter))
+            for _ in range(args.concurrency)
+        ]
+        loaded = await sample_health(client, args.duration, args.interval)
+        stop.set()
+        await asyncio.gather(*workers)
+    await dispose_engines()
+
+    print(f"Пользователь: {user_id}, записей: {365 * args.years}, параллельных trends: {args.concurrency}")
+    print_summary("/health без нагрузки", baseline)
+    print_summary("/health под нагрузкой trends?period=year", loaded)
+    print(f"Выполнено trends запросов: {len(counter)} ({len(counter) / args.duration:.1f} rps)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=3, help="Сколько лет ежедневных записей создать")
+    parser.add_argument("--concurrency", type=int, default=8, help="Параллельные запросы trends")
+    parser.add_argument("--duration", type=float, default=5.0, help="Длительность каждой фазы, сек")
+    parser.add_argument("--interval", type=float, default=0.01, help="Интервал опроса /health, сек")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
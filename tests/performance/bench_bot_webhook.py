@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк бота: webhook против polling
+
+Локальный сервер Bot API (fake_telegram.py) отправляет боту сообщения с
+фиксированной частотой и замеряет время от обновления до первого ответа
+бота в чат. Сначала бот получает обновления через getUpdates (run_bot.py),
+затем API из main.py поднимается в uvicorn, устанавливает webhook и
+принимает те же обновления маршрутом BOT_WEBHOOK_PATH.
+
+Для каждого режима выводится время обработчика команды и задержка event
+loop: если обработчик блокирует loop запросами к БД, растет задержка loop,
+а не только время самого обработчика.
+
+Запуск:
+    python tests/performance/bench_bot_webhook.py --rate 20 --duration 5
+    python tests/performance/bench_bot_webhook.py --command /start --mode webhook
+    python tests/performance/bench_bot_webhook.py --command /analytics --rate 50
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from bench_utils import arrivals, print_summary, setup_backend_env
+from fake_telegram import FakeTelegram, free_port
+
+telegram = FakeTelegram()
+api_port = free_port()
+setup_backend_env(
+    TELEGRAM_BOT_TOKEN="123456:bench",
+    TELEGRAM_API_BASE_URL=telegram.base_url,
+    BOT_WEBHOOK_URL=f"http://127.0.0.1:{api_port}",
+    ANALYSIS_WORKER_ENABLED="false",
+)
+
+import uvicorn  # noqa: E402
+
+from app.bot.bot import MoodDiaryBot  # noqa: E402
+from app.core.database import create_tables, dispose_engines  # noqa: E402
+from app.core.metrics import metrics  # noqa: E402
+from main import app  # noqa: E402
+
+
+def handler_name(command: str) -> str:
+    """Имя гистограммы обработчика для текста сообщения"""
+    return command.split()[0].lstrip("/") if command.startswith("/") else "message"
+
+
+def print_histogram_delta(label: str, name: str, before: dict) -> None:
+    """Число наблюдений и среднее гистограммы name с момента снимка before"""
+    after = metrics.snapshot().get(name, {"count": 0, "sum": 0})
+    previous = before.get(name, {"count": 0, "sum": 0})
+    count = after["count"] - previous["count"]
+    if count:
+        mean_ms = (after["sum"] - previous["sum"]) / count * 1000
+        print(f"  {label}: {count} наблюдений, среднее {mean_ms:.2f}мс")
+
+
+async def drive(args, label: str) -> None:
+    """Отправлять сообщения с частотой args.rate и вывести задержки ответов"""
+    rng = random.Random(args.seed)
+    before = metrics.snapshot()
+    tasks = []
+    start = time.perf_counter()
+    async for _ in arrivals(args.rate, args.duration, args.poisson, rng):
+        tasks.append(asyncio.create_task(telegram.send_update(args.command)))
+    latencies = await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    print(f"\n{label}: обновлений {len(latencies)} за {elapsed:.1f}с ({len(latencies) / elapsed:.1f}/с)")
+    print_summary(f"  {args.command}: обновление -> ответ", latencies)
+
+    name = handler_name(args.command)
+    print_histogram_delta(f"обработчик {name}", f"bot_handler_{name}_seconds", before)
+    print_histogram_delta("задержка event loop", "event_loop_lag_seconds", before)
+    print(f"  наибольшая задержка event loop: {metrics.snapshot().get('event_loop_lag_max_seconds', 0) * 1000:.1f}мс")
+
+
+async def run_polling(args) -> None:
+    bot = MoodDiaryBot()
+    application = bot.setup_application()
+    await application.initialize()
+    await application.start()
+    await application.updater.start_polling(drop_pending_updates=True)
+    bot.loop_lag.start()
+    try:
+        await drive(args, "Polling (getUpdates)")
+    finally:
+        await bot.loop_lag.stop()
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+
+
+async def run_webhook(args) -> None:
+    # API с ботом в режиме webhook: lifespan вызывает setWebhook у локального Bot API
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=api_port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        assert telegram.webhook_url, "API не установил webhook"
+        await drive(args, f"Webhook ({telegram.webhook_url})")
+        rejected = sum(status != 200 for status in telegram.webhook_statuses)
+        print(f"  отклонено запросов webhook: {rejected}")
+    finally:
+        server.should_exit = True
+        await task
+
+
+async def run(args):
+    create_tables()
+    await telegram.start()
+    print(f"Частота: {args.rate}/с, длительность: {args.duration}с, команда: {args.command}")
+    try:
+        if args.mode in ("polling", "both"):
+            await run_polling(args)
+        if args.mode in ("webhook", "both"):
+            await run_webhook(args)
+    finally:
+        await telegram.stop()
+        await dispose_engines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("polling", "webhook", "both"), default="both")
+    parser.add_argument(
+        "--command", default="/help",
+        help="Текст сообщения (/help - без БД, /start и /analytics - с БД)"
+    )
+    parser.add_argument("--rate", type=float, default=10, help="Сообщений в секунду")
+    parser.add_argument("--duration", type=float, default=5, help="Длительность подачи сообщений, сек")
+    parser.add_argument("--poisson", action="store_true", help="Случайные интервалы между сообщениями")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк параллельных запросов к Gemini
+
+Отправляет N одновременных POST /api/v1/mood-entries/?analyze=true от разных
+пользователей, вместо Gemini используется локальная модель с фиксированной
+задержкой ответа. POST только ставит задачу анализа в очередь, анализы
+выполняют воркеры (--workers). Запросы к модели не блокируют event loop,
+поэтому N анализов при GEMINI_MAX_CONCURRENCY >= N и N воркерах завершаются
+примерно за одну задержку модели, а не за N. С пакетированием
+(--batch-size > 1) те же N записей уходят в модель одним-двумя пакетными
+промптами.
+
+Запуск:
+    python tests/performance/bench_gemini_concurrency.py --requests 8 --latency 0.5
+    python tests/performance/bench_gemini_concurrency.py --requests 32 --workers 32 --batch-size 16
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime
+
+from bench_utils import print_summary, setup_backend_env
+
+setup_backend_env()
+
+import httpx  # noqa: E402
+
+from app.core.database import SessionLocal, create_tables, dispose_engines  # noqa: E402
+from app.crud.analysis_job import analysis_job_crud  # noqa: E402
+from app.models import User  # noqa: E402
+from app.services.analysis_batcher import AnalysisBatcher  # noqa: E402
+from app.services.analysis_worker import analysis_worker  # noqa: E402
+from app.services.gemini_fake import FakeGeminiModel  # noqa: E402
+from app.services.gemini_limits import AdaptiveConcurrencyLimiter, TokenBucket  # noqa: E402
+from app.services.gemini_service import gemini_service  # noqa: E402
+from main import app  # noqa: E402
+
+def seed(count: int) -> list:
+    """Создать пользователей, каждый отправит по одной записи"""
+    create_tables()
+    with SessionLocal() as db:
+        users = [
+            User(telegram_id=random.randint(1, 10**9), username=f"bench{i}", mood_entries_count=0)
+            for i in range(count)
+        ]
+        db.add_all(users)
+        db.commit()
+        return [user.id for user in users]
+
+
+async def create_entry(client: httpx.AsyncClient, user_id: int, latencies: list):
+    """Создать запись с AI анализом"""
+    start = time.perf_counter()
+    response = await client.post(
+        "/api/v1/mood-entries/",
+        params={"user_id": user_id, "analyze": "true"},
+        json={
+            "mood_score": 7,
+            "mood_text": "Хороший день, долго гулял в парке",
+            "entry_date": datetime.utcnow().isoformat(),
+        },
+    )
+    latencies.append(time.perf_counter() - start)
+    assert response.status_code == 200, response.text
+
+
+async def wait_for_jobs(count: int, poll: float = 0.01) -> None:
+    """Дождаться выполнения всех задач анализа"""
+    while True:
+        with SessionLocal() as db:
+            if analysis_job_crud.count_by_status(db)["done"] >= count:
+                return
+        await asyncio.sleep(poll)
+
+
+async def run(args):
+    user_ids = seed(args.requests)
+    model = FakeGeminiModel(latency=args.latency, latency_sigma=0)
+    gemini_service.use_model(model)
+    gemini_service.concurrency = AdaptiveConcurrencyLimiter(max_limit=args.max_concurrency)
+    # Квоты RPM/TPM не ограничивают бенчмарк
+    gemini_service.request_bucket = TokenBucket("gemini_rpm", 0)
+    gemini_service.token_bucket = TokenBucket("gemini_tpm", 0)
+    gemini_service.batcher = None
+    if args.batch_size > 1:
+        gemini_service.batcher = AnalysisBatcher(gemini_service, args.batch_window_ms / 1000, args.batch_size)
+
+    analysis_worker.concurrency = args.workers
+    analysis_worker.start()
+
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(create_entry(client, user_id, latencies) for user_id in user_ids))
+        await wait_for_jobs(args.requests)
+        total = time.perf_counter() - start
+    await analysis_worker.stop()
+    await dispose_engines()
+
+    print(
+        f"Запросов: {args.requests}, задержка модели: {args.latency * 1000:.0f}ms, "
+        f"GEMINI_MAX_CONCURRENCY: {args.max_concurrency}, воркеров: {args.workers}, пакет: {args.batch_size}"
+    )
+    print_summary("POST /mood-entries?analyze=true", latencies)
+    print(f"Все анализы готовы через: {total * 1000:.0f}ms ({total / args.latency:.2f} задержки модели)")
+    print(f"Запросов к модели: {model.calls}, одновременно: {model.max_in_flight}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=8, help="Одновременных запросов на создание записи")
+    parser.add_argument("--latency", type=float, default=0.5, help="Задержка ответа модели, сек")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Лимит одновременных запросов к модели")
+    parser.add_argument("--workers", type=int, default=8, help="Воркеров очереди анализа")
+    parser.add_argument("--batch-size", type=int, default=1, help="Записей в пакетном промпте (1 - без пакетов)")
+    parser.add_argument("--batch-window-ms", type=int, default=200, help="Окно сбора пакета, мс")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк локального словарного анализатора
+
+Генерирует N записей из типичных фраз дневника и измеряет стоимость
+анализа одной записи: по одной (как в боте) и пакетом. Цель - меньше
+миллисекунды на запись, без сети и внешних зависимостей.
+
+Запуск:
+    python tests/performance/bench_local_analyzer.py --entries 5000 --batch-size 100
+"""
+
+import argparse
+import random
+import time
+
+from bench_utils import print_summary, setup_backend_env
+
+setup_backend_env()
+
+from app.services.local_analyzer import LocalMoodAnalyzer  # noqa: E402
+
+PHRASES = [
+    "Сегодня был очень хороший день",
+    "гуляли с друзьями в парке",
+    "на работе опять дедлайн и начальник бесит",
+    "не выспалась, тревожно перед экзаменом",
+    "вечером спокойно посмотрели кино с семьей",
+    "совсем не весело, устал и хочется тишины",
+    "получилось закончить проект, чувствую вдохновение",
+    "погода ужасная, весь день дождь",
+    "поругались с мамой, обидно",
+    "тренировка в зале зарядила энергией",
+    "скучаю по дому и немного грустно",
+    "ничего особенного, обычный день",
+]
+
+
+def make_entries(count: int, seed: int = 42) -> list:
+    """Записи из 2-5 случайных фраз со случайной оценкой"""
+    rnd = random.Random(seed)
+    return [
+        (". ".join(rnd.sample(PHRASES, rnd.randint(2, 5))), rnd.randint(1, 10))
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=5000, help="Записей для анализа")
+    parser.add_argument("--batch-size", type=int, default=100, help="Записей в пакете")
+    args = parser.parse_args()
+
+    entries = make_entries(args.entries)
+
+    # Холодный кэш основ: первый проход по словарю записей
+    analyzer = LocalMoodAnalyzer()
+    start = time.perf_counter()
+    for text, mood_score in entries:
+        analyzer.analyze(text, mood_score)
+    cold = time.perf_counter() - start
+
+    single = []
+    for text, mood_score in entries:
+        start = time.perf_counter()
+        analyzer.analyze(text, mood_score)
+        single.append(time.perf_counter() - start)
+
+    batches = []
+    for offset in range(0, len(entries), args.batch_size):
+        batch = entries[offset:offset + args.batch_size]
+        start = time.perf_counter()
+        analyzer.analyze_batch(batch)
+        batches.append((time.perf_counter() - start) / len(batch))
+
+    print(f"Записей: {args.entries}, пакет: {args.batch_size}")
+    print(f"Холодный проход: {cold / args.entries * 1e6:.1f}µs на запись")
+    print_summary("analyze() на запись", single)
+    print_summary("analyze_batch() на запись", batches)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Общие утилиты для Python бенчмарков
+Настраивают окружение backend и считают перцентили задержек
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import AsyncIterator, Dict, List
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+
+def setup_backend_env(**env: str) -> str:
+    """
+    Подготовить окружение до импорта приложения:
+    временная SQLite база, отключенные логи SQL и путь к модулям backend
+
+    Returns:
+        Путь к временному файлу базы данных
+    """
+    db_path = os.path.join(tempfile.mkdtemp(prefix="mood_bench_"), "bench.db")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{db_path}")
+    os.environ.setdefault("ENVIRONMENT", "benchmark")
+    os.environ.setdefault("GEMINI_API_KEY", "")
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "")
+    for key, value in env.items():
+        os.environ[key] = value
+
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    return db_path
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(values_sec: List[float]) -> Dict[str, float]:
+    """Сводка задержек в миллисекундах"""
+    ms = [v * 1000 for v in values_sec]
+    return {
+        "count": len(ms),
+        "p50": round(percentile(ms, 50), 2),
+        "p95": round(percentile(ms, 95), 2),
+        "p99": round(percentile(ms, 99), 2),
+        "max": round(max(ms), 2) if ms else 0.0,
+    }
+
+
+def print_summary(title: str, values_sec: List[float]) -> None:
+    """Вывести сводку задержек"""
+    s = latency_summary(values_sec)
+    print(
+        f"{title:<40} n={s['count']:<6} p50={s['p50']:>8.2f}ms "
+        f"p95={s['p95']:>8.2f}ms p99={s['p99']:>8.2f}ms max={s['max']:>8.2f}ms"
+    )
+
+
+async def arrivals(rate: float, duration: float, poisson: bool, rng: random.Random) -> AsyncIterator[None]:
+    """Поступление запросов: rate в секунду в течение duration секунд, с poisson - случайные интервалы"""
+    start = time.perf_counter()
+    next_at = 0.0
+    while next_at < duration:
+        delay = start + next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        yield
+        next_at += rng.expovariate(rate) if poisson else 1 / rate
@@ -0,0 +1,151 @@
+"""
+Локальный сервер Telegram Bot API для бенчмарков бота
+Отдает обновления через getUpdates (polling) или отправляет их на
+установленный webhook и запоминает, когда бот ответил в каждый чат
+"""
+
+import asyncio
+import json
+import socket
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+def free_port() -> int:
+    """Свободный TCP порт на localhost"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeTelegram:
+    """
+    Bot API с методами, которые вызывает бот: getMe, setWebhook,
+    deleteWebhook, getUpdates, sendMessage, editMessageText. Каждое
+    обновление приходит из отдельного чата, поэтому первый ответ в чат
+    завершает измерение задержки обновления
+    """
+
+    def __init__(self):
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret: Optional[str] = None
+        self.webhook_statuses: List[int] = []
+        self.app = Starlette(routes=[Route("/bot{token}/{method}", self.handle, methods=["GET", "POST"])])
+        self._updates: asyncio.Queue = asyncio.Queue()
+        self._replies: Dict[int, asyncio.Future] = {}
+        self._last_id = 0
+        self._server: Optional[uvicorn.Server] = None
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._task = asyncio.create_task(self._server.serve())
+        self._client = httpx.AsyncClient(timeout=30)
+        while not self._server.started:
+            await asyncio.sleep(0.01)
+
+    async def stop(self) -> None:
+        await self._client.aclose()
+        self._server.should_exit = True
+        await self._task
+
+    async def handle(self, request: Request) -> JSONResponse:
+        method = request.path_params["method"]
+        if request.headers.get("content-type", "").startswith("application/json"):
+            params = await request.json()
+        else:
+            params = dict(await request.form())
+
+        if method == "getMe":
+            result = BOT_USER
+        elif method == "setWebhook":
+            self.webhook_url = params["url"]
+            self.webhook_secret = params.get("secret_token")
+            result = True
+        elif method == "deleteWebhook":
+            self.webhook_url = None
+            result = True
+        elif method == "getUpdates":
+            result = await self._get_updates(float(params.get("timeout", 0)))
+        elif method in ("sendMessage", "editMessageText"):
+            result = self._reply(int(params["chat_id"]), params.get("text", ""))
+        else:
+            result = True
+        return JSONResponse({"ok": True, "result": result})
+
+    async def _get_updates(self, timeout: float) -> list:
+        """Long polling: ждем первое обновление не дольше timeout, затем забираем все накопленные"""
+        try:
+            updates = [await asyncio.wait_for(self._updates.get(), timeout=max(timeout, 0.01))]
+        except asyncio.TimeoutError:
+            return []
+        while not self._updates.empty():
+            updates.append(self._updates.get_nowait())
+        return updates
+
+    def _reply(self, chat_id: int, text: str) -> dict:
+        reply = self._replies.get(chat_id)
+        if reply is not None and not reply.done():
+            reply.set_result(time.perf_counter())
+        self._last_id += 1
+        return {
+            "message_id": self._last_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": text,
+        }
+
+    def message_update(self, text: str) -> dict:
+        """Обновление с сообщением text из нового чата"""
+        self._last_id += 1
+        user = {"id": self._last_id, "is_bot": False, "first_name": "Bench", "language_code": "ru"}
+        message = {
+            "message_id": self._last_id,
+            "date": int(time.time()),
+            "chat": {"id": self._last_id, "type": "private", "first_name": "Bench"},
+            "from": user,
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": self._last_id, "message": message}
+
+    async def send_update(self, text: str) -> float:
+        """
+        Отправить обновление боту: через webhook, если он установлен, иначе в очередь getUpdates
+
+        Returns:
+            Секунды от отправки обновления до первого ответа бота в чат
+        """
+        update = self.message_update(text)
+        chat_id = update["message"]["chat"]["id"]
+        reply = self._replies[chat_id] = asyncio.get_running_loop().create_future()
+        start = time.perf_counter()
+
+        if self.webhook_url:
+            response = await self._client.post(
+                self.webhook_url,
+                content=json.dumps(update),
+                headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": self.webhook_secret or ""},
+            )
+            self.webhook_statuses.append(response.status_code)
+        else:
+            self._updates.put_nowait(update)
+
+        replied_at = await asyncio.wait_for(reply, timeout=30)
+        del self._replies[chat_id]
+        return replied_at - start